@@ -0,0 +1,67 @@
+# benchmarks/bench_archivo.py
+"""
+Archivo histórico: tamaño de la base viva, tiempo de copia (backup) y de VACUUM, y consultas típicas antes y
+después de archivar_historial() con un horizonte de 1 año, sobre 3 años de ventas con sus movimientos.
+
+    python benchmarks/bench_archivo.py [ventas]   (por defecto 200000)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from comun import base_temporal, poblar_catalogo, poblar_ventas, medir
+
+
+def cronometrar(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def medir_todo(database, destino):
+    hoy = date.today()
+    mes = ((hoy - timedelta(days=30)).isoformat(), hoy.isoformat())
+    dos_años = ((hoy - timedelta(days=730)).isoformat(), hoy.isoformat())
+    database.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return {
+        "tamaño MB": os.path.getsize(database.DB_PATH) / 1e6,
+        "copia ms": cronometrar(lambda: shutil.copy(database.DB_PATH, destino)),
+        "VACUUM ms": cronometrar(lambda: database.get_connection().execute("VACUUM main")),
+        "historial ms": medir(lambda: database.obtener_movimientos(300), 20)[0],
+        "reporte 1 mes ms": medir(lambda: list(database.iterar_ventas_con_detalles(*mes)), 5)[0],
+        "reporte 2 años ms": medir(lambda: list(database.iterar_ventas_con_detalles(*dos_años)), 3)[0],
+        "resumen 2 años ms": medir(lambda: database.ventas_resumen_por_tipo(*dos_años), 20)[0],
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    database = base_temporal()
+    poblar_catalogo(database, 5_000)
+    poblar_ventas(database, n, dias=3 * 365)
+    with database.transaccion() as cur:
+        # un movimiento VENTA por ítem, como registrar_venta
+        cur.execute(
+            "INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles) "
+            "SELECT vi.producto_id, 'VENTA', -vi.cantidad, vi.precio_unitario, v.fecha, 'Venta ID ' || v.id "
+            "FROM venta_items vi JOIN ventas v ON v.id = vi.venta_id ORDER BY v.fecha"
+        )
+    destino = os.path.join(tempfile.mkdtemp(), "copia.db")
+
+    antes = medir_todo(database, destino)
+    t0 = time.perf_counter()
+    movidas = database.archivar_historial(365)
+    print(f"archivar_historial: {movidas} en {time.perf_counter() - t0:.1f} s")
+    despues = medir_todo(database, destino)
+
+    print(f"{'':>20}{'antes':>12}{'después':>12}")
+    for clave in antes:
+        print(f"{clave:>20}{antes[clave]:>12.1f}{despues[clave]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
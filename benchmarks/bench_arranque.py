@@ -0,0 +1,88 @@
+# benchmarks/bench_arranque.py
+"""
+Arranque en frío hasta que aparece el login: corre main.py en un proceso aparte (GESTOR_MEDIR_ARRANQUE=1 lo
+cierra apenas se ve el diálogo) sobre una base temporal, y con `python -X importtime` lista lo que más tarda
+en importarse. Falla (código de salida 1) si la mediana supera el presupuesto o si antes del login se cargó
+alguna dependencia pesada (pandas, openpyxl, reportlab, xlsxwriter): sirve como chequeo de regresión.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_arranque.py [repeticiones] [presupuesto_ms]
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ("pandas", "openpyxl", "reportlab", "xlsxwriter")
+PRESUPUESTO_MS = 1500  # login visible, medido dentro del proceso (sin contar el arranque de Python)
+
+
+def arrancar(entorno, *opciones):
+    """Corre main.py hasta el login; devuelve (ms dentro del proceso, ms de reloj, stderr)."""
+    t0 = time.perf_counter()
+    r = subprocess.run(
+        [sys.executable, *opciones, os.path.join(RAIZ, "main.py")],
+        env=entorno,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        timeout=120,
+    )
+    reloj = (time.perf_counter() - t0) * 1000
+    m = re.search(r"Login visible en (\d+) ms", r.stdout)
+    if not m:
+        raise RuntimeError(f"main.py no llegó al login:\n{r.stdout}\n{r.stderr}")
+    return int(m.group(1)), reloj, r.stderr
+
+
+def importaciones(stderr):
+    """[(módulo, µs acumulados, es de primer nivel)] según -X importtime."""
+    filas = []
+    for linea in stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", linea)
+        if m:
+            filas.append((m.group(3), int(m.group(1)), not m.group(2)))
+    return filas
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    presupuesto = float(sys.argv[2]) if len(sys.argv) > 2 else PRESUPUESTO_MS
+    entorno = dict(os.environ, PROGRAMDATA=tempfile.mkdtemp(prefix="bench_gestor_"), GESTOR_MEDIR_ARRANQUE="1")
+    entorno["PYTHONIOENCODING"] = "utf-8"
+
+    primero, reloj, _ = arrancar(entorno)  # crea la base y los usuarios por defecto
+    print(f"primer inicio (base nueva): login en {primero} ms ({reloj:.0f} ms de reloj)")
+    medidas = [arrancar(entorno)[:2] for _ in range(repeticiones)]
+    mediana = statistics.median(m for m, _ in medidas)
+    print(
+        f"inicio normal: login en {mediana:.0f} ms (mediana de {repeticiones}), "
+        f"{statistics.median(r for _, r in medidas):.0f} ms de reloj con el arranque de Python"
+    )
+
+    _, _, stderr = arrancar(entorno, "-X", "importtime")
+    modulos = importaciones(stderr)
+    print("\nimports más caros antes del login (ms acumulados):")
+    for nombre, us, _ in sorted((f for f in modulos if f[2]), key=lambda f: -f[1])[:10]:
+        print(f"{us / 1000:>10.1f}  {nombre}")
+
+    cargados = sorted({n.split(".")[0] for n, _, _ in modulos} & set(PESADOS))
+    fallas = []
+    if cargados:
+        fallas.append(f"se cargan antes del login: {', '.join(cargados)}")
+    if mediana > presupuesto:
+        fallas.append(f"login en {mediana:.0f} ms > presupuesto de {presupuesto:.0f} ms")
+    print()
+    for falla in fallas:
+        print(f"❌ {falla}")
+    if fallas:
+        sys.exit(1)
+    print(f"✅ dentro del presupuesto ({presupuesto:.0f} ms) y sin dependencias pesadas antes del login")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# benchmarks/bench_busqueda.py
+"""
+Latencia de buscar_productos (búsqueda por "contiene") sobre un catálogo grande: LIKE vs índice FTS5,
+y de lookup_producto (código escaneado).
+
+    python benchmarks/bench_busqueda.py [cantidad_productos]   (por defecto 100000)
+"""
+
+import sys
+
+from comun import base_temporal, poblar_catalogo, medir
+
+CONSULTAS = ["yerba", "serenisima", "integral 15", "0000123", "sin tacc", "mermelada arcor"]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    database = base_temporal()
+    poblar_catalogo(database, n)
+    fts5 = "sí" if database._tiene_fts(database.get_connection().cursor()) else "no"
+    print(f"Catálogo: {n:,} productos  (FTS5: {fts5})")
+    print(f"{'consulta':<18}{'LIKE med/p95 ms':>20}{'FTS5 med/p95 ms':>20}{'x':>8}")
+    for q in CONSULTAS:
+        database.BUSQUEDA_FTS = False
+        like = medir(lambda: database.buscar_productos(q, limit=100), 20)
+        database.BUSQUEDA_FTS = True
+        fts = medir(lambda: database.buscar_productos(q, limit=100), 20)
+        x = like[0] / max(fts[0], 1e-6)
+        print(f"{q:<18}{like[0]:>10.2f}/{like[1]:<9.2f}{fts[0]:>10.2f}/{fts[1]:<9.2f}{x:>7.1f}")
+
+    barcode = f"779{n // 2:010d}"
+    med, p95 = medir(lambda: database.lookup_producto(barcode), 200)
+    print(f"\nlookup_producto (scanner): {med:.3f} / {p95:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_impresion.py
+"""
+Cuánto espera el cajero después de confirmar una venta hasta poder escanear de nuevo: generar el PDF y
+mandarlo al spooler en el momento (lo de antes) contra guardarlo en la cola de impresión. El spooler se
+simula con una espera fija (en Windows, os.startfile tarda eso o más en abrir el lector de PDF).
+También mide cuánto tarda el hilo de la cola en vaciarse con una ráfaga de ventas, y cuánto tarda el
+escaneo siguiente con un catálogo grande: las escrituras de la cola (encolar, marcar impreso) no tocan
+productos, así que no deben forzar una recarga del catálogo en memoria.
+
+    python benchmarks/bench_impresion.py [ms_spooler] [ventas] [productos]   (por defecto 300, 20 y 100000)
+"""
+
+import os
+import sys
+import time
+
+from comun import base_temporal, medir, poblar_catalogo
+
+
+def main():
+    ms_spooler = float(sys.argv[1]) if len(sys.argv) > 1 else 300
+    ventas = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    productos = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    database = base_temporal()
+    import impresion
+    import tickets
+
+    def spooler(ruta):
+        time.sleep(ms_spooler / 1000)
+
+    items = [(f"Producto {i}", 1 + i % 3, 150.0, 150.0 * (1 + i % 3)) for i in range(12)]
+    datos = tickets.datos_ticket(1, items, "Efectivo", sum(i[3] for i in items), 5000, 1000)
+    tickets.renderizar(datos, os.devnull, "termico")  # plantillas e import de reportlab fuera de la medida
+
+    en_linea, p95_linea = medir(lambda: spooler(tickets.generar(datos, "termico")), 5)
+    print(f"spooler simulado: {ms_spooler:.0f} ms por ticket")
+    print(f"{'':>28}{'mediana ms':>12}{'p95 ms':>10}")
+    print(f"{'en línea (antes)':>28}{en_linea:>12.1f}{p95_linea:>10.1f}")
+
+    cola = impresion.iniciar_cola(imprimir=spooler, avisar=lambda texto, ms: None)
+    encolado, p95_cola = medir(lambda: impresion.encolar(datos, "termico"), ventas)
+    print(f"{'cola de impresión':>28}{encolado:>12.1f}{p95_cola:>10.1f}")
+
+    t0 = time.perf_counter()
+    while database.contar_cola_impresion()[0]:
+        time.sleep(0.05)
+    print(f"\nla cola imprimió {ventas} tickets en {time.perf_counter() - t0:.1f} s, en segundo plano")
+
+    # venta completa (registrar + encolar), la cola la imprime y recién ahí se escanea el próximo producto
+    poblar_catalogo(database, productos)
+    with database.transaccion() as cur:
+        cur.execute("UPDATE productos SET cantidad = 1000000")
+    database.catalogo.todos()  # carga el catálogo en memoria, como MainWindow.iniciar()
+    caliente, _ = medir(lambda: database.lookup_producto("7790000000002"), 20)
+    escaneos = []
+    for i in range(5):
+        fila = database.lookup_producto(f"779{i + 10:010d}")
+        ok, venta_id = database.registrar_venta(
+            [{"producto_id": fila[0], "cantidad": 1, "precio_unitario": fila[6]}], "QR"
+        )
+        assert ok, venta_id
+        impresion.encolar(dict(datos, id=venta_id), "termico")
+        while database.contar_cola_impresion()[0]:
+            time.sleep(0.05)
+        escaneos.append(medir(lambda: database.lookup_producto(f"779{i + 20:010d}"), 1)[0])
+    print(
+        f"escaneo con {productos:,} productos: {caliente:.2f} ms con el catálogo caliente, "
+        f"{max(escaneos):.2f} ms (peor de 5) después de vender y vaciar la cola"
+    )
+    cola.detener()
+
+
+if __name__ == "__main__":
+    main()
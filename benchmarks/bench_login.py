@@ -0,0 +1,46 @@
+# benchmarks/bench_login.py
+"""
+Latencia de inicio de sesión (database.verificar_usuario) en esta PC: calibración de PBKDF2 para distintos
+objetivos, y login con contraseñas guardadas en texto plano, con el costo fijo de antes (200k iteraciones) y
+con el costo calibrado. El primer login de un usuario viejo incluye el re-hash al costo actual.
+
+    python benchmarks/bench_login.py
+"""
+
+import time
+
+from comun import base_temporal, medir
+
+
+def main():
+    database = base_temporal()
+
+    print("calibración (objetivo → iteraciones, ms reales de un hash):")
+    for objetivo in (100, 250, 500):
+        iteraciones = database.calibrar_pbkdf2(objetivo)
+        ms, _ = medir(lambda: database._hash_password("x", iteraciones), 3)
+        print(f"{objetivo:>8} ms → {iteraciones:>9,} iteraciones  {ms:>6.0f} ms")
+    print(f"costo en uso: {database.iteraciones_pbkdf2():,} iteraciones (objetivo {database.PBKDF2_OBJETIVO_MS} ms)\n")
+
+    guardadas = {
+        "texto plano (legado)": "clave123",
+        "200k fijo (antes)": database._hash_password("clave123", 200_000),
+        "calibrado": database._hash_password("clave123"),
+    }
+    with database.transaccion() as cur:
+        for i, stored in enumerate(guardadas.values()):
+            cur.execute("INSERT INTO usuarios (usuario, password, rol) VALUES (?, ?, 'user')", (f"u{i}", stored))
+
+    print(f"{'':>22}{'1er login ms':>14}{'siguientes ms':>15}")
+    for i, nombre in enumerate(guardadas):
+        t0 = time.perf_counter()
+        assert database.verificar_usuario(f"u{i}", "clave123") == "user"
+        primero = (time.perf_counter() - t0) * 1000
+        siguientes, _ = medir(lambda: database.verificar_usuario(f"u{i}", "clave123"), 5)
+        print(f"{nombre:>22}{primero:>14.0f}{siguientes:>15.0f}")
+    fallido, _ = medir(lambda: database.verificar_usuario("u2", "otra"), 5)
+    print(f"{'clave incorrecta':>22}{'':>14}{fallido:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
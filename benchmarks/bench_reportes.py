@@ -0,0 +1,67 @@
+# benchmarks/bench_reportes.py
+"""
+Resumen de ventas por tipo de pago para 1 mes, 1 año y 2 años: leyendo el resumen diario (ventas_diarias)
+contra la agregación directa sobre ventas. Antes de medir, ejercita registrar_venta, marcar_venta_pagada y
+reembolsar_venta y verifica que el resumen coincida con las tablas (verificar_ventas_diarias).
+
+    python benchmarks/bench_reportes.py [ventas]   (por defecto 200000)
+"""
+
+import random
+import sys
+from datetime import date, timedelta
+
+from comun import base_temporal, poblar_catalogo, poblar_ventas, medir
+
+
+def resumen_directo(database, fecha_inicio, fecha_fin):
+    """Agregación previa al resumen diario, para comparar."""
+    filtro, params = database.rango_fechas("fecha", fecha_inicio, fecha_fin)
+    return (
+        database.get_connection()
+        .execute(f"SELECT tipo_pago, SUM(total), COUNT(*) FROM ventas WHERE 1=1 {filtro} GROUP BY tipo_pago", params)
+        .fetchall()
+    )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    database = base_temporal()
+    poblar_catalogo(database, 2_000)
+    with database.transaccion() as cur:
+        cur.execute("UPDATE productos SET cantidad = 1000000000")
+    poblar_ventas(database, n)
+
+    # mantenimiento incremental: ventas nuevas, cobros de pendientes y reembolsos totales/parciales
+    rnd = random.Random(3)
+    ids = [r[0] for r in database.get_connection().execute("SELECT id FROM productos")]
+    for _ in range(200):
+        items = [{"producto_id": p, "cantidad": rnd.randint(1, 3), "precio_unitario": 10.0} for p in rnd.sample(ids, 3)]
+        database.registrar_venta(items, rnd.choice(["Efectivo", "QR", "Pendiente"]))
+    conn = database.get_connection()
+    for (venta_id,) in conn.execute("SELECT id FROM ventas WHERE estado='PENDIENTE' LIMIT 50").fetchall():
+        database.marcar_venta_pagada(venta_id, "Transferencia")
+    for venta_id in rnd.sample(range(1, n), 50):
+        database.reembolsar_venta(venta_id)
+    primeros = conn.execute("SELECT venta_id, MIN(id) FROM venta_items GROUP BY venta_id LIMIT 50").fetchall()
+    for venta_id, item_id in primeros:
+        database.reembolsar_venta(venta_id, [item_id])
+    diferencias = database.verificar_ventas_diarias()
+    if diferencias:
+        raise SystemExit(f"ventas_diarias no coincide con ventas: {diferencias[:5]}")
+    print(f"resumen diario verificado ({n:,} ventas)")
+
+    hoy = date.today()
+    print(f"{'rango':>8}{'resumen diario ms':>20}{'sobre ventas ms':>18}")
+    for nombre, dias in [("1 mes", 30), ("1 año", 365), ("2 años", 730)]:
+        fi, ff = (hoy - timedelta(days=dias)).isoformat(), hoy.isoformat()
+        rapido = sorted(database.ventas_resumen_por_tipo(fi, ff))
+        lento = sorted(resumen_directo(database, fi, ff))
+        assert [(t, round(s, 2), c) for t, s, c in rapido] == [(t, round(s, 2), c) for t, s, c in lento]
+        nuevo = medir(lambda: database.ventas_resumen_por_tipo(fi, ff), 20)
+        viejo = medir(lambda: resumen_directo(database, fi, ff), 20)
+        print(f"{nombre:>8}{nuevo[0]:>20.2f}{viejo[0]:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
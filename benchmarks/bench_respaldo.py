@@ -0,0 +1,82 @@
+# benchmarks/bench_respaldo.py
+"""
+Backup de la base mientras la app escribe: shutil.copy (lo de antes) contra respaldo.respaldar (API de backup
+de SQLite por pasos) y respaldar(compactar=True) (VACUUM INTO). Un hilo registra un movimiento cada 5 ms
+durante la copia; se mide la duración, el tamaño, la peor espera de una escritura y si la copia está completa
+(shutil.copy no ve lo que todavía está en el WAL).
+
+    python benchmarks/bench_respaldo.py [ventas]   (por defecto 100000)
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from comun import base_temporal, poblar_catalogo, poblar_ventas
+
+
+def escritor(database, parar, esperas):
+    while not parar.is_set():
+        t0 = time.perf_counter()
+        with database.transaccion(inmediata=True) as cur:
+            cur.execute(
+                "INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles) "
+                "VALUES (1, 'INGRESO', 1, 10, datetime('now'), 'bench')"
+            )
+        esperas.append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.005)
+    database.cerrar_conexion_hilo()
+
+
+def probar(database, nombre, copiar, destino):
+    if os.path.exists(destino):
+        os.remove(destino)
+    parar, esperas = threading.Event(), []
+    hilo = threading.Thread(target=escritor, args=(database, parar, esperas))
+    hilo.start()
+    time.sleep(0.05)
+    t0 = time.perf_counter()
+    copiar(destino)
+    segundos = time.perf_counter() - t0
+    parar.set()
+    hilo.join()
+    copia = sqlite3.connect(destino)
+    try:
+        integridad = copia.execute("PRAGMA integrity_check").fetchone()[0]
+        ventas = copia.execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        integridad, ventas = str(e), 0
+    finally:
+        copia.close()
+    print(
+        f"{nombre:>22}{segundos * 1000:>10.0f}{os.path.getsize(destino) / 1e6:>10.1f}"
+        f"{max(esperas):>12.1f}{len(esperas):>12}{ventas:>10}  {integridad}"
+    )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    database = base_temporal()
+    import respaldo
+
+    poblar_catalogo(database, 5_000)
+    poblar_ventas(database, n)
+    with database.transaccion() as cur:
+        # deja páginas libres, como una base con meses de uso
+        cur.execute("DELETE FROM venta_items WHERE id % 3 = 0")
+    total = database.get_connection().execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+    carpeta = tempfile.mkdtemp()
+
+    print(f"base: {os.path.getsize(database.DB_PATH) / 1e6:.1f} MB (+ WAL), {total:,} ventas")
+    print(f"{'':>22}{'ms':>10}{'MB':>10}{'espera máx':>12}{'escrituras':>12}{'ventas':>10}")
+    probar(database, "shutil.copy", lambda d: shutil.copy(database.DB_PATH, d), os.path.join(carpeta, "a.db"))
+    probar(database, "backup por pasos", respaldo.respaldar, os.path.join(carpeta, "b.db"))
+    probar(database, "VACUUM INTO", lambda d: respaldo.respaldar(d, compactar=True), os.path.join(carpeta, "c.db"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_stock.py
+"""
+Stock histórico: stock_en_fecha y valuacion_stock (snapshot diario + movimientos en el medio) contra
+sumar el libro de movimientos desde el principio, con un año de movimientos. Al final corre auditar_stock.
+
+    python benchmarks/bench_stock.py [productos] [movimientos por día]   (por defecto 5000 2000)
+"""
+
+import random
+import sys
+from datetime import date, timedelta
+
+from comun import base_temporal, poblar_catalogo, medir
+
+DIAS = 365
+
+
+def stock_desde_el_principio(database, producto_id, fecha):
+    """Consulta previa a los snapshots, para comparar: todo el libro del producto hasta la fecha."""
+    _, params = database.rango_fechas("fecha", None, fecha)
+    sql = "SELECT COALESCE(SUM(cambio), 0) FROM movimientos WHERE producto_id = ? AND fecha < ?"
+    return database.get_connection().execute(sql, (producto_id, *params)).fetchone()[0]
+
+
+def valuacion_desde_el_principio(database, fecha):
+    _, params = database.rango_fechas("m.fecha", None, fecha)
+    sql = (
+        "SELECT SUM(t.cant * p.costo) FROM productos p JOIN (SELECT producto_id, SUM(cambio) AS cant "
+        "FROM movimientos m WHERE m.fecha < ? GROUP BY producto_id) t ON t.producto_id = p.id"
+    )
+    return database.get_connection().execute(sql, params).fetchone()[0]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    por_dia = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    database = base_temporal()
+    filas = poblar_catalogo(database, n)
+    ids = [r[0] for r in database.get_connection().execute("SELECT id FROM productos ORDER BY id")]
+    rnd = random.Random(5)
+    inicio = date.today() - timedelta(days=DIAS)
+
+    # un año de movimientos, con el ingreso inicial el primer día y un snapshot al cierre de cada día
+    stock = {pid: fila[2] for pid, fila in zip(ids, filas)}
+    for d in range(DIAS):
+        dia = (inicio + timedelta(days=d)).isoformat()
+        movs = [(pid, "INGRESO", stock[pid], 0, f"{dia} 08:00:00") for pid in ids] if d == 0 else []
+        for _ in range(por_dia):
+            pid = rnd.choice(ids)
+            cambio = rnd.randint(1, 20) if rnd.random() < 0.3 else -min(stock[pid], rnd.randint(1, 5))
+            stock[pid] += cambio
+            movs.append((pid, "VENTA" if cambio < 0 else "INGRESO", cambio, 0, f"{dia} 12:00:00"))
+        with database.transaccion() as cur:
+            cur.executemany(
+                "INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha) VALUES (?, ?, ?, ?, ?)",
+                movs,
+            )
+            cur.executemany("UPDATE productos SET cantidad = ? WHERE id = ?", [(c, p) for p, c in stock.items()])
+        database.tomar_snapshot_stock()
+        with database.transaccion() as cur:
+            cur.execute("UPDATE stock_snapshots SET fecha = ? WHERE fecha > ?", (f"{dia} 23:59:00", dia + " 23:59:00"))
+    conn = database.get_connection()
+    conn.execute("ANALYZE")
+    movimientos = conn.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0]
+    snapshots = conn.execute("SELECT COUNT(*) FROM stock_snapshots").fetchone()[0]
+    print(f"{n:,} productos, {movimientos:,} movimientos, {snapshots:,} filas de snapshot")
+
+    fechas = [(inicio + timedelta(days=rnd.randint(0, DIAS - 1))).isoformat() for _ in range(50)]
+    consultas = [(rnd.choice(ids), f) for f in fechas]
+    for pid, f in consultas[:10]:
+        assert database.stock_en_fecha(pid, f) == stock_desde_el_principio(database, pid, f)
+    it = iter(consultas * 100)
+    nuevo = medir(lambda: database.stock_en_fecha(*next(it)), 200)
+    it = iter(consultas * 100)
+    viejo = medir(lambda: stock_desde_el_principio(database, *next(it)), 200)
+    print(f"stock_en_fecha       med {nuevo[0]:.3f} ms   libro completo med {viejo[0]:.3f} ms")
+
+    f = fechas[0]
+    assert abs(database.valuacion_stock(f)[1] - round(valuacion_desde_el_principio(database, f), 2)) < 0.05
+    nuevo = medir(lambda: database.valuacion_stock(f), 5)
+    viejo = medir(lambda: valuacion_desde_el_principio(database, f), 5)
+    print(f"valuacion_stock      med {nuevo[0]:.1f} ms   libro completo med {viejo[0]:.1f} ms")
+
+    auditoria = medir(database.auditar_stock, 3)
+    print(f"auditar_stock        med {auditoria[0]:.1f} ms   diferencias: {len(database.auditar_stock())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_tabla.py
+"""
+Latencia del filtro de la grilla principal (MotorFiltro + ModeloProductos) mientras se tipea en "Buscar",
+incluido el repintado de la vista, con 1k, 10k y 100k productos. Se mide aparte la preparación de claves,
+que se paga una vez por versión del catálogo.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_tabla.py [tamaños...]   (por defecto 1000 10000 100000)
+"""
+
+import sys
+
+from comun import base_temporal, poblar_catalogo, medir
+
+TECLAS = ["y", "ye", "yer", "yerb", "yerba", "yerba ", "yerba t", "yerba", ""]
+
+
+def main():
+    tamaños = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    database = base_temporal()
+
+    from PySide6.QtWidgets import QApplication, QTableView, QHeaderView
+    from ui_modelos import ModeloProductos, MotorFiltro
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    cargados = 0
+    print(f"{'productos':>10}{'claves ms':>12}{'por tecla med/p95 ms':>26}{'visibles':>10}")
+    for n in tamaños:
+        poblar_catalogo(database, n - cargados, semilla=n, desde=cargados)
+        cargados = n
+        productos = database.catalogo.todos()
+
+        modelo = ModeloProductos()
+        motor = MotorFiltro()
+        vista = QTableView()
+        vista.setModel(modelo)
+        vista.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        vista.horizontalHeader().setResizeContentsPrecision(200)
+        vista.resize(900, 600)
+        vista.show()
+        modelo.set_filas(productos)
+        vista.resizeColumnsToContents()
+        app.processEvents()
+
+        claves, _ = medir(lambda: motor.filtrar(list(productos), "", False), 3)
+        motor.filtrar(productos, "", False)
+
+        def teclear():
+            for t in TECLAS:
+                modelo.set_filas(motor.filtrar(productos, t, False))
+                vista.viewport().repaint()
+
+        med, p95 = medir(teclear, 5)
+        visibles = len(motor.filtrar(productos, TECLAS[4], False))
+        vista.close()
+
+        print(f"{n:>10,}{claves:>12.1f}{med / len(TECLAS):>16.1f}/{p95 / len(TECLAS):<9.1f}{visibles:>10,}")
+
+
+if __name__ == "__main__":
+    main()
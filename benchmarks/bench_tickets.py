@@ -0,0 +1,101 @@
+# benchmarks/bench_tickets.py
+"""
+Tickets por segundo según la cantidad de ítems: el ticket de antes (lee la venta de la base y dibuja con un
+drawString por renglón en una página fija de 200 mm), el de ahora leyendo de la base (database.generar_ticket_*)
+y el de ahora desde los datos en memoria del POS (tickets.renderizar). También muestra el alto del térmico y
+las hojas del A4: con muchos ítems el de antes se cortaba.
+
+    python benchmarks/bench_tickets.py [ítems...]   (por defecto 5 30 120)
+"""
+
+import os
+import random
+import re
+import sys
+import tempfile
+
+from comun import base_temporal, poblar_catalogo, medir
+
+
+def ticket_termico_anterior(database, venta_id, ruta):
+    """Térmico previo a las plantillas, para comparar: página fija, un drawString por renglón, compresión."""
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    venta, items = database._datos_venta_y_items(venta_id)
+    ancho, alto = 58 * mm, 200 * mm
+    c = canvas.Canvas(ruta, pagesize=(ancho, alto))
+    y = alto - 10 * mm
+    c.setFont("Helvetica-Bold", 10)
+    c.drawCentredString(ancho / 2, y, "Mi Almacén")
+    c.setFont("Helvetica", 7)
+    c.drawString(4 * mm, y - 6 * mm, f"Fecha: {venta[0]}")
+    c.drawString(4 * mm, y - 10 * mm, f"Cliente: {venta[5]}")
+    y -= 16 * mm
+    c.setFont("Helvetica-Bold", 7)
+    c.drawString(4 * mm, y, "Cant Prod         Subtot")
+    c.setFont("Helvetica", 7)
+    for nombre, cant, _precio, subtotal in items:
+        y -= 4 * mm
+        nombre_corto = (nombre[:10] + "...") if len(nombre) > 12 else nombre
+        c.drawString(4 * mm, y, f"{cant:>2}  {nombre_corto:<12} {subtotal:>6.2f}")
+    c.setFont("Helvetica-Bold", 8)
+    c.drawString(4 * mm, y - 8 * mm, f"TOTAL: ${venta[2]:.2f}")
+    c.setFont("Helvetica", 7)
+    c.drawString(4 * mm, y - 13 * mm, f"Pago: {venta[1]}")
+    c.setFont("Helvetica-Oblique", 7)
+    c.drawCentredString(ancho / 2, y - 21 * mm, "¡Gracias por su compra!")
+    c.save()
+
+
+def paginas(ruta):
+    """(hojas, alto en mm de la primera) según el PDF generado."""
+    with open(ruta, "rb") as f:
+        pdf = f.read()
+    cajas = re.findall(rb"/MediaBox \[ 0 0 [\d.]+ ([\d.]+) \]", pdf)
+    return len(cajas), float(cajas[0]) * 25.4 / 72
+
+
+def main():
+    cantidades = [int(a) for a in sys.argv[1:]] or [5, 30, 120]
+    database = base_temporal()
+    import tickets
+
+    poblar_catalogo(database, 2_000)
+    with database.transaccion() as cur:
+        cur.execute("UPDATE productos SET cantidad = 1000000")
+    productos = database.get_connection().execute("SELECT id, nombre, precio FROM productos").fetchall()
+    rnd = random.Random(7)
+    carpeta = tempfile.mkdtemp()
+    ruta = os.path.join(carpeta, "ticket.pdf")
+
+    print(f"{'ítems':>6}{'formato':>9}{'antes t/s':>11}{'base t/s':>10}{'memoria t/s':>13}{'hojas':>7}{'alto mm':>9}")
+    for n in cantidades:
+        elegidos = rnd.sample(productos, n)
+        carrito = [{"producto_id": p[0], "cantidad": rnd.randint(1, 3), "precio_unitario": p[2]} for p in elegidos]
+        ok, venta_id = database.registrar_venta(carrito, "Efectivo", efectivo_recibido=10_000_000)
+        assert ok, venta_id
+        renglones = [
+            (p[1], it["cantidad"], it["precio_unitario"], round(it["cantidad"] * it["precio_unitario"], 2))
+            for p, it in zip(elegidos, carrito)
+        ]
+        total = round(sum(r[3] for r in renglones), 2)
+        datos = tickets.datos_ticket(venta_id, renglones, "Efectivo", total, 10_000_000, 10_000_000 - total)
+        tickets.renderizar(datos, ruta, "termico")  # la primera vez arma las plantillas e importa reportlab
+        tickets.renderizar(datos, ruta, "a4")
+
+        for formato in ("termico", "a4"):
+            reps = max(50, 3000 // n)
+            antes = "—"
+            if formato == "termico":
+                ms, _ = medir(lambda: ticket_termico_anterior(database, venta_id, ruta), reps)
+                antes = f"{1000 / ms:.0f}"
+            generar = database.generar_ticket_termico if formato == "termico" else database.generar_ticket_a4
+            base, _ = medir(lambda: generar(venta_id, ruta), reps)
+            memoria, _ = medir(lambda: tickets.renderizar(datos, ruta, formato), reps)
+            hojas, alto = paginas(ruta)
+            print(f"{n:>6}{formato:>9}{antes:>11}{1000 / base:>10.0f}{1000 / memoria:>13.0f}{hojas:>7}{alto:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_venta.py
+"""
+Latencia de registrar_venta (commit incluido) según el tamaño del carrito, comparada con el
+registro línea por línea anterior (SELECT + UPDATE + 2 INSERT por ítem).
+
+    python benchmarks/bench_venta.py [líneas...]   (por defecto 1 10 80 200)
+"""
+
+import random
+import sys
+from datetime import datetime
+
+from comun import base_temporal, poblar_catalogo, medir
+
+
+def venta_linea_por_linea(database, items):
+    """Registro previo al lote, para comparar: una ida a la base por sentencia y por ítem."""
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    total = round(sum(it["cantidad"] * it["precio_unitario"] for it in items), 2)
+    with database.transaccion() as cur:
+        cur.execute(
+            "INSERT INTO ventas (fecha, tipo_pago, estado, total, cliente) VALUES (?, 'Efectivo', 'PAGADO', ?, '')",
+            (fecha, total),
+        )
+        venta_id = cur.lastrowid
+        for it in items:
+            pid, cant, precio = it["producto_id"], it["cantidad"], it["precio_unitario"]
+            actual = cur.execute("SELECT cantidad, precio FROM productos WHERE id=?", (pid,)).fetchone()[0]
+            cur.execute("UPDATE productos SET cantidad=? WHERE id=?", (actual - cant, pid))
+            cur.execute(
+                "INSERT INTO venta_items (venta_id, producto_id, cantidad, precio_unitario, subtotal) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (venta_id, pid, cant, precio, round(cant * precio, 2)),
+            )
+            cur.execute(
+                "INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles) "
+                "VALUES (?, 'VENTA', ?, ?, ?, ?)",
+                (pid, -cant, precio, fecha, f"Venta ID {venta_id}"),
+            )
+
+
+def main():
+    lineas = [int(a) for a in sys.argv[1:]] or [1, 10, 80, 200]
+    database = base_temporal()
+    poblar_catalogo(database, 20_000)
+    with database.transaccion() as cur:
+        cur.execute("UPDATE productos SET cantidad = 1000000000")
+    ids = [r[0] for r in database.get_connection().execute("SELECT id FROM productos")]
+    rnd = random.Random(7)
+
+    print(f"{'líneas':>8}{'lote med/p95 ms':>20}{'por línea med/p95 ms':>26}")
+    for n in lineas:
+        items = [
+            {"producto_id": pid, "cantidad": rnd.randint(1, 12), "precio_unitario": 100.0} for pid in rnd.sample(ids, n)
+        ]
+        ok, info = database.registrar_venta(items, "Efectivo")
+        if not ok:
+            raise SystemExit(f"registrar_venta falló: {info}")
+        lote = medir(lambda: database.registrar_venta(items, "Efectivo"), 30)
+        viejo = medir(lambda: venta_linea_por_linea(database, items), 30)
+        print(f"{n:>8}{lote[0]:>11.2f}/{lote[1]:<8.2f}{viejo[0]:>15.2f}/{viejo[1]:<8.2f}")
+
+
+if __name__ == "__main__":
+    main()
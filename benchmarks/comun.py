@@ -0,0 +1,144 @@
+# benchmarks/comun.py
+"""Utilidades compartidas por los benchmarks: base temporal, catálogo sintético y medición."""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PALABRAS = [
+    "Arroz",
+    "Fideos",
+    "Yerba",
+    "Azucar",
+    "Harina",
+    "Aceite",
+    "Leche",
+    "Queso",
+    "Jamon",
+    "Salame",
+    "Galletitas",
+    "Gaseosa",
+    "Agua",
+    "Cerveza",
+    "Vino",
+    "Cafe",
+    "Te",
+    "Mate",
+    "Dulce",
+    "Mermelada",
+    "Pan",
+    "Facturas",
+    "Manteca",
+    "Crema",
+    "Yogur",
+    "Detergente",
+    "Lavandina",
+    "Jabon",
+    "Shampoo",
+    "Papel",
+]
+VARIANTES = ["Clasico", "Light", "Integral", "Premium", "Familiar", "Suave", "Extra", "Natural", "Dulce", "Sin TACC"]
+MARCAS = [
+    "La Serenisima",
+    "Arcor",
+    "Molinos",
+    "Marolio",
+    "Ledesma",
+    "Taragui",
+    "Quilmes",
+    "Cocinero",
+    "Knorr",
+    "Bagley",
+]
+
+
+def base_temporal():
+    """
+    Apunta la app a una carpeta temporal ANTES de importar database (DATA_DIR sale de PROGRAMDATA)
+    y devuelve el módulo con la base ya inicializada. Nunca toca la base real: los tickets
+    (tickets.carpeta_tickets) y los backups también quedan dentro de esa carpeta.
+    """
+    os.environ["PROGRAMDATA"] = tempfile.mkdtemp(prefix="bench_gestor_")
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    import database
+
+    database.inicializar_db()
+    return database
+
+
+def poblar_catalogo(database, n, semilla=42, desde=0):
+    """
+    Inserta n productos sintéticos (código, nombre, barcode EAN-13 único) en una sola transacción.
+    `desde` desplaza la numeración para poder agrandar un catálogo ya poblado.
+    """
+    rnd = random.Random(semilla)
+    sectores = [s[0] for s in database.obtener_sectores()]
+    filas = []
+    for i in range(desde, desde + n):
+        nombre = f"{rnd.choice(PALABRAS)} {rnd.choice(MARCAS)} {rnd.choice(VARIANTES)} {rnd.randint(100, 2000)}g"
+        costo = round(rnd.uniform(50, 5000), 2)
+        filas.append(
+            (
+                f"P{i:06d}",
+                nombre,
+                rnd.randint(0, 200),
+                costo,
+                rnd.choice(sectores),
+                round(costo * 1.3, 2),
+                f"779{i:010d}",
+            )
+        )
+    with database.transaccion() as cur:
+        cur.executemany(
+            "INSERT INTO productos (codigo, nombre, cantidad, costo, sector_id, precio, codigo_barras, movimientos) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            filas,
+        )
+    return filas
+
+
+def medir(fn, repeticiones=50):
+    """Ejecuta fn() varias veces y devuelve (mediana_ms, p95_ms)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1]
+
+
+def poblar_ventas(database, n, dias=730, semilla=7):
+    """
+    Inserta n ventas sintéticas (1 a 5 ítems del catálogo ya poblado) repartidas en los últimos `dias` días,
+    directo en las tablas y en una sola transacción; después reconstruye el resumen diario.
+    """
+    from datetime import datetime, timedelta
+
+    rnd = random.Random(semilla)
+    productos = database.get_connection().execute("SELECT id, precio, costo FROM productos").fetchall()
+    hoy = datetime.now().replace(microsecond=0)
+    tipos = ["Efectivo", "Transferencia", "QR", "Pendiente"]
+    with database.transaccion() as cur:
+        for _ in range(n):
+            fecha = hoy - timedelta(seconds=rnd.randint(0, dias * 86400))
+            tipo = rnd.choice(tipos)
+            items = [(p, rnd.randint(1, 6)) for p in rnd.sample(productos, rnd.randint(1, 5))]
+            total = round(sum(precio * cant for (_, precio, _), cant in items), 2)
+            cur.execute(
+                "INSERT INTO ventas (fecha, tipo_pago, estado, total, cliente) VALUES (?, ?, ?, ?, '')",
+                (fecha.strftime("%Y-%m-%d %H:%M:%S"), tipo, "PENDIENTE" if tipo == "Pendiente" else "PAGADO", total),
+            )
+            venta_id = cur.lastrowid
+            cur.executemany(
+                "INSERT INTO venta_items (venta_id, producto_id, cantidad, precio_unitario, subtotal, costo_unitario) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(venta_id, pid, cant, precio, round(precio * cant, 2), costo) for (pid, precio, costo), cant in items],
+            )
+    database.reconstruir_ventas_diarias()
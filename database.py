@@ -1,16 +1,14 @@
 # database.py
 import sqlite3
 from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, numbers
-from openpyxl.chart import PieChart, Reference
-from openpyxl.utils import get_column_letter
-from openpyxl.chart.label import DataLabelList
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from datetime import datetime
+# openpyxl / reportlab / pandas se importan dentro de las funciones que los usan: cargarlos al inicio
+# demoraba varios segundos la aparición del login en las PCs viejas
+from datetime import datetime, date, timedelta
+import json
 import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 import os as _os, hashlib as _hashlib, binascii as _binascii
 
@@ -92,14 +90,258 @@ DATA_DIR = _get_progdata()
 _migrar_a(DATA_DIR)
 
 DB_PATH = os.path.join(DATA_DIR, "almacen.db")
+# Historial viejo (movimientos, ventas cerradas) movido por archivar_historial(); se adjunta como "archivo"
+ARCHIVO_PATH = os.path.join(DATA_DIR, "almacen_archivo.db")
+HORIZONTE_ARCHIVO_DIAS = 365
 
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+# -----------------------------
+# Conexiones (una por hilo, de larga vida)
+# -----------------------------
+# Sentencias preparadas que cada conexión mantiene en caché (sqlite3 las reutiliza por texto SQL)
+SENTENCIAS_EN_CACHE = 256
+
+# Perfil de PRAGMAs aplicado a cada conexión nueva (el orden importa: journal_mode primero).
+# Para medir cada opción se puede pisar por entorno, p. ej.:
+#   GESTOR_PRAGMAS="journal_mode=DELETE,synchronous=FULL,mmap_size=0"
+# o en caliente con configurar_pragmas(synchronous="FULL").
+PERFIL_PRAGMAS = {
+    "journal_mode": "WAL",  # los lectores no se bloquean mientras se registra una venta
+    "synchronous": "NORMAL",  # en WAL sigue siendo seguro ante cortes de luz (solo se pierde el último commit)
+    "cache_size": -32000,  # negativo = KiB → ~32 MB de caché de páginas
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # ms a esperar si otra conexión tiene el lock de escritura
+}
+
+
+def _perfil_desde_entorno():
+    txt = os.environ.get("GESTOR_PRAGMAS", "").strip()
+    for par in filter(None, (p.strip() for p in txt.split(","))):
+        nombre, _, valor = par.partition("=")
+        if nombre.strip() and valor.strip():
+            PERFIL_PRAGMAS[nombre.strip()] = valor.strip()
+
+
+_perfil_desde_entorno()
+
+_hilo = threading.local()
+_conexiones_lock = threading.Lock()
+_generacion = 0  # se incrementa en cerrar_conexiones(); invalida las conexiones guardadas en cada hilo
+_ultima_escritura = 0.0  # time.monotonic() del último commit (lo usa el planificador de checkpoints)
+
+
+class _ConexionCompartida(sqlite3.Connection):
+    """
+    Conexión reutilizada por todas las funciones del mismo hilo.
+    close() NO cierra el archivo ni toca la transacción: la conexión es compartida y una función que
+    termina puede estar dentro de otra que todavía no confirmó. Lo que quede a medias por una excepción
+    se descarta en el manejo del error (descartar_pendiente). El cierre real es cerrar_conexion_hilo().
+    """
+
+    def close(self):
+        pass
+
+    def commit(self):
+        global _ultima_escritura
+        super().commit()
+        _ultima_escritura = time.monotonic()
+
+    def _cerrar(self):
+        super().close()
+
+
+def _abrir_conexion():
+    # cada conexión se usa (y se cierra) únicamente desde el hilo que la abrió
+    conn = sqlite3.connect(DB_PATH, factory=_ConexionCompartida, cached_statements=SENTENCIAS_EN_CACHE)
     conn.execute("PRAGMA foreign_keys = ON")
+    for nombre, valor in PERFIL_PRAGMAS.items():
+        conn.execute(f"PRAGMA {nombre} = {valor}")
+    _hilo.archivo = _adjuntar_archivo(conn)
+    _hilo.conn = conn
+    _hilo.ruta = DB_PATH
+    _hilo.generacion = _generacion
+    return conn
+
+
+# Vistas TEMP (por conexión) que unen la tabla viva con su parte archivada. Las consultas que pueden cruzar
+# el horizonte de archivo leen de acá; las de todos los días siguen sobre las tablas vivas.
+VISTAS_HISTORICAS = {
+    "movimientos": "movimientos_todos",
+    "ventas": "ventas_todas",
+    "venta_items": "venta_items_todos",
+    "cobros": "cobros_todos",
+}
+
+
+def _adjuntar_archivo(conn):
+    """Adjunta ARCHIVO_PATH (si existe) y crea las vistas históricas. Devuelve True si quedó adjunto."""
+    adjunto = os.path.exists(ARCHIVO_PATH)
+    if adjunto:
+        conn.execute("ATTACH DATABASE ? AS archivo", (ARCHIVO_PATH,))
+    for tabla, vista in VISTAS_HISTORICAS.items():
+        sql = f"SELECT * FROM main.{tabla}"
+        if adjunto:
+            sql += f" UNION ALL SELECT * FROM archivo.{tabla}"
+        conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS {vista} AS {sql}")
+    return adjunto
+
+
+def get_connection():
+    """Devuelve la conexión abierta del hilo actual (la crea la primera vez)."""
+    conn = getattr(_hilo, "conn", None)
+    if conn is None or _hilo.ruta != DB_PATH or _hilo.generacion != _generacion:
+        if conn is not None:
+            cerrar_conexion_hilo()
+        return _abrir_conexion()
     return conn
 
 
+def descartar_pendiente(motivo="error"):
+    """
+    Revierte (y avisa) lo que la conexión del hilo tenga sin confirmar fuera de transaccion(): escrituras
+    de una función que terminó con excepción antes de su commit(). Se llama desde el manejo de errores
+    (excepthook de la interfaz, hilos de fondo), nunca al pedir la conexión. Devuelve True si revirtió algo.
+    """
+    conn = getattr(_hilo, "conn", None)
+    if conn is None or not conn.in_transaction or getattr(_hilo, "en_transaccion", False):
+        return False
+    print(f"⚠️ Se descartan cambios sin confirmar en la base ({motivo})")
+    conn.rollback()
+    return True
+
+
+@contextmanager
+def transaccion(inmediata=False):
+    """
+    Bloque transaccional sobre la conexión del hilo:
+
+        with transaccion() as cur:
+            cur.execute(...)
+
+    Confirma al salir sin errores y revierte ante cualquier excepción.
+    inmediata=True toma el lock de escritura al empezar (BEGIN IMMEDIATE).
+    Un bloque anidado se suma a la transacción exterior, y también a la implícita de una función
+    que escribió con conn.execute() y todavía no hizo su commit(): confirma ella.
+    """
+    conn = get_connection()
+    if getattr(_hilo, "en_transaccion", False) or conn.in_transaction:
+        yield conn.cursor()
+        return
+    conn.execute("BEGIN IMMEDIATE" if inmediata else "BEGIN")
+    _hilo.en_transaccion = True
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _hilo.en_transaccion = False
+
+
+def cerrar_conexion_hilo():
+    """Cierra la conexión del hilo actual (para hilos de trabajo que terminan)."""
+    conn = getattr(_hilo, "conn", None)
+    _hilo.conn = None
+    if conn is None:
+        return
+    if conn.in_transaction:
+        print("⚠️ Se descartan cambios sin confirmar al cerrar la conexión del hilo")
+    try:
+        conn._cerrar()
+    except Exception:
+        pass
+
+
+def cerrar_conexiones():
+    """
+    Cierra la conexión del hilo actual e invalida las de los demás (hook de salida de la aplicación).
+    Las de otros hilos no se cierran desde acá: pueden estar en medio de una escritura. Cada hilo cierra
+    la suya al terminar (cerrar_conexion_hilo) o la reabre en su próximo get_connection(); por eso los
+    hilos de fondo (tareas, cola de impresión, checkpoints) se detienen antes de llamar a esta función.
+    """
+    global _generacion
+    with _conexiones_lock:
+        _generacion += 1
+    cerrar_conexion_hilo()
+    catalogo.cerrar()
+
+
+def configurar_pragmas(**pragmas):
+    """
+    Cambia el perfil de PRAGMAs (p. ej. configurar_pragmas(synchronous="FULL", mmap_size=0)).
+    Invalida las conexiones abiertas para que cada hilo reabra la suya con el perfil nuevo.
+    """
+    PERFIL_PRAGMAS.update(pragmas)
+    cerrar_conexiones()
+
+
+class PlanificadorCheckpoint(threading.Thread):
+    """
+    Hilo de fondo que vuelca el WAL a la base cuando la app está ociosa,
+    para que el archivo almacen.db-wal no crezca sin límite.
+    - PASSIVE: no bloquea a nadie; copia lo que puede.
+    - TRUNCATE: cuando el -wal supera limite_wal, además lo deja en 0 bytes.
+    """
+
+    def __init__(self, intervalo=30.0, ocioso=5.0, limite_wal=16 * 1024 * 1024):
+        super().__init__(name="checkpoint-wal", daemon=True)
+        self.intervalo = intervalo
+        self.ocioso = ocioso
+        self.limite_wal = limite_wal
+        self._parar = threading.Event()
+
+    def run(self):
+        try:
+            while not self._parar.wait(self.intervalo):
+                if time.monotonic() - _ultima_escritura < self.ocioso:
+                    continue  # hay actividad: esperamos al próximo ciclo
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    print("⚠️ Checkpoint WAL falló:", e)
+        finally:
+            cerrar_conexion_hilo()
+
+    def checkpoint(self):
+        wal = DB_PATH + "-wal"
+        tam = os.path.getsize(wal) if os.path.exists(wal) else 0
+        if tam == 0:
+            return None
+        modo = "TRUNCATE" if tam > self.limite_wal else "PASSIVE"
+        return get_connection().execute(f"PRAGMA wal_checkpoint({modo})").fetchone()
+
+    def detener(self, timeout=5.0):
+        self._parar.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+_planificador_checkpoint = None
+
+
+def iniciar_checkpoints(**opciones):
+    """Arranca (una sola vez) el planificador de checkpoints del WAL."""
+    global _planificador_checkpoint
+    if _planificador_checkpoint is None or not _planificador_checkpoint.is_alive():
+        _planificador_checkpoint = PlanificadorCheckpoint(**opciones)
+        _planificador_checkpoint.start()
+    return _planificador_checkpoint
+
+
+def detener_checkpoints():
+    global _planificador_checkpoint
+    if _planificador_checkpoint is not None:
+        _planificador_checkpoint.detener()
+        _planificador_checkpoint = None
+
+
+def segundos_sin_escrituras():
+    """Segundos desde el último commit de la app (para postergar mantenimiento mientras se está vendiendo)."""
+    return time.monotonic() - _ultima_escritura
+
+
 def _migrar_db_si_corresponde():
     """
     Si existe 'almacen.db' junto al código/ejecutable (instalaciones viejas) y NO existe en DATA_DIR,
@@ -121,11 +363,8 @@ def _migrar_db_si_corresponde():
 # -----------------------------
 # Inicialización / migración
 # -----------------------------
-def inicializar_db():
-    _migrar_db_si_corresponde()
-    conn = get_connection()
-    cur = conn.cursor()
-
+def _migracion_1_esquema_base(cur):
+    """Esquema original + semillas. Es idempotente: en DBs previas al versionado solo completa lo que falte."""
     # Tabla sectores (si no existe)
     cur.execute(
         """
@@ -330,17 +569,208 @@ def inicializar_db():
         if not cur.fetchone():
             cur.execute(
                 "INSERT INTO usuarios (usuario,password,rol) VALUES (?,?,?)",
-                ("admin", _hash_password("admin"), "admin"),
+                ("admin", _hash_password("admin", ITERACIONES_CLAVE_POR_DEFECTO), "admin"),
             )
         cur.execute("SELECT 1 FROM usuarios WHERE usuario='developer'")
         if not cur.fetchone():
             cur.execute(
                 "INSERT INTO usuarios (usuario,password,rol) VALUES (?,?,?)",
-                ("developer", _hash_password("developer"), "developer"),
+                ("developer", _hash_password("developer", ITERACIONES_CLAVE_POR_DEFECTO), "developer"),
             )
     except Exception as e:
         print("⚠️ No se pudo asegurar usuarios por defecto:", e)
 
+    _asegurar_indice_barcode(cur)
+
+
+def _migracion_2_indices(cur):
+    """Índices secundarios para las consultas calientes (historial, ventas, deudores, gastos, cobros)."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mov_producto ON movimientos(producto_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mov_fecha ON movimientos(fecha)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ventas_estado_cliente ON ventas(estado, cliente_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_venta_items_venta ON venta_items(venta_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_gastos_tipo_fecha ON gastos(tipo, fecha)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cobros_venta ON cobros(venta_id)")
+
+
+def _migracion_3_busqueda_fts(cur):
+    """
+    Índice FTS5 (tokenizer trigram = búsqueda por subcadena) sincronizado con productos por triggers.
+    Si el SQLite instalado no trae FTS5/trigram se omite y buscar_productos sigue usando LIKE.
+    """
+    try:
+        cur.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+                nombre, codigo, codigo_barras,
+                content='productos', content_rowid='id', tokenize='trigram'
+            )
+        """
+        )
+    except sqlite3.OperationalError as e:
+        print("⚠️ FTS5 no disponible, la búsqueda seguirá con LIKE:", e)
+        return
+
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts(rowid, nombre, codigo, codigo_barras)
+            VALUES (new.id, new.nombre, new.codigo, new.codigo_barras);
+        END
+    """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts(productos_fts, rowid, nombre, codigo, codigo_barras)
+            VALUES ('delete', old.id, old.nombre, old.codigo, old.codigo_barras);
+        END
+    """
+    )
+    # Solo cuando cambian columnas buscables: los movimientos de stock no tocan el índice
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF nombre, codigo, codigo_barras ON productos
+        BEGIN
+            INSERT INTO productos_fts(productos_fts, rowid, nombre, codigo, codigo_barras)
+            VALUES ('delete', old.id, old.nombre, old.codigo, old.codigo_barras);
+            INSERT INTO productos_fts(rowid, nombre, codigo, codigo_barras)
+            VALUES (new.id, new.nombre, new.codigo, new.codigo_barras);
+        END
+    """
+    )
+    cur.execute("INSERT INTO productos_fts(productos_fts) VALUES ('rebuild')")
+
+
+def _migracion_4_indices_nocase(cur):
+    """Índices insensibles a mayúsculas para resolver código interno / barcode escaneado con una búsqueda."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_prod_codigo_nocase ON productos(codigo COLLATE NOCASE)")
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_prod_barcode_nocase
+        ON productos(codigo_barras COLLATE NOCASE)
+        WHERE codigo_barras IS NOT NULL
+    """
+    )
+
+
+def _migracion_5_ventas_diarias(cur):
+    """Costo del ítem al momento de la venta y resumen diario de ventas (ver reconstruir_ventas_diarias)."""
+    cols = [r[1] for r in cur.execute("PRAGMA table_info(venta_items)").fetchall()]
+    if "costo_unitario" not in cols:
+        cur.execute("ALTER TABLE venta_items ADD COLUMN costo_unitario REAL")
+        # ventas anteriores: el costo de ese momento no se guardó, usamos el costo actual del producto
+        cur.execute(
+            "UPDATE venta_items SET costo_unitario = "
+            "(SELECT costo FROM productos p WHERE p.id = venta_items.producto_id)"
+        )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ventas_diarias (
+            dia TEXT NOT NULL,
+            tipo_pago TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            ventas INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0,
+            costo REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, tipo_pago, estado)
+        ) WITHOUT ROWID
+    """
+    )
+    _reconstruir_ventas_diarias(cur)
+
+
+def _migracion_6_stock_historico(cur):
+    """Índice (producto_id, id, cambio) del libro de movimientos y fotos periódicas del stock (stock_snapshots)."""
+    # cubre las sumas de "cambio" por producto y rango de ids; reemplaza al índice simple por producto
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_mov_producto_id ON movimientos(producto_id, id, cambio)")
+    cur.execute("DROP INDEX IF EXISTS idx_mov_producto")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            producto_id INTEGER NOT NULL,
+            movimiento_id INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            costo REAL,
+            PRIMARY KEY (producto_id, movimiento_id)
+        ) WITHOUT ROWID
+    """
+    )
+
+
+def _migracion_7_movimientos_mensuales(cur):
+    """Resumen mensual (por producto y tipo) de los movimientos que archivar_historial() saca de la base viva."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS movimientos_mensuales (
+            mes TEXT NOT NULL,
+            producto_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            movimientos INTEGER NOT NULL DEFAULT 0,
+            cambio INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, producto_id, tipo)
+        ) WITHOUT ROWID
+    """
+    )
+
+
+def _migracion_8_cola_impresion(cur):
+    """Cola de impresión de tickets: sobrevive a un cierre de la app con tickets todavía sin imprimir."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cola_impresion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            venta_id INTEGER,
+            formato TEXT NOT NULL,
+            datos TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'PENDIENTE',
+            intentos INTEGER NOT NULL DEFAULT 0,
+            proximo_intento TEXT NOT NULL,
+            ruta TEXT,
+            error TEXT,
+            creado TEXT NOT NULL,
+            actualizado TEXT
+        )
+    """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cola_estado ON cola_impresion(estado, proximo_intento)")
+
+
+def _migracion_9_cambios_catalogo(cur):
+    """
+    Registro de productos cambiados (lo llenan triggers): el catálogo en memoria relee solo esos ids, sin
+    importar qué conexión o instancia de la app escribió, y no se entera de escrituras que no tocan productos.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS catalogo_cambios (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            producto_id INTEGER NOT NULL
+        )
+    """
+    )
+    disparadores = {
+        "trg_catalogo_ins": "AFTER INSERT ON productos BEGIN "
+        "INSERT INTO catalogo_cambios (producto_id) VALUES (NEW.id); END",
+        "trg_catalogo_upd": "AFTER UPDATE ON productos BEGIN "
+        "INSERT INTO catalogo_cambios (producto_id) VALUES (NEW.id); "
+        "INSERT INTO catalogo_cambios (producto_id) SELECT OLD.id WHERE OLD.id <> NEW.id; END",
+        "trg_catalogo_del": "AFTER DELETE ON productos BEGIN "
+        "INSERT INTO catalogo_cambios (producto_id) VALUES (OLD.id); END",
+        # el nombre del sector viaja en cada fila del catálogo
+        "trg_catalogo_sector_upd": "AFTER UPDATE OF nombre ON sectores BEGIN "
+        "INSERT INTO catalogo_cambios (producto_id) SELECT id FROM productos WHERE sector_id = NEW.id; END",
+        "trg_catalogo_sector_del": "AFTER DELETE ON sectores BEGIN "
+        "INSERT INTO catalogo_cambios (producto_id) SELECT id FROM productos WHERE sector_id = OLD.id; END",
+    }
+    for nombre, cuerpo in disparadores.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {nombre} {cuerpo}")
+
+
+def _asegurar_indice_barcode(cur):
     # --- Índice único condicional para código de barras (evita duplicados no nulos) ---
     try:
         cur.execute(
@@ -355,14 +785,177 @@ def inicializar_db():
         # La app sigue funcionando; al depurar duplicados, se creará en el próximo arranque.
         pass
 
-    conn.commit()
-    conn.close()
+
+# Migraciones en orden: (versión, función). PRAGMA user_version guarda la última aplicada,
+# así cada una corre UNA sola vez por base. Para cambios nuevos: agregar al final, nunca editar las viejas.
+MIGRACIONES = [
+    (1, _migracion_1_esquema_base),
+    (2, _migracion_2_indices),
+    (3, _migracion_3_busqueda_fts),
+    (4, _migracion_4_indices_nocase),
+    (5, _migracion_5_ventas_diarias),
+    (6, _migracion_6_stock_historico),
+    (7, _migracion_7_movimientos_mensuales),
+    (8, _migracion_8_cola_impresion),
+    (9, _migracion_9_cambios_catalogo),
+]
+
+
+def version_esquema():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def inicializar_db():
+    _migrar_db_si_corresponde()
+    actual = version_esquema()
+    for version, migracion in MIGRACIONES:
+        if version <= actual:
+            continue
+        with transaccion(inmediata=True) as cur:
+            migracion(cur)
+            cur.execute(f"PRAGMA user_version = {version}")
+
+    # Si una migración agregó columnas, el archivo (si existe) tiene que seguir el mismo esquema
+    if os.path.exists(ARCHIVO_PATH):
+        _preparar_esquema_archivo()
+
+    # El índice de barcode puede haber fallado por duplicados: reintentamos solo si todavía falta
+    conn = get_connection()
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_prod_barcode'").fetchone():
+        with transaccion() as cur:
+            _asegurar_indice_barcode(cur)
+
+    # El registro de cambios del catálogo solo hace falta hacia adelante: se poda lo viejo
+    limite = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM catalogo_cambios").fetchone()[0]
+    limite -= CATALOGO_CAMBIOS_RETENIDOS
+    if conn.execute("SELECT 1 FROM catalogo_cambios WHERE seq <= ? LIMIT 1", (limite,)).fetchone():
+        with transaccion() as cur:
+            cur.execute("DELETE FROM catalogo_cambios WHERE seq <= ?", (limite,))
 
 
 # Alias
 init_db = inicializar_db
 
 
+# Consultas calientes que deben resolverse con índice (ver planes_sin_indice()).
+# (sql, parámetros de ejemplo, tablas/alias que SÍ pueden recorrerse completos). sql puede ser una función
+# que arma el texto tal como lo ejecuta la app (p. ej. según esté adjunto o no el archivo histórico).
+# EXPLAIN QUERY PLAN no depende de los valores de los parámetros.
+CONSULTAS_CRITICAS = {
+    "obtener_items_venta": (
+        "SELECT vi.id, vi.producto_id, p.nombre, vi.cantidad, vi.precio_unitario, vi.subtotal "
+        "FROM venta_items vi JOIN productos p ON p.id = vi.producto_id WHERE vi.venta_id = ?",
+        (1,),
+        (),
+    ),
+    "obtener_clientes_con_saldo": (
+        "SELECT c.id, c.nombre, COALESCE(SUM(v.total),0) as deuda, COUNT(v.id) as cant_pendientes "
+        "FROM clientes c LEFT JOIN ventas v ON v.cliente_id = c.id AND v.estado='PENDIENTE' "
+        "GROUP BY c.id ORDER BY deuda DESC",
+        (),
+        ("c",),  # se listan todos los clientes; lo caro (ventas) va por índice
+    ),
+    "obtener_ventas_pendientes": ("SELECT id FROM ventas WHERE estado = ?", ("PENDIENTE",), ()),
+    "obtener_gastos": (
+        "SELECT id, fecha, categoria, monto, detalle FROM gastos WHERE tipo=? ORDER BY fecha DESC",
+        ("almacen",),
+        (),
+    ),
+    "movimientos_desde": (
+        "SELECT m.id, p.nombre FROM movimientos m LEFT JOIN productos p ON p.id = m.producto_id "
+        "WHERE m.id > ? ORDER BY m.id DESC LIMIT ?",
+        (100, 300),
+        (),
+    ),
+    "movimientos_por_producto": ("SELECT id, cambio FROM movimientos WHERE producto_id = ?", (1,), ()),
+    "stock_delta_producto": (
+        "SELECT COALESCE(SUM(cambio), 0) FROM movimientos_todos WHERE producto_id = ? AND id > ? AND id <= ?",
+        (1, 10, 20),
+        ("movimientos_todos",),  # con el archivo adjunto recorre la vista ya filtrada por índice en cada base
+    ),
+    "stock_snapshot_previo": (
+        "SELECT movimiento_id, cantidad, costo FROM stock_snapshots "
+        "WHERE producto_id = ? AND movimiento_id <= ? ORDER BY movimiento_id DESC LIMIT 1",
+        (1, 20),
+        (),
+    ),
+    "corte_movimientos": (
+        "SELECT id FROM movimientos WHERE fecha < ? ORDER BY fecha DESC, id DESC LIMIT 1",
+        ("2024-02-01",),
+        (),
+    ),
+    "movimientos_por_fecha": (
+        "SELECT id FROM movimientos WHERE fecha >= ? AND fecha < ?",
+        ("2024-01-01", "2024-02-01"),
+        (),
+    ),
+    "cobros_de_venta": ("SELECT id, monto FROM cobros WHERE venta_id = ?", (1,), ()),
+    "cambios_catalogo": (
+        "SELECT seq, producto_id FROM catalogo_cambios WHERE seq > ? ORDER BY seq LIMIT ?",
+        (100, 2001),
+        (),
+    ),
+    "siguiente_impresion": (
+        "SELECT id FROM cola_impresion WHERE estado = 'PENDIENTE' AND proximo_intento <= ? "
+        "ORDER BY proximo_intento, id LIMIT 1",
+        ("2024-01-01 00:00:00",),
+        (),
+    ),
+    "lookup_producto": (
+        "SELECT p.id FROM productos p WHERE p.codigo_barras = ? COLLATE NOCASE OR p.codigo = ? COLLATE NOCASE",
+        ("7790000000001", "7790000000001"),
+        (),
+    ),
+    "obtener_ventas_por_fecha": (
+        "SELECT v.id, v.fecha, v.total FROM ventas v WHERE v.fecha >= ? AND v.fecha < ? ORDER BY v.fecha DESC",
+        ("2024-01-01", "2024-02-01"),
+        (),
+    ),
+    "ventas_con_detalles": (
+        lambda: _sql_ventas_con_detalles(" AND fecha >= ? AND fecha < ?"),
+        ("2024-01-01", "2024-02-01", 100),
+        ("v",),  # la CTE ya viene filtrada y limitada
+    ),
+    "ventas_pagina": (
+        "SELECT id, fecha, tipo_pago, estado, total FROM ventas WHERE id < ? ORDER BY id DESC LIMIT ?",
+        (1000, 200),
+        (),
+    ),
+    "ventas_pagina_fecha": (
+        "SELECT id, fecha, tipo_pago, estado, total FROM ventas WHERE fecha >= ? AND fecha < ? AND id < ? "
+        "ORDER BY id DESC LIMIT ?",
+        ("2024-01-01", "2024-02-01", 1000, 200),
+        (),
+    ),
+    "ventas_resumen_por_tipo": (
+        "SELECT tipo_pago, SUM(total), COUNT(*) FROM ventas WHERE fecha >= ? AND fecha < ? GROUP BY tipo_pago",
+        ("2024-01-01", "2024-02-01"),
+        (),
+    ),
+    "obtener_resumen_gastos": (
+        "SELECT categoria, SUM(monto) FROM gastos WHERE tipo=? AND fecha >= ? AND fecha < ? GROUP BY categoria",
+        ("almacen", "2024-01-01", "2024-02-01"),
+        (),
+    ),
+}
+
+
+def planes_sin_indice():
+    """
+    Corre EXPLAIN QUERY PLAN sobre CONSULTAS_CRITICAS y devuelve {nombre: [pasos del plan]}
+    de las que recorren completa una tabla no permitida. Dict vacío = todas usan índice.
+    """
+    conn = get_connection()
+    problemas = {}
+    for nombre, (sql, params, permitidos) in CONSULTAS_CRITICAS.items():
+        if callable(sql):
+            sql = sql()
+        pasos = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        if any(p.startswith("SCAN ") and p.split()[1] not in permitidos for p in pasos):
+            problemas[nombre] = pasos
+    return problemas
+
+
 # -----------------------------
 # SECTORES
 # -----------------------------
@@ -389,6 +982,7 @@ def editar_sector(id_sector, nombre, margen):
     cur.execute("UPDATE sectores SET nombre=?, margen=? WHERE id=?", (nombre, margen, id_sector))
     conn.commit()
     conn.close()
+    catalogo.invalidar()  # el nombre del sector viaja en cada fila del catálogo
 
 
 def eliminar_sector(id_sector):
@@ -397,6 +991,7 @@ def eliminar_sector(id_sector):
     cur.execute("DELETE FROM sectores WHERE id=?", (id_sector,))
     conn.commit()
     conn.close()
+    catalogo.invalidar()
 
 
 def obtener_margen_sector(id_sector):
@@ -410,6 +1005,19 @@ def obtener_margen_sector(id_sector):
     return row[0] if row else 0.0
 
 
+def actualizar_precios_sector(sector_id):
+    """Recalcula el precio de todos los productos del sector con su margen actual."""
+    margen = obtener_margen_sector(sector_id)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, costo FROM productos WHERE sector_id=?", (sector_id,))
+    precios = [(round((costo or 0.0) * (1 + (margen or 0.0)), 2), pid) for pid, costo in cur.fetchall()]
+    cur.executemany("UPDATE productos SET precio=? WHERE id=?", precios)
+    conn.commit()
+    conn.close()
+    catalogo.actualizar(pid for _, pid in precios)
+
+
 # -----------------------------
 # MOVIMIENTOS
 # -----------------------------
@@ -442,6 +1050,297 @@ def obtener_movimientos(limit=100):
     return data
 
 
+def obtener_movimientos_desde(desde_id=0, limit=300):
+    """
+    Movimientos con id mayor a desde_id (los que todavía no se mostraron), del más nuevo al más viejo,
+    con el mismo formato que obtener_movimientos. Recorre solo la cola de la clave primaria.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT m.id, p.nombre, m.tipo, m.cambio, m.precio_unitario, m.fecha, m.detalles
+        FROM movimientos m
+        LEFT JOIN productos p ON p.id = m.producto_id
+        WHERE m.id > ?
+        ORDER BY m.id DESC
+        LIMIT ?
+    """,
+        (desde_id, limit),
+    )
+    data = cur.fetchall()
+    conn.close()
+    return data
+
+
+# -----------------------------
+# STOCK HISTÓRICO (snapshots + libro de movimientos)
+# -----------------------------
+# stock_snapshots guarda, por producto, la cantidad y el costo vigentes cuando el último movimiento registrado
+# era movimiento_id. El stock en cualquier fecha sale del snapshot más cercano más (o menos) la suma de
+# "cambio" de los movimientos que hay en el medio: un par de búsquedas en índices, nunca todo el historial.
+def tomar_snapshot_stock():
+    """
+    Foto del stock actual. Solo agrega filas para productos nuevos o cuya cantidad/costo cambió desde su
+    último snapshot (los demás siguen valiendo). Devuelve la cantidad de productos registrados.
+    """
+    with transaccion(inmediata=True) as cur:
+        corte = cur.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos").fetchone()[0]
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO stock_snapshots (producto_id, movimiento_id, fecha, cantidad, costo)
+            SELECT p.id, ?, ?, p.cantidad, p.costo
+            FROM productos p
+            LEFT JOIN (
+                SELECT producto_id, MAX(movimiento_id) AS mid FROM stock_snapshots GROUP BY producto_id
+            ) u ON u.producto_id = p.id
+            LEFT JOIN stock_snapshots s ON s.producto_id = p.id AND s.movimiento_id = u.mid
+            WHERE s.producto_id IS NULL OR s.cantidad != p.cantidad OR s.costo IS NOT p.costo
+        """,
+            (corte, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        return cur.rowcount
+
+
+def snapshot_stock_diario():
+    """Toma el snapshot del día si todavía no hay uno (la app lo pide apenas queda ociosa, antes del backup)."""
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    ultimo = get_connection().execute("SELECT MAX(fecha) FROM stock_snapshots").fetchone()[0]
+    if ultimo is None or ultimo < hoy:
+        return tomar_snapshot_stock()
+    return 0
+
+
+def _corte_movimientos(cur, fecha):
+    """Id del último movimiento hasta el cierre del día `fecha` (0 si no hay ninguno)."""
+    _, params = rango_fechas("fecha", None, fecha)
+    # lo archivado es siempre más viejo que lo vivo: solo se mira el archivo si en la base viva no hay nada
+    for tabla in ("main.movimientos", "archivo.movimientos") if getattr(_hilo, "archivo", False) else ("movimientos",):
+        fila = cur.execute(
+            f"SELECT id FROM {tabla} WHERE fecha < ? ORDER BY fecha DESC, id DESC LIMIT 1", params
+        ).fetchone()
+        if fila:
+            return fila[0]
+    return 0
+
+
+def _suma_cambios(cur, producto_id, desde_id, hasta_id):
+    """Suma de "cambio" del producto para movimientos con desde_id < id <= hasta_id."""
+    return cur.execute(
+        "SELECT COALESCE(SUM(cambio), 0) FROM movimientos_todos WHERE producto_id = ? AND id > ? AND id <= ?",
+        (producto_id, desde_id, hasta_id),
+    ).fetchone()[0]
+
+
+def _stock_en_corte(cur, producto_id, corte):
+    """(cantidad, costo del snapshot usado o None) del producto justo después del movimiento `corte`."""
+    previo = cur.execute(
+        "SELECT movimiento_id, cantidad, costo FROM stock_snapshots "
+        "WHERE producto_id = ? AND movimiento_id <= ? ORDER BY movimiento_id DESC LIMIT 1",
+        (producto_id, corte),
+    ).fetchone()
+    if previo:
+        return previo[1] + _suma_cambios(cur, producto_id, previo[0], corte), previo[2]
+    # sin snapshot anterior: hacia atrás desde el primero posterior (ancla el stock real aunque el libro
+    # viejo esté incompleto) o, si el producto nunca tuvo snapshot, el libro completo
+    siguiente = cur.execute(
+        "SELECT movimiento_id, cantidad, costo FROM stock_snapshots "
+        "WHERE producto_id = ? AND movimiento_id > ? ORDER BY movimiento_id LIMIT 1",
+        (producto_id, corte),
+    ).fetchone()
+    if siguiente:
+        return siguiente[1] - _suma_cambios(cur, producto_id, corte, siguiente[0]), siguiente[2]
+    return _suma_cambios(cur, producto_id, 0, corte), None
+
+
+def stock_en_fecha(producto_id, fecha):
+    """Stock del producto al cierre del día `fecha` ('YYYY-MM-DD' o date)."""
+    cur = get_connection().cursor()
+    return _stock_en_corte(cur, producto_id, _corte_movimientos(cur, fecha))[0]
+
+
+def valuacion_stock(fecha):
+    """
+    Stock valorizado al cierre del día `fecha`: [(producto_id, codigo, nombre, cantidad, costo)] y el total.
+    El costo es el del snapshot usado para ese producto (el costo vigente en esa época), o el actual si
+    el producto no tiene snapshots.
+    """
+    cur = get_connection().cursor()
+    corte = _corte_movimientos(cur, fecha)
+    filas = []
+    total = 0.0
+    for pid, codigo, nombre, costo_actual in cur.execute("SELECT id, codigo, nombre, costo FROM productos").fetchall():
+        cantidad, costo = _stock_en_corte(cur, pid, corte)
+        costo = costo_actual if costo is None else costo
+        filas.append((pid, codigo, nombre, cantidad, costo))
+        total += cantidad * (costo or 0.0)
+    return filas, round(total, 2)
+
+
+def auditar_stock():
+    """
+    Concilia productos.cantidad contra el libro (último snapshot + movimientos posteriores, o el libro
+    completo si no hay snapshot) en una sola pasada. Devuelve [(id, codigo, nombre, cantidad, esperado)]
+    con los productos que no coinciden.
+    """
+    cur = get_connection().cursor()
+    cur.execute(
+        """
+        WITH ultimo AS (
+            SELECT producto_id, MAX(movimiento_id) AS mid FROM stock_snapshots GROUP BY producto_id
+        ),
+        esperado AS (
+            SELECT p.id, p.codigo, p.nombre, p.cantidad,
+                   COALESCE(s.cantidad, 0) + (
+                       SELECT COALESCE(SUM(m.cambio), 0) FROM movimientos m
+                       WHERE m.producto_id = p.id AND m.id > COALESCE(u.mid, 0)
+                   ) AS esperado
+            FROM productos p
+            LEFT JOIN ultimo u ON u.producto_id = p.id
+            LEFT JOIN stock_snapshots s ON s.producto_id = p.id AND s.movimiento_id = u.mid
+        )
+        SELECT id, codigo, nombre, cantidad, esperado FROM esperado WHERE cantidad != esperado ORDER BY id
+    """
+    )
+    return cur.fetchall()
+
+
+# -----------------------------
+# ARCHIVO HISTÓRICO (almacen_archivo.db)
+# -----------------------------
+# archivar_historial() mueve a ARCHIVO_PATH los movimientos y las ventas cerradas (con ítems y cobros) más
+# viejos que el horizonte. En la base viva quedan los resúmenes: ventas_diarias, movimientos_mensuales y los
+# snapshots de stock. Las consultas que cruzan el horizonte leen las vistas de VISTAS_HISTORICAS.
+_INDICES_ARCHIVO = [
+    "CREATE INDEX IF NOT EXISTS idx_mov_producto_id ON movimientos(producto_id, id, cambio)",
+    "CREATE INDEX IF NOT EXISTS idx_mov_fecha ON movimientos(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_venta_items_venta ON venta_items(venta_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cobros_venta ON cobros(venta_id)",
+]
+
+
+def _preparar_esquema_archivo():
+    """
+    Crea (o completa) en ARCHIVO_PATH las tablas archivables con las mismas columnas y en el mismo orden
+    que en la base viva (las vistas históricas hacen SELECT * ... UNION ALL SELECT * ...). Sin claves
+    foráneas: lo archivado ya no cambia.
+    """
+    global _generacion
+    nuevo = not os.path.exists(ARCHIVO_PATH)
+    conn = sqlite3.connect(ARCHIVO_PATH)
+    try:
+        conn.execute("ATTACH DATABASE ? AS vivo", (DB_PATH,))
+        for tabla in VISTAS_HISTORICAS:
+            columnas = conn.execute(f"PRAGMA vivo.table_info({tabla})").fetchall()
+            existentes = {r[1] for r in conn.execute(f"PRAGMA main.table_info({tabla})")}
+            if not existentes:
+                ddl = ", ".join(
+                    f"{nombre} {tipo}" + (" PRIMARY KEY" if pk else "") for _, nombre, tipo, _, _, pk in columnas
+                )
+                conn.execute(f"CREATE TABLE main.{tabla} ({ddl})")
+            else:
+                for _, nombre, tipo, _, _, _ in columnas:
+                    if nombre not in existentes:
+                        conn.execute(f"ALTER TABLE main.{tabla} ADD COLUMN {nombre} {tipo}")
+        for sql in _INDICES_ARCHIVO:
+            conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+    if nuevo:
+        # las conexiones abiertas no tienen el archivo adjunto: se reabren en su próximo get_connection()
+        with _conexiones_lock:
+            _generacion += 1
+
+
+def archivar_historial(horizonte_dias=None, compactar=True, progreso=None):
+    """
+    Mueve al archivo los movimientos y las ventas cerradas (no PENDIENTE) anteriores a hoy - horizonte_dias
+    (por defecto HORIZONTE_ARCHIVO_DIAS). Antes toma un snapshot de stock, así stock_en_fecha y
+    auditar_stock siguen anclados. compactar=True hace VACUUM de la base viva para devolver el espacio.
+    progreso(filas), opcional, se llama después de cada tabla (ver ui_tareas).
+    Devuelve {"movimientos", "ventas", "venta_items", "cobros"} con las filas movidas, más "error_compactar":
+    None, o el motivo si el VACUUM no se pudo hacer (lo archivado queda igual; el espacio se recupera después).
+
+    En WAL, un COMMIT que toca dos bases no es atómico entre ellas: por eso se hace en dos pasos. Primero se
+    copia al archivo y se confirma; se verifica que esté todo allá, y recién entonces se borra de la base
+    viva en otra transacción que solo escribe en main. Si algo se corta en el medio, las filas quedan
+    duplicadas (nunca perdidas) y el próximo archivado termina el trabajo: la copia pisa lo que ya está y
+    el borrado es de lo que ya está en el archivo.
+    """
+    horizonte_dias = HORIZONTE_ARCHIVO_DIAS if horizonte_dias is None else horizonte_dias
+    _, params = rango_fechas("fecha", None, datetime.now().date() - timedelta(days=horizonte_dias + 1))
+    limite = params[0]  # primer día que queda en la base viva
+
+    _preparar_esquema_archivo()
+    tomar_snapshot_stock()
+
+    # 1) copia al archivo. movimientos: por id (el libro de stock se recorre por id), hasta el último anterior
+    # al límite; ventas cerradas con sus ítems y cobros (la tabla temporal vive en la conexión del hilo).
+    with transaccion(inmediata=True) as cur:
+        fila = cur.execute(
+            "SELECT id FROM main.movimientos WHERE fecha < ? ORDER BY fecha DESC, id DESC LIMIT 1", (limite,)
+        ).fetchone()
+        hasta_id = fila[0] if fila else 0
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS _ventas_a_archivar (id INTEGER PRIMARY KEY)")
+        cur.execute("DELETE FROM _ventas_a_archivar")
+        cur.execute(
+            "INSERT INTO _ventas_a_archivar SELECT id FROM main.ventas WHERE fecha < ? AND estado != 'PENDIENTE'",
+            (limite,),
+        )
+        filtros = {
+            "movimientos": f"id <= {int(hasta_id)}",
+            "cobros": "venta_id IN (SELECT id FROM _ventas_a_archivar)",
+            "venta_items": "venta_id IN (SELECT id FROM _ventas_a_archivar)",
+            "ventas": "id IN (SELECT id FROM _ventas_a_archivar)",
+        }
+        for tabla, filtro in filtros.items():
+            cur.execute(f"INSERT OR REPLACE INTO archivo.{tabla} SELECT * FROM main.{tabla} WHERE {filtro}")
+
+    # 2) verificación: todo lo que se va a borrar tiene que estar en el archivo (los ids son AUTOINCREMENT)
+    cur = get_connection().cursor()
+    for tabla, filtro in filtros.items():
+        faltan = cur.execute(
+            f"SELECT COUNT(*) FROM main.{tabla} WHERE {filtro} AND id NOT IN (SELECT id FROM archivo.{tabla})"
+        ).fetchone()[0]
+        if faltan:
+            raise RuntimeError(f"Archivo incompleto: {faltan} filas de {tabla} no se copiaron; no se borró nada")
+
+    # 3) borrado de la base viva (solo escribe en main), con el resumen mensual de los movimientos que salen
+    movidas = {}
+    with transaccion(inmediata=True) as cur:
+        for tabla, filtro in filtros.items():
+            filtro = f"{filtro} AND id IN (SELECT id FROM archivo.{tabla})"
+            if tabla == "movimientos":
+                cur.execute(
+                    f"""
+                    INSERT INTO movimientos_mensuales (mes, producto_id, tipo, movimientos, cambio)
+                    SELECT substr(fecha, 1, 7), COALESCE(producto_id, 0), tipo, COUNT(*), SUM(cambio)
+                    FROM main.movimientos WHERE {filtro}
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (mes, producto_id, tipo) DO UPDATE SET
+                        movimientos = movimientos + excluded.movimientos,
+                        cambio = cambio + excluded.cambio
+                """
+                )
+            # primero los hijos de ventas (claves foráneas): el orden de filtros ya es ese
+            cur.execute(f"DELETE FROM main.{tabla} WHERE {filtro}")
+            movidas[tabla] = cur.rowcount
+            if progreso and tabla in ("movimientos", "ventas"):
+                progreso(sum(movidas.values()))
+        cur.execute("DELETE FROM _ventas_a_archivar")
+
+    movidas["error_compactar"] = None
+    if compactar and any(movidas.values()):
+        try:
+            get_connection().execute("VACUUM main")
+        except sqlite3.OperationalError as e:
+            # otra conexión leyendo: el espacio se recupera en el próximo archivado
+            movidas["error_compactar"] = str(e)
+    return movidas
+
+
 # -----------------------------
 # PRODUCTOS
 # -----------------------------
@@ -465,6 +1364,7 @@ def agregar_producto(codigo, nombre, cantidad, costo, sector_id, codigo_barras):
     conn.close()
 
     agregar_movimiento(producto_id, "INGRESO", cantidad, precio, detalles="Alta/Ingreso inicial")
+    catalogo.actualizar([producto_id])
     return producto_id
 
 
@@ -522,27 +1422,444 @@ def agregar_o_actualizar_producto(codigo, nombre, cantidad, costo, sector_id=Non
 
         # Registrar movimiento de ingreso por alta/import
         agregar_movimiento(producto_id, "INGRESO", cantidad or 0, precio, detalles="Ingreso por import/alta")
+        catalogo.actualizar([producto_id])
         return producto_id
     else:
         # No existe → crear nuevo (agregar_producto también normaliza y registra movimiento)
         conn.close()
-        return agregar_producto(codigo, nombre, cantidad or 0, costo, sector_id, codigo_barras)
+        return agregar_producto(codigo, nombre, cantidad or 0, costo, sector_id, codigo_barras)
+
+
+# -----------------------------
+# IMPORTACIÓN MASIVA (Excel / CSV)
+# -----------------------------
+# Sinónimos aceptados en los encabezados (ya normalizados: minúsculas y "_" en lugar de espacios)
+ALIAS_IMPORTACION = {
+    "codigo": {"codigo", "código", "sku", "cod"},
+    "nombre": {"nombre", "producto", "descripcion", "descripción"},
+    "stock": {"stock", "cantidad", "cant"},
+    "costo": {"costo", "costo_unitario", "cost"},
+    "sector": {"sector", "rubro", "categoria", "categoría"},
+    "codigo_barras": {"codigo_barras", "código_barras", "ean", "barcode", "codbarras"},
+}
+
+
+def columnas_importacion(columnas):
+    """
+    Mapea los encabezados de la planilla a los campos de ALIAS_IMPORTACION.
+    Devuelve {campo: nombre_de_columna | None}. Lanza ValueError si falta lo indispensable.
+    """
+    normalizadas = {str(c).strip().lower().replace(" ", "_"): c for c in columnas}
+    elegidas = {}
+    for campo, alias in ALIAS_IMPORTACION.items():
+        elegidas[campo] = next((original for norm, original in normalizadas.items() if norm in alias), None)
+    if not elegidas["nombre"]:
+        raise ValueError("No se encontró la columna de NOMBRE.")
+    if not (elegidas["codigo"] or elegidas["codigo_barras"]):
+        raise ValueError("Necesito al menos CÓDIGO o CÓDIGO DE BARRAS.")
+    return elegidas
+
+
+def _columna_texto(df, col):
+    """Columna como lista de textos sin espacios sobrantes (None si está vacía). 779... leído como float pierde el '.0'."""
+    import pandas as pd
+
+    if col is None:
+        return [None] * len(df)
+    serie = df[col]
+    texto = serie.astype("string").str.strip()
+    if pd.api.types.is_float_dtype(serie):
+        texto = texto.str.replace(r"\.0$", "", regex=True)
+    texto = texto.mask(texto == "")
+    return texto.astype(object).where(texto.notna(), None).tolist()
+
+
+def _columna_numero(df, col):
+    import pandas as pd
+
+    if col is None:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+
+def importar_productos(lotes, sector_defecto="Almacen", margen_sector_nuevo=0.30, progreso=None):
+    """
+    Alta/actualización masiva de productos desde una planilla.
+
+    lotes: un DataFrame o un iterable de DataFrames (p. ej. pd.read_csv(..., chunksize=5000)).
+    Por fila: se busca el producto por código de barras y, si no, por código interno (sin distinguir
+    mayúsculas). Si existe se actualiza en modo ABSOLUTO (stock = cantidad de la planilla) y se registra
+    un movimiento EDIT con la diferencia; si no existe se da de alta con un movimiento INGRESO.
+    Los sectores que no existen se crean con margen_sector_nuevo. El precio sale del margen del sector.
+
+    Todo se escribe en una sola transacción: productos y movimientos con executemany, sectores y
+    productos existentes resueltos con una consulta cada uno. Las filas con problemas no se importan.
+    Devuelve {"insertados": n, "actualizados": n, "errores": [(fila, motivo), ...]}, donde fila es el
+    número de fila en la planilla (la 1 es el encabezado).
+    progreso(filas_leidas), opcional, se llama después de cada lote; si lanza, la importación se revierte.
+    """
+    import pandas as pd
+
+    if isinstance(lotes, pd.DataFrame):
+        lotes = [lotes]
+
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    errores = []
+    nuevos = {}  # código en minúsculas -> fila a insertar (la última de la planilla gana)
+    actualizados = {}  # id -> fila a actualizar (la última de la planilla gana)
+    leidas = 0
+
+    with transaccion(inmediata=True) as cur:
+        cur.execute("SELECT id, nombre, margen FROM sectores")
+        sectores = {str(n).strip().lower(): (sid, m) for sid, n, m in cur.fetchall()}
+        existentes = cur.execute("SELECT id, codigo, codigo_barras, cantidad FROM productos").fetchall()
+        stock_actual = {pid: cant or 0 for pid, _c, _b, cant in existentes}
+        por_codigo = {str(c).strip().lower(): pid for pid, c, _b, _cant in existentes if c}
+        por_barcode = {str(b).strip(): pid for pid, _c, b, _cant in existentes if b}
+        barcode_nuevo = {}  # barcode -> código (en minúsculas) del alta que lo usa
+
+        for df in lotes:
+            if df.empty:
+                continue
+            cols = columnas_importacion(df.columns)
+            filas_planilla = (df.index + 2 if pd.api.types.is_integer_dtype(df.index) else df.index).tolist()
+            codigos = _columna_texto(df, cols["codigo"])
+            nombres = _columna_texto(df, cols["nombre"])
+            barcodes = _columna_texto(df, cols["codigo_barras"])
+            sector_txt = _columna_texto(df, cols["sector"])
+            cantidades = _columna_numero(df, cols["stock"]).astype(int).tolist()
+            costos = _columna_numero(df, cols["costo"]).astype(float).tolist()
+
+            # sectores nuevos de este lote: se crean todos juntos
+            faltan = {}
+            for t in sector_txt:
+                t = t or sector_defecto
+                if t.lower() not in sectores:
+                    faltan.setdefault(t.lower(), t)
+            if faltan:
+                nombres_sector = list(faltan.values())
+                cur.executemany(
+                    "INSERT INTO sectores (nombre, margen) VALUES (?, ?)",
+                    [(n, margen_sector_nuevo) for n in nombres_sector],
+                )
+                marcas = ",".join("?" * len(nombres_sector))
+                cur.execute(f"SELECT id, nombre, margen FROM sectores WHERE nombre IN ({marcas})", nombres_sector)
+                sectores.update((str(n).strip().lower(), (sid, m)) for sid, n, m in cur.fetchall())
+
+            for fila, codigo, nombre, bc, sec, cant, costo in zip(
+                filas_planilla, codigos, nombres, barcodes, sector_txt, cantidades, costos
+            ):
+                if not nombre:
+                    errores.append((fila, "Falta el nombre"))
+                    continue
+                if not codigo and not bc:
+                    errores.append((fila, "Falta el código y el código de barras"))
+                    continue
+                sid, margen = sectores[(sec or sector_defecto).lower()]
+                precio = round((costo or 0.0) * (1 + (margen or 0.0)), 2)
+                # sin código interno, el código de barras hace de código (como en lookup_producto)
+                clave = (codigo or bc).lower()
+
+                pid = por_barcode.get(bc) if bc else None
+                if pid is None:
+                    pid = por_codigo.get(clave)
+                if pid is not None:
+                    if codigo and (por_codigo.get(clave, pid) != pid or clave in nuevos):
+                        errores.append((fila, f"El código {codigo} pertenece a otro producto"))
+                        continue
+                    if bc and (por_barcode.get(bc, pid) != pid or bc in barcode_nuevo):
+                        errores.append((fila, f"El código de barras {bc} pertenece a otro producto"))
+                        continue
+                    actualizados[pid] = (codigo, nombre, cant, costo, sid, precio, bc)
+                    if codigo:
+                        por_codigo[clave] = pid
+                    if bc:
+                        por_barcode[bc] = pid
+                else:
+                    if bc and barcode_nuevo.get(bc, clave) != clave:
+                        errores.append((fila, f"El código de barras {bc} está repetido en la planilla"))
+                        continue
+                    nuevos[clave] = (codigo or bc, nombre, cant, costo, sid, precio, bc)
+                    if bc:
+                        barcode_nuevo[bc] = clave
+
+            leidas += len(df)
+            if progreso:
+                progreso(leidas)
+
+        if actualizados:
+            cur.executemany(
+                """
+                UPDATE productos
+                   SET codigo = COALESCE(?, codigo),
+                       nombre = ?,
+                       cantidad = ?,
+                       costo = ?,
+                       sector_id = ?,
+                       precio = ?,
+                       codigo_barras = COALESCE(?, codigo_barras)
+                 WHERE id = ?
+            """,
+                [(*datos, pid) for pid, datos in actualizados.items()],
+            )
+        if nuevos:
+            cur.executemany(
+                """
+                INSERT INTO productos (codigo, nombre, cantidad, costo, sector_id, precio, codigo_barras, movimientos)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            """,
+                list(nuevos.values()),
+            )
+        # ids de las altas: una consulta por lote de códigos
+        codigos_nuevos = [datos[0] for datos in nuevos.values()]
+        id_nuevo = {}
+        for i in range(0, len(codigos_nuevos), 500):
+            lote = codigos_nuevos[i : i + 500]
+            marcas = ",".join("?" * len(lote))
+            cur.execute(f"SELECT codigo, id FROM productos WHERE codigo IN ({marcas})", lote)
+            id_nuevo.update(cur.fetchall())
+
+        movimientos = [
+            (pid, "EDIT", datos[2] - stock_actual[pid], datos[5], fecha, "Importación: stock ajustado")
+            for pid, datos in actualizados.items()
+        ]
+        movimientos += [
+            (id_nuevo[datos[0]], "INGRESO", datos[2], datos[5], fecha, "Alta por importación")
+            for datos in nuevos.values()
+        ]
+        cur.executemany(
+            "INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles) VALUES (?, ?, ?, ?, ?, ?)",
+            movimientos,
+        )
+
+    catalogo.actualizar(list(actualizados) + list(id_nuevo.values()))
+    return {"insertados": len(nuevos), "actualizados": len(actualizados), "errores": errores}
+
+
+def eliminar_producto(id_producto):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT nombre, precio FROM productos WHERE id=?", (id_producto,))
+    row = cur.fetchone()
+    cur.execute("DELETE FROM productos WHERE id=?", (id_producto,))
+    conn.commit()
+    conn.close()
+
+    catalogo.actualizar([id_producto])
+    if row:
+        agregar_movimiento(None, "ELIM", 0, row[1] or 0, detalles=f"Eliminado: {row[0]}")
+
+
+def obtener_productos():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT p.id, p.codigo, p.nombre, p.cantidad, p.costo,
+               COALESCE(s.nombre, '') as sector, p.precio, COALESCE(p.codigo_barras, ''), p.movimientos
+        FROM productos p
+        LEFT JOIN sectores s ON p.sector_id = s.id
+        ORDER BY p.nombre COLLATE NOCASE
+    """
+    )
+    data = cur.fetchall()
+    conn.close()
+    return data
+
+
+def iterar_productos(tamano_lote=5000):
+    """Mismas filas que obtener_productos(), de a lotes (para exportar catálogos grandes sin cargarlos enteros)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT p.id, p.codigo, p.nombre, p.cantidad, p.costo,
+                   COALESCE(s.nombre, '') as sector, p.precio, COALESCE(p.codigo_barras, ''), p.movimientos
+            FROM productos p
+            LEFT JOIN sectores s ON p.sector_id = s.id
+            ORDER BY p.nombre COLLATE NOCASE
+        """
+        )
+        while True:
+            lote = cur.fetchmany(tamano_lote)
+            if not lote:
+                break
+            yield from lote
+    finally:
+        conn.close()
 
 
-def eliminar_producto(id_producto):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT nombre, precio FROM productos WHERE id=?", (id_producto,))
-    row = cur.fetchone()
-    cur.execute("DELETE FROM productos WHERE id=?", (id_producto,))
-    conn.commit()
-    conn.close()
+# Más cambios pendientes que esto (p. ej. una importación) y el catálogo se recarga entero en vez de por id
+CATALOGO_MAX_CAMBIOS = 2000
+# Filas de catalogo_cambios que se conservan al iniciar (una instancia más atrasada recarga completo)
+CATALOGO_CAMBIOS_RETENIDOS = 20000
 
-    if row:
-        agregar_movimiento(None, "ELIM", 0, row[1] or 0, detalles=f"Eliminado: {row[0]}")
 
+class ProductCatalog:
+    """
+    Caché en memoria del catálogo (mismas filas que obtener_productos()), indexada por id,
+    código y código de barras (sin distinguir mayúsculas), compartida por todo el proceso.
+
+    - Se carga completa una sola vez, en el primer uso.
+    - Las funciones de escritura de este módulo la actualizan solo para los ids que tocaron.
+    - Cada lectura aplica el registro catalogo_cambios (lo llenan triggers sobre productos/sectores): se
+      releen solo los ids con seq mayor al último aplicado, los haya escrito este proceso, otra instancia
+      de la app o SQL directo. Las escrituras que no tocan productos (gastos, cola de impresión...) no
+      cuestan nada; con muchos cambios juntos (una importación) conviene y se hace una recarga completa.
+    - 'version' sube con cada cambio: sirve a la UI para saber si sus cachés derivados siguen vigentes.
+    Las filas devueltas son tuplas compartidas: no modificarlas.
+    """
 
-def obtener_productos():
+    _SQL = """
+        SELECT p.id, p.codigo, p.nombre, p.cantidad, p.costo,
+               COALESCE(s.nombre, '') as sector, p.precio, COALESCE(p.codigo_barras, ''), p.movimientos
+        FROM productos p
+        LEFT JOIN sectores s ON p.sector_id = s.id
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sonda = None
+        self._ruta = None
+        self._seq = 0  # último catalogo_cambios.seq aplicado
+        self._por_id = {}
+        self._por_codigo = {}
+        self._por_barcode = {}
+        self._ordenados = None
+        self.cargado = False
+        self.version = 0
+
+    # --- lectura ---
+    def todos(self):
+        """Todas las filas ordenadas por nombre (como obtener_productos())."""
+        with self._lock:
+            self._sincronizar()
+            if self._ordenados is None:
+                self._ordenados = sorted(self._por_id.values(), key=lambda p: (str(p[2]).lower(), p[0]))
+            return self._ordenados
+
+    def por_id(self, producto_id):
+        with self._lock:
+            self._sincronizar()
+            return self._por_id.get(producto_id)
+
+    def buscar_codigo(self, codigo):
+        """Código de barras o código interno exacto (sin distinguir mayúsculas); gana el barcode."""
+        c = (codigo or "").strip().lower()
+        if not c:
+            return None
+        with self._lock:
+            self._sincronizar()
+            return self._por_barcode.get(c) or self._por_codigo.get(c)
+
+    # --- mantenimiento ---
+    def actualizar(self, ids):
+        """
+        Relee de la base solo esos productos (los que ya no existen se quitan), sin esperar a la próxima
+        lectura. No toca el seq aplicado: el registro de cambios se sigue aplicando entero.
+        """
+        with self._lock:
+            if not self.cargado or self._ruta != DB_PATH:
+                return
+            self._releer(get_connection(), ids)
+
+    def invalidar(self):
+        """Fuerza una recarga completa en el próximo uso."""
+        with self._lock:
+            self.cargado = False
+
+    def cerrar(self):
+        with self._lock:
+            if self._sonda is not None:
+                self._sonda.close()
+                self._sonda = None
+            self.cargado = False
+
+    def _sincronizar(self):
+        if self._sonda is None or self._ruta != DB_PATH:
+            # conexión propia, solo de lectura: nunca ve transacciones a medio confirmar de otros hilos
+            if self._sonda is not None:
+                self._sonda.close()
+            self._sonda = sqlite3.connect(DB_PATH, check_same_thread=False)
+            self._ruta = DB_PATH
+            self.cargado = False
+        if not self.cargado:
+            self._recargar()
+            return
+        cambios = self._sonda.execute(
+            "SELECT seq, producto_id FROM catalogo_cambios WHERE seq > ? ORDER BY seq LIMIT ?",
+            (self._seq, CATALOGO_MAX_CAMBIOS + 1),
+        ).fetchall()
+        if not cambios:
+            return
+        if len(cambios) > CATALOGO_MAX_CAMBIOS or cambios[0][0] != self._seq + 1:
+            # demasiados cambios para releerlos de a uno, o el registro ya se podó por delante nuestro
+            self._recargar()
+            return
+        self._releer(self._sonda, [pid for _, pid in cambios])
+        self._seq = cambios[-1][0]
+
+    def _releer(self, conn, ids):
+        ids = list({pid for pid in ids if pid is not None})
+        if not ids:
+            return
+        filas = []
+        for i in range(0, len(ids), 500):
+            lote = ids[i : i + 500]
+            marcas = ",".join("?" for _ in lote)
+            filas += conn.execute(self._SQL + f" WHERE p.id IN ({marcas})", lote).fetchall()
+        for pid in ids:
+            self._desindexar(pid)
+        for fila in filas:
+            self._indexar(fila)
+        self._ordenados = None
+        self.version += 1
+
+    def _recargar(self):
+        # el seq se lee ANTES que las filas: lo que se confirme en el medio se vuelve a aplicar después
+        seq = self._sonda.execute("SELECT COALESCE(MAX(seq), 0) FROM catalogo_cambios").fetchone()[0]
+        filas = self._sonda.execute(self._SQL).fetchall()
+        self._por_id, self._por_codigo, self._por_barcode = {}, {}, {}
+        for fila in filas:
+            self._indexar(fila)
+        self._ordenados = None
+        self._seq = seq
+        self.cargado = True
+        self.version += 1
+
+    def _indexar(self, fila):
+        self._por_id[fila[0]] = fila
+        if fila[1]:
+            self._por_codigo[str(fila[1]).strip().lower()] = fila
+        if fila[7]:
+            self._por_barcode[str(fila[7]).strip().lower()] = fila
+
+    def _desindexar(self, producto_id):
+        vieja = self._por_id.pop(producto_id, None)
+        if vieja is None:
+            return
+        for indice, valor in ((self._por_codigo, vieja[1]), (self._por_barcode, vieja[7])):
+            clave = str(valor or "").strip().lower()
+            if clave and indice.get(clave) is vieja:
+                del indice[clave]
+
+
+catalogo = ProductCatalog()
+
+
+def lookup_producto(codigo):
+    """
+    Resuelve un código escaneado o tipeado (código de barras o código interno, sin distinguir
+    mayúsculas) con una búsqueda por índice. Si coincide con ambos, gana el código de barras.
+    Devuelve la fila con las columnas de obtener_productos() o None.
+    Si el catálogo en memoria ya está cargado, se resuelve ahí sin ir a la base.
+    """
+    c = (codigo or "").strip()
+    if not c:
+        return None
+    if catalogo.cargado:
+        return catalogo.buscar_codigo(c)  # O(1) en memoria
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
@@ -551,12 +1868,25 @@ def obtener_productos():
                COALESCE(s.nombre, '') as sector, p.precio, COALESCE(p.codigo_barras, ''), p.movimientos
         FROM productos p
         LEFT JOIN sectores s ON p.sector_id = s.id
-        ORDER BY p.nombre COLLATE NOCASE
-    """
+        WHERE p.codigo_barras = ? COLLATE NOCASE
+           OR p.codigo = ? COLLATE NOCASE
+        ORDER BY (p.codigo_barras = ? COLLATE NOCASE) DESC
+        LIMIT 1
+    """,
+        (c, c, c),
     )
-    data = cur.fetchall()
+    prod = cur.fetchone()
     conn.close()
-    return data
+    return prod
+
+
+# Usar el índice FTS5 en buscar_productos (False = siempre LIKE; útil para comparar en benchmarks)
+BUSQUEDA_FTS = True
+
+
+def _tiene_fts(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='productos_fts'")
+    return cur.fetchone() is not None
 
 
 # --- NUEVO: búsqueda flexible de productos (prioriza match exacto por código / barcode)
@@ -581,8 +1911,8 @@ def buscar_productos(query, limit=50):
                COALESCE(s.nombre, '') as sector, p.precio, COALESCE(p.codigo_barras, ''), p.movimientos
         FROM productos p
         LEFT JOIN sectores s ON p.sector_id = s.id
-        WHERE LOWER(p.codigo) = LOWER(?)
-           OR LOWER(COALESCE(p.codigo_barras,'')) = LOWER(?)
+        WHERE p.codigo = ? COLLATE NOCASE
+           OR p.codigo_barras = ? COLLATE NOCASE
         ORDER BY p.nombre COLLATE NOCASE
         LIMIT ?
     """,
@@ -593,7 +1923,32 @@ def buscar_productos(query, limit=50):
         conn.close()
         return exactos
 
-    # 2) Búsqueda por contiene (insensible a mayúsculas)
+    # 2) Búsqueda por contiene: índice FTS5 trigram (ranking bm25) si está disponible.
+    #    El trigram necesita al menos 3 caracteres; para menos seguimos con LIKE.
+    if BUSQUEDA_FTS and len(q) >= 3 and _tiene_fts(cur):
+        # El top-N se elige dentro del índice; el join con productos es solo para esas filas
+        cur.execute(
+            """
+            WITH m AS (
+                SELECT rowid AS id, bm25(productos_fts) AS rank
+                FROM productos_fts
+                WHERE productos_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            )
+            SELECT p.id, p.codigo, p.nombre, p.cantidad, p.costo,
+                   COALESCE(s.nombre, '') as sector, p.precio, COALESCE(p.codigo_barras, ''), p.movimientos
+            FROM m
+            JOIN productos p ON p.id = m.id
+            LEFT JOIN sectores s ON p.sector_id = s.id
+            ORDER BY m.rank, p.nombre COLLATE NOCASE
+        """,
+            ('"' + q.replace('"', '""') + '"', limit),
+        )
+        data = cur.fetchall()
+        conn.close()
+        return data
+
     like = f"%{q}%"
     cur.execute(
         """
@@ -637,6 +1992,7 @@ def modificar_stock(producto_id, cantidad_cambio, detalles=""):
 
     tipo = "VENTA" if cantidad_cambio < 0 else "INGRESO"
     agregar_movimiento(producto_id, tipo, cantidad_cambio, prod[1] or 0.0, detalles=detalles)
+    catalogo.actualizar([producto_id])
     return True
 
 
@@ -702,6 +2058,40 @@ def obtener_clientes_con_saldo():
     return data
 
 
+# -----------------------------
+# Rango de fechas (filtros de reportes)
+# -----------------------------
+def _dia(valor):
+    """'YYYY-MM-DD', 'YYYY-MM-DD HH:MM:SS', date o datetime → date."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor).strip()[:10], "%Y-%m-%d").date()
+
+
+def rango_fechas(columna, fecha_inicio=None, fecha_fin=None):
+    """
+    Convierte un rango de días inclusivo [fecha_inicio, fecha_fin] en límites semiabiertos
+    sobre la columna de texto ISO ('YYYY-MM-DD HH:MM:SS'):
+
+        columna >= 'fecha_inicio' AND columna < 'fecha_fin + 1 día'
+
+    A diferencia de date(columna) BETWEEN ..., la columna queda "desnuda" y SQLite puede usar
+    su índice. Cualquiera de los extremos puede omitirse.
+    Devuelve (fragmento SQL que empieza con ' AND', lista de parámetros).
+    """
+    sql = ""
+    params = []
+    if fecha_inicio:
+        sql += f" AND {columna} >= ?"
+        params.append(_dia(fecha_inicio).isoformat())
+    if fecha_fin:
+        sql += f" AND {columna} < ?"
+        params.append((_dia(fecha_fin) + timedelta(days=1)).isoformat())
+    return sql, params
+
+
 # -----------------------------
 # VENTAS
 # -----------------------------
@@ -710,79 +2100,95 @@ def registrar_venta(items, tipo_pago, cliente=None, efectivo_recibido=None):
     items: list of dicts: {"producto_id": id, "cantidad": n, "precio_unitario": p}
     tipo_pago: 'Efectivo'|'Transferencia'|'QR'|'Pendiente'
     cliente: None | cliente_id (int) | cliente_nombre (str)
+
+    Todo ocurre en una sola transacción (BEGIN IMMEDIATE): el stock del carrito completo se verifica
+    con una sola consulta y, si falta algo, el error lista todos los productos sin stock suficiente.
+    Devuelve (True, venta_id) o (False, mensaje).
     """
-    conn = get_connection()
-    cur = conn.cursor()
     try:
         total = round(sum(it["cantidad"] * it["precio_unitario"] for it in items), 2)
+        subtotales = [round(it["cantidad"] * it["precio_unitario"], 2) for it in items]
         fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         estado = "PAGADO" if tipo_pago != "Pendiente" else "PENDIENTE"
         vuelto = None
 
-        # resolver cliente: obtener cliente_id y cliente_text
-        cliente_id = None
-        cliente_text = ""
-        if cliente is not None:
-            if isinstance(cliente, int):
-                cliente_id = cliente
-                cur.execute("SELECT nombre FROM clientes WHERE id=?", (cliente_id,))
-                r = cur.fetchone()
-                cliente_text = r[0] if r else ""
-            else:
-                # string
-                cliente_text = str(cliente)
-
-        # Iniciar transacción
-        cur.execute("BEGIN")
-        cur.execute(
-            """
-            INSERT INTO ventas (fecha, tipo_pago, estado, total, efectivo_recibido, vuelto, cliente, cliente_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            (fecha, tipo_pago, estado, total, efectivo_recibido, vuelto, cliente_text, cliente_id),
-        )
-        venta_id = cur.lastrowid
-
-        # procesar items: verificar stock y descontar
+        # cantidad total pedida por producto (un producto puede venir en varias líneas)
+        pedido = {}
         for it in items:
-            pid = it["producto_id"]
-            cant = it["cantidad"]
-            precio_unit = it["precio_unitario"]
-            subtotal = round(cant * precio_unit, 2)
-
-            # verificar stock actual
-            cur.execute("SELECT cantidad, precio FROM productos WHERE id=?", (pid,))
-            prod = cur.fetchone()
-            if not prod:
-                raise Exception(f"Producto id {pid} no encontrado")
-            current = prod[0] or 0
-            if current - cant < 0:
-                raise Exception(f"Stock insuficiente para {pid}")
-
-            # descontar stock
-            cur.execute("UPDATE productos SET cantidad=? WHERE id=?", (current - cant, pid))
-
-            # insertar item
+            pedido[it["producto_id"]] = pedido.get(it["producto_id"], 0) + it["cantidad"]
+
+        with transaccion(inmediata=True) as cur:
+            # resolver cliente: obtener cliente_id y cliente_text
+            cliente_id = None
+            cliente_text = ""
+            if cliente is not None:
+                if isinstance(cliente, int):
+                    cliente_id = cliente
+                    r = cur.execute("SELECT nombre FROM clientes WHERE id=?", (cliente_id,)).fetchone()
+                    cliente_text = r[0] if r else ""
+                else:
+                    # string
+                    cliente_text = str(cliente)
+
+            # verificar stock de todo el carrito de una vez
+            ids = list(pedido)
+            stock = {}
+            for i in range(0, len(ids), 500):
+                lote = ids[i : i + 500]
+                marcas = ",".join("?" * len(lote))
+                cur.execute(f"SELECT id, nombre, cantidad, costo FROM productos WHERE id IN ({marcas})", lote)
+                stock.update(
+                    (pid, (nombre, cantidad or 0, costo or 0.0)) for pid, nombre, cantidad, costo in cur.fetchall()
+                )
+
+            errores = [f"Producto id {pid} no encontrado" for pid in ids if pid not in stock]
+            errores += [
+                f"Stock insuficiente para {stock[pid][0]} (hay {stock[pid][1]}, se piden {cant})"
+                for pid, cant in pedido.items()
+                if pid in stock and stock[pid][1] - cant < 0
+            ]
+            if errores:
+                raise Exception("\n".join(errores))
+
             cur.execute(
                 """
-                INSERT INTO venta_items (venta_id, producto_id, cantidad, precio_unitario, subtotal)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO ventas (fecha, tipo_pago, estado, total, efectivo_recibido, vuelto, cliente, cliente_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-                (venta_id, pid, cant, precio_unit, subtotal),
+                (fecha, tipo_pago, estado, total, efectivo_recibido, vuelto, cliente_text, cliente_id),
             )
+            venta_id = cur.lastrowid
 
-            # registrar movimiento tipo VENTA (cantidad negativa)
-            cur.execute(
+            # descontar stock (ya verificado; nadie más escribe mientras tengamos el lock)
+            cur.executemany(
+                "UPDATE productos SET cantidad = cantidad - ? WHERE id = ?", [(c, p) for p, c in pedido.items()]
+            )
+
+            # el costo queda congelado en el ítem: el reporte de ganancia no cambia si después cambia el costo
+            costos = {pid: datos[2] for pid, datos in stock.items()}
+            cur.executemany(
+                """
+                INSERT INTO venta_items (venta_id, producto_id, cantidad, precio_unitario, subtotal, costo_unitario)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (venta_id, it["producto_id"], it["cantidad"], it["precio_unitario"], sub, costos[it["producto_id"]])
+                    for it, sub in zip(items, subtotales)
+                ],
+            )
+            costo_total = sum(cant * costos[pid] for pid, cant in pedido.items())
+            _sumar_ventas_diarias(cur, fecha, tipo_pago, estado, 1, total, sum(pedido.values()), costo_total)
+
+            # movimientos tipo VENTA (cantidad negativa)
+            detalle = f"Venta ID {venta_id}"
+            cur.executemany(
                 "INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles) VALUES (?, ?, ?, ?, ?, ?)",
-                (pid, "VENTA", -cant, precio_unit, fecha, f"Venta ID {venta_id}"),
+                [(it["producto_id"], "VENTA", -it["cantidad"], it["precio_unitario"], fecha, detalle) for it in items],
             )
 
-        conn.commit()
-        conn.close()
+        catalogo.actualizar(ids)
         return True, venta_id
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
 
@@ -796,10 +2202,8 @@ def obtener_ventas(fecha_inicio=None, fecha_fin=None, estado=None):
         LEFT JOIN clientes c ON v.cliente_id = c.id
         WHERE 1=1
     """
-    params = []
-    if fecha_inicio and fecha_fin:
-        q += " AND date(v.fecha) BETWEEN date(?) AND date(?)"
-        params.extend([fecha_inicio, fecha_fin])
+    filtro_fecha, params = rango_fechas("v.fecha", fecha_inicio, fecha_fin)
+    q += filtro_fecha
     if estado:
         q += " AND v.estado = ?"
         params.append(estado)
@@ -810,6 +2214,16 @@ def obtener_ventas(fecha_inicio=None, fecha_fin=None, estado=None):
     return data
 
 
+def contar_ventas_pendientes():
+    """(cantidad, total) de las ventas a cuenta todavía PENDIENTES (va por el índice de estado)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas WHERE estado = 'PENDIENTE'")
+    data = cur.fetchone()
+    conn.close()
+    return data
+
+
 def obtener_items_venta(venta_id):
     conn = get_connection()
     cur = conn.cursor()
@@ -832,120 +2246,223 @@ def obtener_ventas_pendientes():
 
 
 def marcar_venta_pagada(venta_id, tipo_pago_nuevo=None, recibido=None):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT estado, total, cliente_id FROM ventas WHERE id=?", (venta_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        return False, "Venta no encontrada"
-    estado_actual = row[0]
-    total = row[1] or 0.0
-    cliente_id = row[2]
+    with transaccion(inmediata=True) as cur:
+        cur.execute("SELECT estado, total, cliente_id, fecha, tipo_pago FROM ventas WHERE id=?", (venta_id,))
+        row = cur.fetchone()
+        if not row:
+            return False, "Venta no encontrada"
+        estado_actual = row[0]
+        total = row[1] or 0.0
+        cliente_id = row[2]
 
-    if estado_actual == "PAGADO":
-        conn.close()
-        return False, "Venta ya está pagada"
+        if estado_actual == "PAGADO":
+            return False, "Venta ya está pagada"
 
-    nuevo_tipo = tipo_pago_nuevo if tipo_pago_nuevo else "Efectivo"
-    vuelto = None
-    if recibido is not None:
-        vuelto = round(recibido - total, 2)
+        nuevo_tipo = tipo_pago_nuevo if tipo_pago_nuevo else "Efectivo"
+        vuelto = None
+        if recibido is not None:
+            vuelto = round(recibido - total, 2)
 
-    cur.execute(
-        "UPDATE ventas SET estado=?, tipo_pago=?, efectivo_recibido=?, vuelto=? WHERE id=?",
-        ("PAGADO", nuevo_tipo, recibido, vuelto, venta_id),
-    )
+        cur.execute(
+            "UPDATE ventas SET estado=?, tipo_pago=?, efectivo_recibido=?, vuelto=? WHERE id=?",
+            ("PAGADO", nuevo_tipo, recibido, vuelto, venta_id),
+        )
 
-    # insertar registro de cobro
-    cur.execute(
-        "INSERT INTO cobros (venta_id, cliente_id, fecha, monto, tipo_pago) VALUES (?, ?, ?, ?, ?)",
-        (venta_id, cliente_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), total, nuevo_tipo),
-    )
+        # insertar registro de cobro
+        cur.execute(
+            "INSERT INTO cobros (venta_id, cliente_id, fecha, monto, tipo_pago) VALUES (?, ?, ?, ?, ?)",
+            (venta_id, cliente_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), total, nuevo_tipo),
+        )
+
+        # en el resumen diario la venta pasa de (tipo, estado) anteriores a (nuevo tipo, PAGADO)
+        items, costo = cur.execute(
+            "SELECT COALESCE(SUM(cantidad), 0), COALESCE(SUM(cantidad * COALESCE(costo_unitario, 0)), 0) "
+            "FROM venta_items WHERE venta_id=?",
+            (venta_id,),
+        ).fetchone()
+        _sumar_ventas_diarias(cur, row[3], row[4], estado_actual, -1, -total, -items, -costo)
+        _sumar_ventas_diarias(cur, row[3], nuevo_tipo, "PAGADO", 1, total, items, costo)
 
-    conn.commit()
-    conn.close()
     return True, "Venta marcada como pagada"
 
 
 def reembolsar_venta(venta_id, items_to_refund=None):
-    conn = get_connection()
-    cur = conn.cursor()
     try:
-        # Buscar la venta
-        cur.execute("SELECT id, fecha, total FROM ventas WHERE id=?", (venta_id,))
-        venta = cur.fetchone()
-        if not venta:
-            conn.close()
-            return False, "Venta no encontrada"
-
-        # Traer los ítems de la venta
-        if items_to_refund is None:
-            cur.execute(
-                """
-                SELECT id, producto_id, cantidad, precio_unitario, subtotal
-                FROM venta_items WHERE venta_id=?
-            """,
-                (venta_id,),
-            )
-            items = cur.fetchall()
-        else:
-            placeholders = ",".join("?" for _ in items_to_refund)
-            cur.execute(
-                f"""
-                SELECT id, producto_id, cantidad, precio_unitario, subtotal
-                FROM venta_items
-                WHERE id IN ({placeholders})
-            """,
-                tuple(items_to_refund),
+        with transaccion() as cur:
+            # Buscar la venta
+            cur.execute("SELECT id, fecha, total, tipo_pago, estado FROM ventas WHERE id=?", (venta_id,))
+            venta = cur.fetchone()
+            if not venta:
+                return False, "Venta no encontrada"
+
+            # Traer los ítems de la venta
+            if items_to_refund is None:
+                cur.execute(
+                    """
+                    SELECT id, producto_id, cantidad, precio_unitario, subtotal, costo_unitario
+                    FROM venta_items WHERE venta_id=?
+                """,
+                    (venta_id,),
+                )
+                items = cur.fetchall()
+            else:
+                placeholders = ",".join("?" for _ in items_to_refund)
+                cur.execute(
+                    f"""
+                    SELECT id, producto_id, cantidad, precio_unitario, subtotal, costo_unitario
+                    FROM venta_items
+                    WHERE venta_id = ? AND id IN ({placeholders})
+                """,
+                    (venta_id, *items_to_refund),
+                )
+                items = cur.fetchall()
+
+            fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            total_devuelto = 0.0
+            cant_devuelta = 0
+            costo_devuelto = 0.0
+
+            for itm in items:
+                vi_id, pid, cant, precio_unit, subtotal, costo_unit = itm
+                total_devuelto += subtotal
+                cant_devuelta += cant
+                costo_devuelto += cant * (costo_unit or 0.0)
+
+                # Reponer stock
+                cur.execute("UPDATE productos SET cantidad = cantidad + ? WHERE id=?", (cant, pid))
+
+                # Registrar movimiento
+                cur.execute(
+                    """
+                    INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                    (pid, "REEMBOLSO", cant, precio_unit, fecha, f"Reembolso de venta {venta_id}"),
+                )
+
+                # Eliminar el ítem de la venta
+                cur.execute("DELETE FROM venta_items WHERE id=?", (vi_id,))
+
+            # Actualizar el total de la venta
+            cur.execute("UPDATE ventas SET total = total - ? WHERE id=?", (total_devuelto, venta_id))
+            _sumar_ventas_diarias(
+                cur, venta[1], venta[3], venta[4], 0, -total_devuelto, -cant_devuelta, -costo_devuelto
             )
-            items = cur.fetchall()
 
-        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        total_devuelto = 0.0
+        catalogo.actualizar(itm[1] for itm in items)
+        return True, f"Reembolso procesado. Total devuelto: ${total_devuelto:,.2f}"
+    except Exception as e:
+        return False, str(e)
 
-        for itm in items:
-            vi_id, pid, cant, precio_unit, subtotal = itm
-            total_devuelto += subtotal
 
-            # Reponer stock
-            cur.execute("UPDATE productos SET cantidad = cantidad + ? WHERE id=?", (cant, pid))
+# -----------------------------
+# Resumen diario de ventas (ventas_diarias)
+# -----------------------------
+# Una fila por (día de la venta, tipo de pago, estado) con cantidad de ventas, total, unidades vendidas y
+# costo de lo vendido. registrar_venta, marcar_venta_pagada y reembolsar_venta lo mantienen dentro de
+# su propia transacción; reconstruir_ventas_diarias() lo recalcula desde ventas / venta_items.
+_VENTAS_DIARIAS_DESDE_VENTAS = """
+    SELECT substr(v.fecha, 1, 10), v.tipo_pago, v.estado, COUNT(*), COALESCE(SUM(v.total), 0),
+           COALESCE(SUM(i.items), 0), COALESCE(SUM(i.costo), 0)
+    FROM ventas_todas v
+    LEFT JOIN (
+        SELECT venta_id, SUM(cantidad) AS items, SUM(cantidad * COALESCE(costo_unitario, 0)) AS costo
+        FROM venta_items_todos GROUP BY venta_id
+    ) i ON i.venta_id = v.id
+    WHERE 1=1 {filtro}
+    GROUP BY 1, 2, 3
+"""
+
+
+def _sumar_ventas_diarias(cur, fecha, tipo_pago, estado, ventas, total, items, costo):
+    """Suma (o resta, con valores negativos) una venta en su fila del resumen diario."""
+    dia = str(fecha)[:10]
+    cur.execute(
+        """
+        INSERT INTO ventas_diarias (dia, tipo_pago, estado, ventas, total, items, costo)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (dia, tipo_pago, estado) DO UPDATE SET
+            ventas = ventas + excluded.ventas,
+            total = total + excluded.total,
+            items = items + excluded.items,
+            costo = costo + excluded.costo
+    """,
+        (dia, tipo_pago, estado, ventas, total, items, costo),
+    )
+    if ventas < 0:
+        # la reconstrucción no genera filas vacías: las borramos para que ambas coincidan
+        cur.execute(
+            "DELETE FROM ventas_diarias WHERE dia=? AND tipo_pago=? AND estado=? AND ventas <= 0",
+            (dia, tipo_pago, estado),
+        )
 
-            # Registrar movimiento
-            cur.execute(
-                """
-                INSERT INTO movimientos (producto_id, tipo, cambio, precio_unitario, fecha, detalles)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """,
-                (pid, "REEMBOLSO", cant, precio_unit, fecha, f"Reembolso de venta {venta_id}"),
-            )
 
-            # Eliminar el ítem de la venta
-            cur.execute("DELETE FROM venta_items WHERE id=?", (vi_id,))
+def _reconstruir_ventas_diarias(cur, fecha_inicio=None, fecha_fin=None):
+    filtro_dia, params_dia = rango_fechas("dia", fecha_inicio, fecha_fin)
+    cur.execute("DELETE FROM ventas_diarias WHERE 1=1" + filtro_dia, params_dia)
+    filtro, params = rango_fechas("v.fecha", fecha_inicio, fecha_fin)
+    cur.execute(
+        "INSERT INTO ventas_diarias (dia, tipo_pago, estado, ventas, total, items, costo)"
+        + _VENTAS_DIARIAS_DESDE_VENTAS.format(filtro=filtro),
+        params,
+    )
 
-        # Actualizar el total de la venta
-        cur.execute("UPDATE ventas SET total = total - ? WHERE id=?", (total_devuelto, venta_id))
 
-        conn.commit()
-        conn.close()
-        return True, f"Reembolso procesado. Total devuelto: ${total_devuelto:,.2f}"
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return False, str(e)
+def reconstruir_ventas_diarias(fecha_inicio=None, fecha_fin=None):
+    """Recalcula el resumen diario (todo, o solo los días del rango) desde ventas / venta_items."""
+    with transaccion(inmediata=True) as cur:
+        _reconstruir_ventas_diarias(cur, fecha_inicio, fecha_fin)
+
+
+def verificar_ventas_diarias(fecha_inicio=None, fecha_fin=None):
+    """
+    Compara el resumen diario contra las tablas de ventas.
+    Devuelve [(dia, tipo_pago, estado, valores_resumen, valores_calculados)] con las diferencias
+    (valores = (ventas, total, items, costo), redondeados a centavos); lista vacía si coinciden.
+    """
+    conn = get_connection()
+    filtro_dia, params_dia = rango_fechas("dia", fecha_inicio, fecha_fin)
+    filtro, params = rango_fechas("v.fecha", fecha_inicio, fecha_fin)
+
+    def por_clave(filas):
+        return {(d, t, e): (n, round(tot, 2), it, round(c, 2)) for d, t, e, n, tot, it, c in filas}
+
+    resumen = por_clave(
+        conn.execute(
+            "SELECT dia, tipo_pago, estado, ventas, total, items, costo FROM ventas_diarias WHERE 1=1" + filtro_dia,
+            params_dia,
+        ).fetchall()
+    )
+    calculado = por_clave(conn.execute(_VENTAS_DIARIAS_DESDE_VENTAS.format(filtro=filtro), params).fetchall())
+    return [
+        (*clave, resumen.get(clave), calculado.get(clave))
+        for clave in sorted(set(resumen) | set(calculado))
+        if resumen.get(clave) != calculado.get(clave)
+    ]
+
+
+def resumen_ventas_diario(fecha_inicio=None, fecha_fin=None):
+    """[(dia, tipo_pago, ventas, total, items, costo)] del resumen diario, todos los estados sumados."""
+    conn = get_connection()
+    filtro, params = rango_fechas("dia", fecha_inicio, fecha_fin)
+    filas = conn.execute(
+        "SELECT dia, tipo_pago, SUM(ventas), SUM(total), SUM(items), SUM(costo) FROM ventas_diarias "
+        "WHERE 1=1" + filtro + " GROUP BY dia, tipo_pago ORDER BY dia, tipo_pago",
+        params,
+    ).fetchall()
+    conn.close()
+    return filas
 
 
 # -----------------------------
 # Reportes: ventas agrupadas por tipo de pago
 # -----------------------------
 def ventas_resumen_por_tipo(fecha_inicio=None, fecha_fin=None):
+    # lee el resumen diario: cuesta O(días del rango), no O(ventas)
     conn = get_connection()
     cur = conn.cursor()
-    q = "SELECT tipo_pago, SUM(total) as total, COUNT(*) as cantidad FROM ventas WHERE 1=1"
-    params = []
-    if fecha_inicio and fecha_fin:
-        q += " AND date(fecha) BETWEEN date(?) AND date(?)"
-        params.extend([fecha_inicio, fecha_fin])
+    filtro_fecha, params = rango_fechas("dia", fecha_inicio, fecha_fin)
+    q = "SELECT tipo_pago, SUM(total) as total, SUM(ventas) as cantidad FROM ventas_diarias WHERE 1=1" + filtro_fecha
     q += " GROUP BY tipo_pago"
     cur.execute(q, tuple(params))
     data = cur.fetchall()
@@ -953,52 +2470,123 @@ def ventas_resumen_por_tipo(fecha_inicio=None, fecha_fin=None):
     return data
 
 
-def obtener_ventas_con_detalles():
+def _sql_ventas_con_detalles(filtros):
+    """SQL de iterar_ventas_con_detalles (filtros: condiciones " AND ..." sobre ventas_todas; el último
+    parámetro es el LIMIT). Está aparte para que planes_sin_indice() revise la misma consulta."""
+    # los ítems se buscan por esquema (main y, si está adjunto, archivo) con el índice por venta_id:
+    # un JOIN contra la vista venta_items_todos la materializaría completa
+    get_connection()  # (re)abre la conexión del hilo: _hilo.archivo dice si el archivo está adjunto
+    esquemas = ["main", "archivo"] if getattr(_hilo, "archivo", False) else ["main"]
+    items = " UNION ALL ".join(
+        f"SELECT i.id, i.venta_id, i.producto_id, i.cantidad, i.precio_unitario, i.subtotal "
+        f"FROM v JOIN {esquema}.venta_items i ON i.venta_id = v.id"
+        for esquema in esquemas
+    )
+    return f"""
+        WITH v AS (
+            SELECT id, fecha, tipo_pago, estado, total FROM ventas_todas
+            WHERE 1=1 {filtros}
+            ORDER BY id DESC
+            LIMIT ?
+        ),
+        vi AS ({items})
+        SELECT v.id, v.fecha, v.tipo_pago, v.estado, v.total,
+               vi.id, p.id, p.nombre, vi.cantidad, vi.precio_unitario, vi.subtotal
+        FROM v
+        LEFT JOIN vi ON vi.venta_id = v.id
+        LEFT JOIN productos p ON p.id = vi.producto_id
+        ORDER BY v.id DESC, vi.id
+    """
+
+
+def iterar_ventas_con_detalles(fecha_inicio=None, fecha_fin=None, estado=None, antes_de_id=None, limite=None):
+    """
+    Ventas con sus ítems, de la más nueva a la más vieja, como generador de dicts
+    {"id", "fecha", "tipo_pago", "estado", "total", "items": [{"id", "producto_id", "nombre", "cantidad",
+    "precio", "subtotal"}]}.
+
+    Una sola consulta (ventas filtradas + ítems por JOIN) que se consume de a poco: no carga todo el historial.
+    Incluye las ventas archivadas (vistas ventas_todas / venta_items_todos).
+    Filtros opcionales: rango de días [fecha_inicio, fecha_fin], estado, y paginado por clave:
+    antes_de_id (ventas con id menor, para pedir la página siguiente) y limite (cantidad de ventas).
+    """
+    filtros, params = rango_fechas("fecha", fecha_inicio, fecha_fin)
+    if estado:
+        filtros += " AND estado = ?"
+        params.append(estado)
+    if antes_de_id is not None:
+        filtros += " AND id < ?"
+        params.append(antes_de_id)
+    params.append(limite if limite is not None else -1)  # LIMIT -1 = sin límite
+
     conn = get_connection()
     cur = conn.cursor()
+    try:
+        cur.execute(_sql_ventas_con_detalles(filtros), params)
+        venta = None
+        while True:
+            filas = cur.fetchmany(500)
+            if not filas:
+                break
+            for vid, fecha, tipo_pago, est, total, iid, pid, nombre, cant, precio, subtotal in filas:
+                if venta is None or venta["id"] != vid:
+                    if venta is not None:
+                        yield venta
+                    venta = {
+                        "id": vid,
+                        "fecha": fecha,
+                        "tipo_pago": tipo_pago,
+                        "estado": est,
+                        "total": float(total) if total else 0.0,
+                        "items": [],
+                    }
+                if pid is not None:  # sin ítems, o ítem de un producto ya borrado
+                    venta["items"].append(
+                        {
+                            "id": iid,  # ID real de venta_items
+                            "producto_id": pid,
+                            "nombre": nombre,
+                            "cantidad": cant,
+                            "precio": float(precio) if precio else 0.0,
+                            "subtotal": float(subtotal) if subtotal else 0.0,
+                        }
+                    )
+        if venta is not None:
+            yield venta
+    finally:
+        conn.close()
 
-    # Traer todas las ventas
-    cur.execute("SELECT id, fecha, tipo_pago, estado, total FROM ventas ORDER BY fecha DESC")
-    ventas = cur.fetchall()
-
-    ventas_lista = []
-    for v in ventas:
-        venta = {
-            "id": v[0],
-            "fecha": v[1],
-            "tipo_pago": v[2],
-            "estado": v[3],
-            "total": float(v[4]) if v[4] else 0.0,
-        }
 
-        # Traer los items de cada venta con ID real del item
-        cur.execute(
-            """
-            SELECT vi.id, vi.producto_id, p.nombre, vi.cantidad, vi.precio_unitario, vi.subtotal
-            FROM venta_items vi
-            JOIN productos p ON vi.producto_id = p.id
-            WHERE vi.venta_id=?
-        """,
-            (venta["id"],),
-        )
-        items = cur.fetchall()
-
-        venta["items"] = [
-            {
-                "id": it[0],  # ID real de venta_items
-                "producto_id": it[1],
-                "nombre": it[2],
-                "cantidad": it[3],
-                "precio": float(it[4]) if it[4] else 0.0,
-                "subtotal": float(it[5]) if it[5] else 0.0,
-            }
-            for it in items
-        ]
+def obtener_ventas_pagina(fecha_inicio=None, fecha_fin=None, venta_id=None, antes_de_id=None, limite=200):
+    """
+    Una página de ventas (sin ítems), de la más nueva a la más vieja:
+    [(id, fecha, tipo_pago, estado, total)].
+    Paginado por clave: la página siguiente se pide con antes_de_id = id de la última fila recibida,
+    así cada página cuesta lo mismo sin importar cuánto historial haya detrás (no usa OFFSET).
+    venta_id busca una venta puntual.
+    """
+    filtros, params = rango_fechas("fecha", fecha_inicio, fecha_fin)
+    if venta_id is not None:
+        filtros += " AND id = ?"
+        params.append(venta_id)
+    if antes_de_id is not None:
+        filtros += " AND id < ?"
+        params.append(antes_de_id)
+    params.append(limite)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT id, fecha, tipo_pago, estado, total FROM ventas WHERE 1=1 {filtros} ORDER BY id DESC LIMIT ?",
+        params,
+    )
+    filas = cur.fetchall()
+    conn.close()
+    return filas
 
-        ventas_lista.append(venta)
 
-    conn.close()
-    return ventas_lista
+def obtener_ventas_con_detalles(fecha_inicio=None, fecha_fin=None, estado=None):
+    """Lista completa de iterar_ventas_con_detalles() (compatibilidad)."""
+    return list(iterar_ventas_con_detalles(fecha_inicio, fecha_fin, estado))
 
 
 def obtener_producto_por_barcode(codigo_barras):
@@ -1041,17 +2629,9 @@ def obtener_gastos(tipo="almacen", fecha_inicio=None, fecha_fin=None):
     conn = get_connection()
     cur = conn.cursor()
     query = "SELECT id, fecha, categoria, monto, detalle FROM gastos WHERE tipo=?"
-    params = [tipo]
-
-    if fecha_inicio and fecha_fin:
-        query += " AND date(fecha) BETWEEN date(?) AND date(?)"
-        params.extend([fecha_inicio, fecha_fin])
-    elif fecha_inicio:
-        query += " AND date(fecha) >= date(?)"
-        params.append(fecha_inicio)
-    elif fecha_fin:
-        query += " AND date(fecha) <= date(?)"
-        params.append(fecha_fin)
+    filtro_fecha, params_fecha = rango_fechas("fecha", fecha_inicio, fecha_fin)
+    query += filtro_fecha
+    params = [tipo] + params_fecha
 
     query += " ORDER BY fecha DESC"
     cur.execute(query, tuple(params))
@@ -1064,17 +2644,9 @@ def obtener_resumen_gastos(tipo="almacen", fecha_inicio=None, fecha_fin=None):
     conn = get_connection()
     cur = conn.cursor()
     query = "SELECT categoria, SUM(monto) FROM gastos WHERE tipo=?"
-    params = [tipo]
-
-    if fecha_inicio and fecha_fin:
-        query += " AND date(fecha) BETWEEN date(?) AND date(?)"
-        params.extend([fecha_inicio, fecha_fin])
-    elif fecha_inicio:
-        query += " AND date(fecha) >= date(?)"
-        params.append(fecha_inicio)
-    elif fecha_fin:
-        query += " AND date(fecha) <= date(?)"
-        params.append(fecha_fin)
+    filtro_fecha, params_fecha = rango_fechas("fecha", fecha_inicio, fecha_fin)
+    query += filtro_fecha
+    params = [tipo] + params_fecha
 
     query += " GROUP BY categoria ORDER BY SUM(monto) DESC"
     cur.execute(query, tuple(params))
@@ -1092,6 +2664,12 @@ def eliminar_gasto(gasto_id):
 
 
 def exportar_gastos_excel(tipo="almacen", filename="gastos.xlsx", fecha_inicio=None, fecha_fin=None):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, numbers
+    from openpyxl.chart import PieChart, Reference
+    from openpyxl.utils import get_column_letter
+    from openpyxl.chart.label import DataLabelList
+
     gastos = obtener_gastos(tipo, fecha_inicio, fecha_fin)
     resumen = obtener_resumen_gastos(tipo, fecha_inicio, fecha_fin)
 
@@ -1247,114 +2825,150 @@ def _datos_venta_y_items(venta_id):
     return venta, items
 
 
-def generar_ticket_a4(venta_id, ruta):
+def _datos_ticket(venta_id):
+    """Datos del ticket de una venta ya registrada (ver tickets.datos_ticket), o None si no existe."""
     venta, items = _datos_venta_y_items(venta_id)
     if not venta:
         return None
+    import tickets
 
-    ancho, alto = A4
-    c = canvas.Canvas(ruta, pagesize=A4)
-    y = alto - 20 * mm
+    fecha, tipo_pago, total, recibido, vuelto, cliente = venta
+    return tickets.datos_ticket(venta_id, items, tipo_pago, total, recibido, vuelto, cliente, fecha)
 
-    c.setFont("Helvetica-Bold", 14)
-    c.drawCentredString(ancho / 2, y, "Mi Almacén")
-    y -= 10 * mm
 
-    c.setFont("Helvetica", 10)
-    c.drawString(20 * mm, y, f"Fecha: {venta[0]}")
-    y -= 5 * mm
-    c.drawString(20 * mm, y, f"Cliente: {venta[5]}")
-    y -= 10 * mm
+def generar_ticket_a4(venta_id, ruta):
+    datos = _datos_ticket(venta_id)
+    if not datos:
+        return None
+    import tickets
 
-    c.drawString(20 * mm, y, "Cant  Producto              P.Unit   Subtotal")
-    y -= 5 * mm
-    for nombre, cant, precio, subtotal in items:
-        c.drawString(20 * mm, y, f"{cant:>3}  {nombre[:20]:<20} {precio:>7.2f}  {subtotal:>7.2f}")
-        y -= 5 * mm
+    return tickets.renderizar(datos, ruta, "a4")
 
-    y -= 10 * mm
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(20 * mm, y, f"TOTAL: ${venta[2]:.2f}")
-    y -= 7 * mm
-    c.setFont("Helvetica", 10)
-    c.drawString(20 * mm, y, f"Pago: {venta[1]}")
-    if venta[1] == "Efectivo":
-        y -= 5 * mm
-        c.drawString(20 * mm, y, f"Recibido: ${venta[3] or 0:.2f}  Vuelto: ${venta[4] or 0:.2f}")
 
-    c.save()
-    return ruta
+def generar_ticket_termico(venta_id, ruta):
+    """Ticket térmico 58 mm de ancho (el alto se ajusta a la cantidad de ítems)."""
+    datos = _datos_ticket(venta_id)
+    if not datos:
+        return None
+    import tickets
+
+    return tickets.renderizar(datos, ruta, "termico")
 
 
-def generar_ticket_termico(venta_id, ruta):
-    """Ticket térmico 58 mm de ancho."""
-    venta, items = _datos_venta_y_items(venta_id)
-    if not venta:
+def generar_ticket(venta_id, formato=None):
+    """
+    Crea el PDF del ticket en %ProgramData%\\GestorDeStock\\Tickets\\ y devuelve la ruta.
+    Lee la venta de la base; el POS, que ya tiene los datos en memoria, usa tickets.generar directamente.
+    """
+    datos = _datos_ticket(venta_id)
+    if not datos:
         return None
+    import tickets
 
-    ancho = 58 * mm
-    alto = 200 * mm  # suficiente para ~30 líneas
-    c = canvas.Canvas(ruta, pagesize=(ancho, alto))
-    y = alto - 10 * mm
+    return tickets.generar(datos, formato)
 
-    # Encabezado
-    c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(ancho / 2, y, "Mi Almacén")
-    y -= 6 * mm
-
-    c.setFont("Helvetica", 7)
-    c.drawString(4 * mm, y, f"Fecha: {venta[0]}")
-    y -= 4 * mm
-    c.drawString(4 * mm, y, f"Cliente: {venta[5]}")
-    y -= 6 * mm
-
-    # Productos
-    c.setFont("Helvetica-Bold", 7)
-    c.drawString(4 * mm, y, "Cant Prod         Subtot")
-    y -= 4 * mm
-    c.setFont("Helvetica", 7)
-
-    for nombre, cant, precio, subtotal in items:
-        nombre_corto = (nombre[:10] + "...") if len(nombre) > 12 else nombre
-        c.drawString(4 * mm, y, f"{cant:>2}  {nombre_corto:<12} {subtotal:>6.2f}")
-        y -= 4 * mm
-
-    # Total y pago
-    y -= 4 * mm
-    c.setFont("Helvetica-Bold", 8)
-    c.drawString(4 * mm, y, f"TOTAL: ${venta[2]:.2f}")
-    y -= 5 * mm
-
-    c.setFont("Helvetica", 7)
-    c.drawString(4 * mm, y, f"Pago: {venta[1]}")
-    if venta[1] == "Efectivo":
-        y -= 4 * mm
-        c.drawString(4 * mm, y, f"Recibido: ${venta[3] or 0:.2f}")
-        y -= 4 * mm
-        c.drawString(4 * mm, y, f"Vuelto:   ${venta[4] or 0:.2f}")
-
-    # Mensaje final
-    y -= 8 * mm
-    c.setFont("Helvetica-Oblique", 7)
-    c.drawCentredString(ancho / 2, y, "¡Gracias por su compra!")
-
-    c.save()
-    return ruta
 
+# --------- Cola de impresión (la procesa impresion.ColaImpresion) ---------
 
-def generar_ticket(venta_id, formato=None):
-    """Crea el PDF del ticket en %ProgramData%\GestorDeStock\Tickets\ y devuelve la ruta."""
-    base = os.environ.get("ProgramData", os.getcwd())
-    out_dir = os.path.join(base, APP_NAME, "Tickets")
-    os.makedirs(out_dir, exist_ok=True)
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    ruta = os.path.join(out_dir, f"ticket_{venta_id}_{stamp}.pdf")
-
-    fmt = (formato or FORMATO_TICKET).lower()
-    if fmt == "a4":
-        return generar_ticket_a4(venta_id, ruta)
-    else:
-        return generar_ticket_termico(venta_id, ruta)
+
+def encolar_impresion(venta_id, formato, datos):
+    """Guarda un ticket para imprimir (datos: ver tickets.datos_ticket). Devuelve el id del trabajo."""
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with transaccion() as cur:
+        cur.execute(
+            "INSERT INTO cola_impresion (venta_id, formato, datos, proximo_intento, creado) VALUES (?, ?, ?, ?, ?)",
+            (venta_id, formato, json.dumps(datos, ensure_ascii=False), ahora, ahora),
+        )
+        return cur.lastrowid
+
+
+def siguiente_impresion():
+    """
+    El trabajo pendiente más viejo que ya puede intentarse:
+    (id, venta_id, formato, datos, intentos, ruta) o None.
+    """
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    fila = (
+        get_connection()
+        .execute(
+            """
+        SELECT id, venta_id, formato, datos, intentos, ruta
+        FROM cola_impresion
+        WHERE estado = 'PENDIENTE' AND proximo_intento <= ?
+        ORDER BY proximo_intento, id
+        LIMIT 1
+    """,
+            (ahora,),
+        )
+        .fetchone()
+    )
+    if not fila:
+        return None
+    return fila[0], fila[1], fila[2], json.loads(fila[3]), fila[4], fila[5]
+
+
+def impresion_terminada(trabajo_id, ruta):
+    with transaccion() as cur:
+        cur.execute(
+            "UPDATE cola_impresion SET estado='IMPRESO', ruta=?, error=NULL, actualizado=? WHERE id=?",
+            (ruta, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), trabajo_id),
+        )
+
+
+def impresion_fallida(trabajo_id, ruta, error, intentos, reintentar_en=None):
+    """Registra el intento fallido; con reintentar_en (segundos) queda pendiente, si no pasa a ERROR."""
+    ahora = datetime.now()
+    estado = "PENDIENTE" if reintentar_en is not None else "ERROR"
+    proximo = ahora + timedelta(seconds=reintentar_en or 0)
+    with transaccion() as cur:
+        cur.execute(
+            """
+            UPDATE cola_impresion
+            SET estado=?, intentos=?, ruta=?, error=?, proximo_intento=?, actualizado=?
+            WHERE id=?
+        """,
+            (
+                estado,
+                intentos,
+                ruta,
+                str(error)[:500],
+                proximo.strftime("%Y-%m-%d %H:%M:%S"),
+                ahora.strftime("%Y-%m-%d %H:%M:%S"),
+                trabajo_id,
+            ),
+        )
+
+
+def contar_cola_impresion():
+    """(pendientes, con error) de la cola de impresión."""
+    filas = dict(
+        get_connection()
+        .execute(
+            "SELECT estado, COUNT(*) FROM cola_impresion WHERE estado IN ('PENDIENTE', 'ERROR') GROUP BY estado"
+        )
+        .fetchall()
+    )
+    return filas.get("PENDIENTE", 0), filas.get("ERROR", 0)
+
+
+def reintentar_impresiones():
+    """Vuelve a poner en cola los tickets que agotaron los reintentos. Devuelve cuántos."""
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with transaccion() as cur:
+        cur.execute(
+            "UPDATE cola_impresion SET estado='PENDIENTE', intentos=0, proximo_intento=?, actualizado=? "
+            "WHERE estado='ERROR'",
+            (ahora, ahora),
+        )
+        return cur.rowcount
+
+
+def purgar_cola_impresion(dias=7):
+    """Borra los trabajos ya impresos hace más de `dias` días (el PDF queda en la carpeta de tickets)."""
+    limite = (datetime.now() - timedelta(days=dias)).strftime("%Y-%m-%d %H:%M:%S")
+    with transaccion() as cur:
+        cur.execute("DELETE FROM cola_impresion WHERE estado='IMPRESO' AND actualizado < ?", (limite,))
+        return cur.rowcount
 
 
 def guardar_carrito_temporal(lista_items):
@@ -1426,9 +3040,55 @@ def obtener_categorias_gasto(tipo="almacen"):
     return rows
 
 
-def _hash_password(plain: str, iterations: int = 200_000) -> str:
+# --- Costo de PBKDF2 ---
+# Las iteraciones se calibran en cada PC para que verificar una contraseña tarde ~PBKDF2_OBJETIVO_MS (con piso
+# y techo). Al iniciar sesión bien, si el hash guardado quedó por debajo del costo actual (o es texto plano
+# legado), se vuelve a hashear: las claves se actualizan solas, sin pedirle nada al usuario.
+PBKDF2_OBJETIVO_MS = 250
+PBKDF2_ITERACIONES_MIN = 100_000
+PBKDF2_ITERACIONES_MAX = 2_000_000
+PBKDF2_PASO = 50_000  # se redondea para que la calibración no cambie de un arranque a otro por ruido
+ITERACIONES_CLAVE_POR_DEFECTO = 1_000  # admin/admin es pública: hashearla lento no protege nada
+_iteraciones_pbkdf2 = None
+
+
+def calibrar_pbkdf2(objetivo_ms=PBKDF2_OBJETIVO_MS, muestra=20_000):
+    """Iteraciones de PBKDF2-SHA256 para que un hash tarde ~objetivo_ms en esta PC (redondeado, con piso/techo)."""
+    t0 = time.perf_counter()
+    _hashlib.pbkdf2_hmac("sha256", b"calibracion", b"\0" * 16, muestra)
+    ms_por_iteracion = max((time.perf_counter() - t0) * 1000 / muestra, 1e-6)
+    iteraciones = int(objetivo_ms / ms_por_iteracion) // PBKDF2_PASO * PBKDF2_PASO
+    return min(max(iteraciones, PBKDF2_ITERACIONES_MIN), PBKDF2_ITERACIONES_MAX)
+
+
+def iteraciones_pbkdf2():
+    """Costo actual (se calibra una vez por proceso, en el primer uso: nunca en el hilo de la interfaz al inicio)."""
+    global _iteraciones_pbkdf2
+    if _iteraciones_pbkdf2 is None:
+        _iteraciones_pbkdf2 = calibrar_pbkdf2()
+    return _iteraciones_pbkdf2
+
+
+def _necesita_rehash(stored: str) -> bool:
+    """True si el hash guardado es texto plano legado o quedó lejos del costo actual."""
+    partes = (stored or "").strip().replace(":", "$").split("$")
+    if partes[0] != "pbkdf2_sha256" or len(partes) < 4:
+        return True
+    try:
+        iteraciones = int(partes[1])
+    except ValueError:
+        return True
+    actual = iteraciones_pbkdf2()
+    # bastante más bajo: se refuerza; más del doble: la base vino de una PC más rápida y el login se volvió lento.
+    # El margen evita re-hashear por el ruido de la calibración entre un arranque y otro.
+    return iteraciones < 0.8 * actual or iteraciones > 2 * actual
+
+
+def _hash_password(plain: str, iterations: int = None) -> str:
     if plain is None:
         plain = ""
+    if iterations is None:
+        iterations = iteraciones_pbkdf2()
     salt = _os.urandom(16)
     dk = _hashlib.pbkdf2_hmac("sha256", plain.encode("utf-8"), salt, iterations)
     return "pbkdf2_sha256$%d$%s$%s" % (iterations, _binascii.hexlify(salt).decode(), _binascii.hexlify(dk).decode())
@@ -1498,13 +3158,24 @@ def verificar_usuario(usuario: str, password: str):
     conn = get_connection()
     cur = conn.cursor()
     # ⚠️ Selecciona SOLO por usuario; la contraseña se valida en Python
-    cur.execute("SELECT password, rol FROM usuarios WHERE usuario=?", (usuario,))
+    cur.execute("SELECT id, password, rol FROM usuarios WHERE usuario=?", (usuario,))
     row = cur.fetchone()
     conn.close()
     if not row:
         return None
-    stored, rol = row
-    return rol if _verify_password(password, stored) else None
+    uid, stored, rol = row
+    if not _verify_password(password, stored):
+        return None
+    if _necesita_rehash(stored):
+        # la contraseña es correcta y la tenemos en claro: se guarda con el costo actual
+        try:
+            with transaccion() as cur:
+                cur.execute(
+                    "UPDATE usuarios SET password=? WHERE id=? AND password=?", (_hash_password(password), uid, stored)
+                )
+        except Exception as e:
+            print("⚠️ No se pudo actualizar el hash de la contraseña:", e)
+    return rol
 
 
 def crear_usuario(usuario, password, rol="user"):
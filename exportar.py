@@ -0,0 +1,91 @@
+# exportar.py
+# Exportación de tablas a Excel / CSV escribiendo cada hoja una sola vez.
+#  - Excel: xlsxwriter en modo constant_memory (las filas se vuelcan al disco a medida que se escriben),
+#    una llamada write_row por fila; formatos por columna (set_column) y por rango (bordes), nunca por celda.
+#  - CSV: streaming desde cualquier iterable de filas (p. ej. database.iterar_productos()), sin armar
+#    el DataFrame: sirve para catálogos muy grandes.
+# progreso(filas), opcional, se llama cada PASO_PROGRESO filas (ver ui_tareas).
+import csv
+import os
+
+PASO_PROGRESO = 5000
+ANCHO_MAXIMO = 60
+FORMATO_ENCABEZADO = {"bold": True, "bg_color": "#DDDDDD", "border": 1}
+
+
+def anchos_columnas(df, muestra=20000):
+    """Ancho sugerido por columna (largo máximo del texto + 2), calculado columna a columna con pandas."""
+    datos = df.head(muestra)
+    anchos = []
+    for col in df.columns:
+        largo = datos[col].astype(str).str.len().max() if len(datos) else 0
+        anchos.append(min(max(int(largo or 0), len(str(col))) + 2, ANCHO_MAXIMO))
+    return anchos
+
+
+def excel(ruta, df, hoja="Hoja1", formatos_numero=None, progreso=None):
+    """
+    Escribe df en ruta (.xlsx): encabezado gris, bordes en los datos, autofiltro y primera fila fija.
+    formatos_numero: {columna: num_format} (p. ej. {"Precio": "$#,##0.00"}).
+    Devuelve ruta.
+    """
+    import xlsxwriter
+
+    formatos_numero = formatos_numero or {}
+    columnas = [str(c) for c in df.columns]
+    wb = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+    completo = False
+    try:
+        ws = wb.add_worksheet(hoja)
+        encabezado = wb.add_format(FORMATO_ENCABEZADO)
+        for c, (col, ancho) in enumerate(zip(columnas, anchos_columnas(df))):
+            fmt = wb.add_format({"num_format": formatos_numero[col]}) if col in formatos_numero else None
+            ws.set_column(c, c, ancho, fmt)
+
+        ws.write_row(0, 0, columnas, encabezado)
+        # NaN -> celda vacía (xlsxwriter no acepta NaN)
+        filas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        r = 0
+        for r, fila in enumerate(filas, start=1):
+            ws.write_row(r, 0, fila)
+            if progreso and r % PASO_PROGRESO == 0:
+                progreso(r)
+        if r:
+            # bordes con un único formato condicional sobre el rango de datos (no celda por celda)
+            borde = wb.add_format({"border": 1})
+            ws.conditional_format(1, 0, r, len(columnas) - 1, {"type": "formula", "criteria": "=TRUE", "format": borde})
+        ws.autofilter(0, 0, max(r, 1), len(columnas) - 1)
+        ws.freeze_panes(1, 0)
+        completo = True
+    finally:
+        wb.close()
+        if not completo:
+            _borrar(ruta)  # cancelado o con error: no dejamos un archivo a medias
+    return ruta
+
+
+def csv_streaming(ruta, filas, columnas, separador=",", progreso=None):
+    """
+    Escribe filas (iterable de tuplas) en ruta sin cargarlas todas en memoria.
+    UTF-8 con BOM para que Excel respete los acentos. Devuelve la cantidad de filas escritas.
+    """
+    n = 0
+    try:
+        with open(ruta, "w", newline="", encoding="utf-8-sig") as f:
+            w = csv.writer(f, delimiter=separador)
+            w.writerow(columnas)
+            for n, fila in enumerate(filas, start=1):
+                w.writerow(fila)
+                if progreso and n % PASO_PROGRESO == 0:
+                    progreso(n)
+    except BaseException:
+        _borrar(ruta)
+        raise
+    return n
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
@@ -0,0 +1,131 @@
+# impresion.py
+# Cola de impresión de tickets. El POS solo guarda el ticket en la tabla cola_impresion y vuelve a escanear;
+# un hilo de fondo arma el PDF (tickets.py) y lo manda al spooler.
+#  - Si la impresora falla, reintenta con esperas crecientes (2, 4, 8, 16 s...). Agotados los intentos, el
+#    trabajo queda en ERROR hasta que se pida reintentar (botón 🖨 de la barra de estado).
+#  - Los trabajos están en la base: si la app se cierra con tickets en cola, se imprimen al volver a abrirla.
+#  - El estado se avisa con avisar(texto, ms) desde el hilo de la cola (la ventana lo pasa por una señal).
+import os
+import subprocess
+import sys
+import threading
+
+import database
+import tickets
+
+MAX_INTENTOS = 5
+ESPERA_BASE = 2  # segundos antes del primer reintento; se duplica en cada uno
+ESPERA_MAX = 60
+TIMEOUT_SPOOLER = 30  # segundos que puede tardar `lp` en aceptar el trabajo
+
+
+def enviar_a_impresora(ruta):
+    """Manda el PDF a la impresora predeterminada; lanza excepción si el spooler lo rechaza."""
+    if sys.platform.startswith("win"):
+        os.startfile(ruta, "print")
+    else:
+        r = subprocess.run(["lp", ruta], capture_output=True, text=True, timeout=TIMEOUT_SPOOLER)
+        if r.returncode != 0:
+            raise RuntimeError((r.stderr or r.stdout).strip() or f"lp salió con código {r.returncode}")
+
+
+class ColaImpresion(threading.Thread):
+    """
+    Hilo que procesa la cola de impresión de a un ticket, en orden de llegada.
+    imprimir(ruta) es el envío al spooler (se puede cambiar para pruebas o para otra impresora).
+    """
+
+    def __init__(self, avisar=None, imprimir=enviar_a_impresora, intervalo=1.0):
+        super().__init__(name="cola-impresion", daemon=True)
+        self.avisar = avisar
+        self.imprimir = imprimir
+        self.intervalo = intervalo
+        self._despertar = threading.Event()
+        self._parar = threading.Event()
+
+    def run(self):
+        try:
+            database.purgar_cola_impresion()
+            while not self._parar.is_set():
+                try:
+                    trabajo = database.siguiente_impresion()
+                    if trabajo:
+                        self.procesar(trabajo)
+                        continue
+                except Exception as e:
+                    print("⚠️ Cola de impresión:", e)
+                    database.descartar_pendiente("cola de impresión")
+                # sin trabajos listos: esperamos uno nuevo o el próximo reintento
+                self._despertar.wait(self.intervalo)
+                self._despertar.clear()
+        finally:
+            database.cerrar_conexion_hilo()
+
+    def procesar(self, trabajo):
+        trabajo_id, venta_id, formato, datos, intentos, ruta = trabajo
+        try:
+            if not ruta or not os.path.exists(ruta):
+                ruta = tickets.generar(datos, formato)
+            self.imprimir(ruta)
+        except Exception as e:
+            intentos += 1
+            if intentos >= MAX_INTENTOS:
+                database.impresion_fallida(trabajo_id, ruta, e, intentos)
+                self._avisar(f"⚠️ Ticket de la venta #{venta_id} sin imprimir: {e}", 0)
+            else:
+                espera = min(ESPERA_BASE * 2 ** (intentos - 1), ESPERA_MAX)
+                database.impresion_fallida(trabajo_id, ruta, e, intentos, espera)
+                self._avisar(f"🖨 Ticket #{venta_id}: falló la impresión, reintento en {espera} s ({e})", 5000)
+        else:
+            database.impresion_terminada(trabajo_id, ruta)
+            self._avisar(f"🖨 Ticket de la venta #{venta_id} enviado a la impresora", 4000)
+
+    def despertar(self):
+        self._despertar.set()
+
+    def detener(self, timeout=5.0):
+        self._parar.set()
+        self._despertar.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def _avisar(self, texto, ms):
+        if self.avisar:
+            self.avisar(texto, ms)
+        else:
+            print(texto)
+
+
+_cola = None
+
+
+def iniciar_cola(**opciones):
+    """Arranca (una sola vez) el hilo de la cola; imprime lo que haya quedado pendiente."""
+    global _cola
+    if _cola is None or not _cola.is_alive():
+        _cola = ColaImpresion(**opciones)
+        _cola.start()
+    return _cola
+
+
+def detener_cola():
+    global _cola
+    if _cola is not None:
+        _cola.detener()
+        _cola = None
+
+
+def encolar(datos, formato=None):
+    """Guarda el ticket en la cola (datos: ver tickets.datos_ticket) y despierta al hilo. Devuelve el id."""
+    fmt = (formato or database.FORMATO_TICKET).lower()
+    trabajo_id = database.encolar_impresion(datos["id"], fmt, datos)
+    iniciar_cola().despertar()
+    return trabajo_id
+
+
+def reintentar():
+    """Vuelve a encolar los tickets en ERROR. Devuelve cuántos."""
+    n = database.reintentar_impresiones()
+    if n:
+        iniciar_cola().despertar()
+    return n
@@ -1,25 +1,38 @@
 # main.py
-import sys, os, shutil
-from datetime import datetime
-from PySide6.QtWidgets import QApplication, QMessageBox
-import database
-from ui_main import MainWindow
-from ui_login import LoginDialog
-from ui_usuarios import UsuarioForm
+import time
 
-# (limpieza) quitamos imports duplicados de os, shutil
+_INICIO = time.perf_counter()  # el tiempo hasta el login incluye los imports de abajo
+
+import atexit  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+
+from PySide6.QtCore import QTimer  # noqa: E402
+from PySide6.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import database  # noqa: E402
+from ui_login import LoginDialog  # noqa: E402
+
+# ui_main (y con ella el POS, reportes, etc.) se importa recién después del login: el diálogo aparece antes.
+# pandas / openpyxl / reportlab / xlsxwriter se cargan solo al exportar, importar, hacer un reporte o un ticket.
+
+
+def _login_visible():
+    if os.environ.get("GESTOR_MEDIR_ARRANQUE"):
+        # benchmarks/bench_arranque.py: solo interesa llegar al login
+        print(f"⏱ Login visible en {(time.perf_counter() - _INICIO) * 1000:.0f} ms")
+        sys.stdout.flush()
+        os._exit(0)
 
 
-def respaldo_automatico():
-    import os, shutil
-    from database import DATA_DIR, DB_PATH
+def _al_fallar(tipo, error, tb):
+    # excepción sin atrapar en un slot de Qt: lo que la función dejó escrito sin commit no debe
+    # confirmarse junto con la próxima escritura
+    database.descartar_pendiente(f"{tipo.__name__}: {error}")
+    sys.__excepthook__(tipo, error, tb)
 
-    backups_dir = os.path.join(DATA_DIR, "backups")
-    os.makedirs(backups_dir, exist_ok=True)
-    fecha = datetime.now().strftime("%Y-%m-%d")
-    destino = os.path.join(backups_dir, f"almacen_{fecha}.db")
-    if not os.path.exists(destino) and os.path.exists(DB_PATH):
-        shutil.copy(DB_PATH, destino)
+
+# (limpieza) quitamos imports duplicados de os, shutil
 
 
 if __name__ == "__main__":
@@ -31,18 +44,28 @@ if __name__ == "__main__":
         print("Error inicializando base de datos:", e)
         sys.exit(1)
 
+    # Las conexiones quedan abiertas durante toda la sesión; se cierran al salir
+    atexit.register(database.cerrar_conexiones)
+    sys.excepthook = _al_fallar
+
+    # Checkpoints del WAL en segundo plano cuando la app está ociosa
+    database.iniciar_checkpoints()
+    atexit.register(database.detener_checkpoints)
+
     # Garantizamos la carpeta de datos (útil para backup u "abrir carpeta de datos")
     os.makedirs(database.DATA_DIR, exist_ok=True)
 
-    # Backup del día antes de abrir UI
-    respaldo_automatico()
-
     app = QApplication(sys.argv)
 
     # 🔑 diálogo de login
     login = LoginDialog()
+    QTimer.singleShot(0, _login_visible)  # corre apenas el diálogo está en pantalla
     if login.exec() != LoginDialog.Accepted:
         sys.exit(0)
+    t_login = time.perf_counter()
+
+    from ui_main import MainWindow
+    from ui_usuarios import UsuarioForm
 
     window = MainWindow()
     window.rol_actual = login.rol
@@ -81,7 +104,8 @@ if __name__ == "__main__":
                     QMessageBox.information(
                         None,
                         "Usuario creado",
-                        f"✅ Usuario '{user}' creado correctamente.\n\nAhora podés usar la aplicación con tu nueva cuenta.",
+                        f"✅ Usuario '{user}' creado correctamente.\n\n"
+                        "Ahora podés usar la aplicación con tu nueva cuenta.",
                     )
                     break
                 except Exception as e:
@@ -93,4 +117,8 @@ if __name__ == "__main__":
 
     window.aplicar_permisos()
     window.show()
+
+    # Arranque por etapas: la ventana se pinta vacía y los datos llegan desde una tarea en segundo plano;
+    # el snapshot de stock y el backup del día corren cuando la interfaz queda ociosa (ver MainWindow.iniciar)
+    QTimer.singleShot(0, lambda: window.iniciar(t_login))
     sys.exit(app.exec())
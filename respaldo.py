@@ -0,0 +1,148 @@
+# respaldo.py
+# Backups de la base con la API de backup de SQLite, sin copiar el archivo a mano:
+#  - respaldar(): copia consistente aunque la app esté escribiendo (shutil.copy podía llevarse una base a medias
+#    y dejaba afuera lo que todavía estaba en el WAL). Copia de a PAGINAS_POR_PASO páginas con una pausa corta
+#    entre pasos, con una conexión propia: se corre en una Tarea (ui_tareas) y la interfaz nunca se congela.
+#  - compactar=True usa VACUUM INTO: una copia ya compactada (sin páginas libres), un poco más lenta.
+#  - respaldo_diario(): el backup del día en DATA_DIR/backups + rotación (rotar()) + la base de archivo,
+#    que solo se vuelve a copiar cuando cambió.
+# La copia se escribe en un .tmp y se renombra al final: nunca queda un backup a medias con el nombre final.
+# progreso(paginas), opcional, se llama después de cada paso y puede cortar el backup (TareaCancelada).
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+import database
+
+PAGINAS_POR_PASO = 1024  # 4 MB por paso con páginas de 4 KB
+PAUSA_ENTRE_PASOS = 0.005  # segundos; deja pasar a las escrituras de la app
+MAX_REINICIOS = 2
+# el diario usa la copia por pasos (progreso, cancelable, tolera escrituras); True = VACUUM INTO, opcional
+COMPACTAR_RESPALDO_DIARIO = False
+RETENCION_DIARIOS = 14  # últimos backups diarios que se conservan
+RETENCION_MENSUALES = 12  # además, el primero de cada mes de los últimos N meses
+
+CARPETA_RESPALDOS = os.path.join(database.DATA_DIR, "backups")
+_PATRON_DIARIO = re.compile(r"^almacen_(\d{4})-(\d{2})-(\d{2})\.db$")
+
+
+def respaldar(destino, origen=None, compactar=False, progreso=None):
+    """
+    Copia la base origen (por defecto database.DB_PATH) en destino.
+    Devuelve {"ruta", "bytes", "segundos"}.
+    """
+    origen = origen or database.DB_PATH
+    if not os.path.exists(origen):
+        raise FileNotFoundError(f"No existe la base {origen}")
+    temporal = destino + ".tmp"
+    _borrar(temporal)
+    inicio = time.perf_counter()
+    fuente = sqlite3.connect(origen, timeout=30)
+    try:
+        if compactar:
+            # VACUUM INTO es una sola lectura (en WAL no bloquea a los que escriben)
+            fuente.execute("VACUUM INTO ?", (temporal,))
+        else:
+            copia = sqlite3.connect(temporal)
+            try:
+                _copiar_por_pasos(fuente, copia, progreso)
+            finally:
+                copia.close()
+    except BaseException:
+        _borrar(temporal)
+        raise
+    finally:
+        fuente.close()
+    os.replace(temporal, destino)
+    return {"ruta": destino, "bytes": os.path.getsize(destino), "segundos": time.perf_counter() - inicio}
+
+
+class _Reiniciado(Exception):
+    """El backup volvió a empezar demasiadas veces (otra conexión escribe entre paso y paso)."""
+
+
+def _copiar_por_pasos(fuente, copia, progreso):
+    # Si otra conexión escribe entre dos pasos, SQLite reinicia la copia desde el principio: con ventas seguidas
+    # podría no terminar nunca. Después de MAX_REINICIOS se copia lo que falta en un solo paso, que en WAL es
+    # una lectura más y tampoco bloquea a los que escriben.
+    estado = {"restantes": None, "reinicios": 0}
+
+    def avance(_estado, restantes, total):
+        if estado["restantes"] is not None and restantes > estado["restantes"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] > MAX_REINICIOS:
+                raise _Reiniciado()
+        estado["restantes"] = restantes
+        if progreso:
+            progreso(total - restantes)
+
+    try:
+        fuente.backup(copia, pages=PAGINAS_POR_PASO, progress=avance, sleep=PAUSA_ENTRE_PASOS)
+    except _Reiniciado:
+        fuente.backup(copia)
+
+
+def rotar(carpeta=None, diarios=RETENCION_DIARIOS, mensuales=RETENCION_MENSUALES):
+    """
+    Borra los backups diarios (almacen_AAAA-MM-DD.db) que ya no hacen falta: quedan los `diarios` más nuevos
+    y el primero de cada uno de los últimos `mensuales` meses. Devuelve la lista de archivos borrados.
+    """
+    carpeta = carpeta or CARPETA_RESPALDOS
+    try:
+        nombres = os.listdir(carpeta)
+    except FileNotFoundError:
+        return []
+    fechas = sorted(((_PATRON_DIARIO.match(n).groups(), n) for n in nombres if _PATRON_DIARIO.match(n)), reverse=True)
+    conservar = {n for _, n in fechas[:diarios]}
+    primeros_del_mes = {}
+    for (anio, mes, _dia), nombre in fechas:  # de más nuevo a más viejo: queda el primero del mes
+        primeros_del_mes[(anio, mes)] = nombre
+    for clave in sorted(primeros_del_mes, reverse=True)[:mensuales]:
+        conservar.add(primeros_del_mes[clave])
+    borrados = []
+    for _, nombre in fechas:
+        if nombre not in conservar:
+            _borrar(os.path.join(carpeta, nombre))
+            borrados.append(nombre)
+    return borrados
+
+
+def respaldo_diario(progreso=None):
+    """
+    Backup del día (si todavía no existe), rotación de los viejos y copia de la base de archivo si cambió.
+    Devuelve {"ruta", "bytes", "segundos", "borrados", "archivo"} o None si el backup del día ya estaba.
+    """
+    os.makedirs(CARPETA_RESPALDOS, exist_ok=True)
+    destino = os.path.join(CARPETA_RESPALDOS, f"almacen_{datetime.now():%Y-%m-%d}.db")
+    if os.path.exists(destino) or not os.path.exists(database.DB_PATH):
+        return None
+    resultado = respaldar(destino, compactar=COMPACTAR_RESPALDO_DIARIO, progreso=progreso)
+    resultado["borrados"] = rotar()
+    resultado["archivo"] = respaldar_archivo(os.path.join(CARPETA_RESPALDOS, "almacen_archivo.db"))
+    return resultado
+
+
+def respaldar_archivo(destino):
+    """
+    Copia la base de archivo (database.ARCHIVO_PATH) en destino solo si existe y es más nueva que la copia:
+    cambia únicamente al archivar, no tiene sentido copiarla todos los días. Devuelve el resultado o None.
+    """
+    if not os.path.exists(database.ARCHIVO_PATH):
+        return None
+    if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(database.ARCHIVO_PATH):
+        return None
+    return respaldar(destino, origen=database.ARCHIVO_PATH)
+
+
+def describir(resultado):
+    """Texto corto para la barra de estado: tamaño y duración."""
+    return f"{resultado['bytes'] / 1_048_576:.1f} MB en {resultado['segundos']:.1f} s"
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
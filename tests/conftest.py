@@ -0,0 +1,18 @@
+# tests/conftest.py
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """
+    Módulo database apuntando a una base nueva en una carpeta temporal (DATA_DIR sale de PROGRAMDATA al
+    importar, por eso se fija antes). Nunca toca la base real.
+    """
+    os.environ["PROGRAMDATA"] = str(tmp_path_factory.mktemp("gestor"))
+    import database
+
+    database.inicializar_db()
+    yield database
+    database.cerrar_conexion_hilo()
@@ -0,0 +1,55 @@
+# tests/test_conexiones.py
+import sqlite3
+import threading
+
+
+def _contar_en_disco(database, codigo):
+    # conexión aparte: solo ve lo confirmado
+    with sqlite3.connect(database.DB_PATH) as otra:
+        return otra.execute("SELECT COUNT(*) FROM productos WHERE codigo=?", (codigo,)).fetchone()[0]
+
+
+def test_escritura_a_medias_sobrevive_a_otras_funciones(database):
+    conn = database.get_connection()
+    conn.execute("INSERT INTO productos (codigo, nombre, cantidad, precio) VALUES ('C-001', 'A medias', 1, 10)")
+    database.obtener_sectores()  # get_connection() + close() en el medio
+    with database.transaccion() as cur:  # se suma a la transacción implícita
+        cur.execute("UPDATE productos SET cantidad = 2 WHERE codigo = 'C-001'")
+    assert conn.in_transaction
+    conn.commit()
+    assert _contar_en_disco(database, "C-001") == 1
+
+
+def test_descartar_pendiente(database):
+    conn = database.get_connection()
+    conn.execute("INSERT INTO productos (codigo, nombre, cantidad, precio) VALUES ('C-002', 'Descartado', 1, 10)")
+    assert database.descartar_pendiente("prueba")
+    assert not database.descartar_pendiente("prueba")
+    assert _contar_en_disco(database, "C-002") == 0
+
+
+def test_cerrar_conexiones_no_cierra_las_de_otros_hilos(database):
+    listo, seguir, errores = threading.Event(), threading.Event(), []
+
+    def trabajador():
+        try:
+            conn = database.get_connection()
+            with database.transaccion() as cur:
+                cur.execute("INSERT INTO productos (codigo, nombre, cantidad, precio) VALUES ('C-003', 'Hilo', 1, 10)")
+                listo.set()
+                seguir.wait(5)
+            conn.execute("SELECT 1")  # sigue abierta
+            assert database.get_connection() is not conn  # invalidada: se reabre en el próximo uso
+        except Exception as e:
+            errores.append(e)
+        finally:
+            database.cerrar_conexion_hilo()
+
+    hilo = threading.Thread(target=trabajador)
+    hilo.start()
+    listo.wait(5)
+    database.cerrar_conexiones()
+    seguir.set()
+    hilo.join(5)
+    assert errores == []
+    assert _contar_en_disco(database, "C-003") == 1
@@ -0,0 +1,11 @@
+# tests/test_indices.py
+def test_consultas_criticas_usan_indice(database):
+    # si falla, la consulta nombrada recorre una tabla completa: falta (o no se usa) su índice
+    assert database.planes_sin_indice() == {}
+
+
+def test_consultas_criticas_con_archivo_adjunto(database):
+    # con almacen_archivo.db adjunto, las consultas históricas leen las vistas que unen las dos bases
+    database.archivar_historial()
+    assert database.get_connection().execute("SELECT 1 FROM pragma_database_list WHERE name = 'archivo'").fetchone()
+    assert database.planes_sin_indice() == {}
@@ -0,0 +1,27 @@
+# tests/test_ventas_diarias.py
+def test_resumen_diario_tras_devolucion_parcial_y_cobro(database):
+    a = database.agregar_producto("T-001", "Yerba 1kg", 20, 1000.0, None, "7791111111111")
+    b = database.agregar_producto("T-002", "Azucar 1kg", 20, 500.0, None, "7791111111112")
+    cliente = database.agregar_cliente("Cliente de prueba")
+
+    ok, venta_id = database.registrar_venta(
+        [
+            {"producto_id": a, "cantidad": 2, "precio_unitario": 1500.0},
+            {"producto_id": b, "cantidad": 3, "precio_unitario": 700.0},
+        ],
+        "Pendiente",
+        cliente=cliente,
+    )
+    assert ok, venta_id
+
+    sql = "SELECT id FROM venta_items WHERE venta_id=? AND producto_id=?"
+    item_b = database.get_connection().execute(sql, (venta_id, b)).fetchone()[0]
+    ok, msg = database.reembolsar_venta(venta_id, [item_b])
+    assert ok, msg
+
+    ok, msg = database.marcar_venta_pagada(venta_id, "Efectivo", recibido=5000.0)
+    assert ok, msg
+
+    assert database.verificar_ventas_diarias() == []
+    dia, tipo, ventas, total, items, costo = database.resumen_ventas_diario()[-1]
+    assert (tipo, ventas, total, items) == ("Efectivo", 1, 3000.0, 2)
@@ -0,0 +1,223 @@
+# tickets.py
+# Motor de tickets en PDF (reportlab, que se importa recién al primer ticket).
+#  - Las plantillas (térmico 58 mm / A4) se arman una sola vez: posiciones, fuentes, interlineados y el ancho
+#    de los textos fijos ya calculados. Cada ticket solo recorre sus renglones.
+#  - Térmico: el alto de la página sale de la cantidad de renglones (antes era fijo de 200 mm y los carritos
+#    largos se cortaban). A4: pagina y repite el encabezado de columnas.
+#  - Se dibuja con un único objeto de texto por página, posicionando solo al cambiar de bloque (los ítems van
+#    seguidos con T*), y sin compresión (el ticket pesa pocos KB): ahí se iba la mayor parte del tiempo.
+#  - datos_ticket() arma los datos desde lo que el POS ya tiene en memoria: no hace falta volver a la base.
+import os
+from datetime import datetime
+
+import database
+
+MM = 72 / 25.4  # puntos por milímetro (igual que reportlab.lib.units.mm)
+TITULO = "Mi Almacén"
+GRACIAS = "¡Gracias por su compra!"
+
+_plantillas = {}
+
+
+def datos_ticket(venta_id, items, tipo_pago, total, recibido=None, vuelto=None, cliente=None, fecha=None):
+    """
+    Datos de un ticket. items: [(nombre, cantidad, precio_unitario, subtotal)].
+    fecha: texto 'AAAA-MM-DD HH:MM:SS' (por defecto, ahora); cliente: nombre (por defecto 'Consumidor Final').
+    """
+    return {
+        "id": venta_id,
+        "fecha": fecha or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "cliente": cliente or "Consumidor Final",
+        "tipo_pago": tipo_pago,
+        "total": float(total or 0),
+        "recibido": recibido,
+        "vuelto": vuelto,
+        "items": list(items),
+    }
+
+
+def carpeta_tickets():
+    # junto a la base (en Windows, %ProgramData%\GestorDeStock\Tickets); antes salía de la variable
+    # ProgramData, que fuera de Windows no existe y dejaba los tickets en la carpeta actual
+    carpeta = os.path.join(database.DATA_DIR, "Tickets")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def generar(datos, formato=None):
+    """Crea el PDF del ticket en la carpeta de tickets y devuelve la ruta."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ruta = os.path.join(carpeta_tickets(), f"ticket_{datos['id']}_{stamp}.pdf")
+    return renderizar(datos, ruta, formato)
+
+
+def renderizar(datos, ruta, formato=None):
+    """Dibuja el ticket en ruta (archivo o file-like) con la plantilla del formato ('termico' o 'a4')."""
+    fmt = (formato or database.FORMATO_TICKET).lower()
+    plantilla = _plantillas.get(fmt)
+    if plantilla is None:
+        plantilla = _plantillas[fmt] = PlantillaA4() if fmt == "a4" else PlantillaTermica()
+    plantilla.dibujar(datos, ruta)
+    return ruta
+
+
+class Plantilla:
+    """
+    Diseño de un formato de ticket. Un renglón es (fuente, tamaño, avance, x, texto): avance es cuánto baja
+    el renglón respecto del anterior; x None = centrado (solo para los textos fijos, con el ancho ya calculado).
+    """
+
+    ancho = alto = 0
+    margen_sup = margen_inf = 0
+
+    def __init__(self):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        self._centrados = {}
+        for fuente, tam, texto in self.textos_centrados():
+            self._centrados[texto] = (self.ancho - stringWidth(texto, fuente, tam)) / 2
+
+    def textos_centrados(self):
+        return []
+
+    def encabezado(self, datos):
+        return []
+
+    def columnas(self):
+        return []
+
+    def renglon_item(self, item):
+        raise NotImplementedError
+
+    def pie(self, datos):
+        return []
+
+    def dibujar(self, datos, ruta):
+        from reportlab.pdfgen import canvas
+
+        cuerpo = [self.renglon_item(it) for it in datos["items"]]
+        encabezado, pie = self.encabezado(datos) + self.columnas(), self.pie(datos)
+        alto = self.alto_pagina(encabezado, cuerpo, pie)
+        c = canvas.Canvas(ruta, pagesize=(self.ancho, alto), pageCompression=0)
+        for n, pagina in enumerate(self.paginar(encabezado, cuerpo, pie, alto)):
+            if n:
+                c.showPage()
+            texto = c.beginText()
+            bloque = None
+            for fuente, tam, avance, x, y, linea in pagina:
+                if x is None:
+                    x = self._centrados[linea]
+                if (fuente, tam, avance, x) != bloque:
+                    # renglones seguidos con igual fuente, margen e interlineado: un solo Tm y después T*
+                    bloque = (fuente, tam, avance, x)
+                    texto.setFont(fuente, tam, avance)
+                    texto.setTextOrigin(x, y)
+                texto.textLine(linea)
+            c.drawText(texto)
+        c.save()
+
+    def paginar(self, encabezado, cuerpo, pie, alto):
+        """Reparte los renglones en páginas: [[(fuente, tamaño, avance, x, y, texto), ...], ...]."""
+        paginas, pagina, y = [], [], alto - self.margen_sup
+        for renglones in (encabezado, cuerpo, pie):
+            for fuente, tam, avance, x, linea in renglones:
+                y -= avance
+                if renglones is not encabezado and y < self.margen_inf - 1:
+                    # no entra: se sigue en otra página (si faltan ítems, con el encabezado de columnas)
+                    paginas.append(pagina)
+                    pagina, y = [], alto - self.margen_sup
+                    for f, t, a, xc, lc in self.columnas() if renglones is cuerpo else []:
+                        y -= a
+                        pagina.append((f, t, a, xc, y, lc))
+                    y -= avance
+                pagina.append((fuente, tam, avance, x, y, linea))
+        paginas.append(pagina)
+        return paginas
+
+    def alto_pagina(self, encabezado, cuerpo, pie):
+        return self.alto
+
+
+class PlantillaTermica(Plantilla):
+    """Ticket térmico de 58 mm; el alto se ajusta a los renglones."""
+
+    ancho = 58 * MM
+    margen_sup = 10 * MM
+    margen_inf = 6 * MM
+    x = 4 * MM
+
+    def textos_centrados(self):
+        return [("Helvetica-Bold", 10, TITULO), ("Helvetica-Oblique", 7, GRACIAS)]
+
+    def encabezado(self, datos):
+        return [
+            ("Helvetica-Bold", 10, 0, None, TITULO),
+            ("Helvetica", 7, 6 * MM, self.x, f"Fecha: {datos['fecha']}"),
+            ("Helvetica", 7, 4 * MM, self.x, f"Cliente: {datos['cliente']}"),
+        ]
+
+    def columnas(self):
+        return [("Helvetica-Bold", 7, 6 * MM, self.x, "Cant Prod         Subtot")]
+
+    def renglon_item(self, item):
+        nombre, cant, _precio, subtotal = item
+        nombre_corto = (nombre[:10] + "...") if len(nombre) > 12 else nombre
+        return ("Helvetica", 7, 4 * MM, self.x, f"{cant:>2}  {nombre_corto:<12} {subtotal:>6.2f}")
+
+    def pie(self, datos):
+        renglones = [
+            ("Helvetica-Bold", 8, 8 * MM, self.x, f"TOTAL: ${datos['total']:.2f}"),
+            ("Helvetica", 7, 5 * MM, self.x, f"Pago: {datos['tipo_pago']}"),
+        ]
+        if datos["tipo_pago"] == "Efectivo":
+            renglones.append(("Helvetica", 7, 4 * MM, self.x, f"Recibido: ${datos['recibido'] or 0:.2f}"))
+            renglones.append(("Helvetica", 7, 4 * MM, self.x, f"Vuelto:   ${datos['vuelto'] or 0:.2f}"))
+        renglones.append(("Helvetica-Oblique", 7, 8 * MM, None, GRACIAS))
+        return renglones
+
+    def alto_pagina(self, encabezado, cuerpo, pie):
+        avances = sum(r[2] for r in encabezado) + sum(r[2] for r in cuerpo) + sum(r[2] for r in pie)
+        return self.margen_sup + avances + self.margen_inf
+
+
+class PlantillaA4(Plantilla):
+    """Ticket A4; si los ítems no entran en una hoja, sigue en la siguiente."""
+
+    ancho, alto = 210 * MM, 297 * MM
+    margen_sup = 20 * MM
+    margen_inf = 20 * MM
+    x = 20 * MM
+
+    def textos_centrados(self):
+        return [("Helvetica-Bold", 14, TITULO)]
+
+    def encabezado(self, datos):
+        return [
+            ("Helvetica-Bold", 14, 0, None, TITULO),
+            ("Helvetica", 10, 10 * MM, self.x, f"Fecha: {datos['fecha']}"),
+            ("Helvetica", 10, 5 * MM, self.x, f"Cliente: {datos['cliente']}"),
+        ]
+
+    def columnas(self):
+        return [("Helvetica", 10, 10 * MM, self.x, "Cant  Producto              P.Unit   Subtotal")]
+
+    def renglon_item(self, item):
+        nombre, cant, precio, subtotal = item
+        return ("Helvetica", 10, 5 * MM, self.x, f"{cant:>3}  {nombre[:20]:<20} {precio:>7.2f}  {subtotal:>7.2f}")
+
+    def pie(self, datos):
+        renglones = [
+            ("Helvetica-Bold", 12, 15 * MM, self.x, f"TOTAL: ${datos['total']:.2f}"),
+            ("Helvetica", 10, 7 * MM, self.x, f"Pago: {datos['tipo_pago']}"),
+        ]
+        if datos["tipo_pago"] == "Efectivo":
+            renglones.append(
+                (
+                    "Helvetica",
+                    10,
+                    5 * MM,
+                    self.x,
+                    f"Recibido: ${datos['recibido'] or 0:.2f}  Vuelto: ${datos['vuelto'] or 0:.2f}",
+                )
+            )
+        return renglones
@@ -1,6 +1,8 @@
 # ui_login.py
-from PySide6.QtWidgets import QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QMessageBox
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QMessageBox, QProgressBar
 import database
+from ui_tareas import GestorTareas
 
 
 class LoginDialog(QDialog):
@@ -18,13 +20,22 @@ class LoginDialog(QDialog):
         form.addRow("Usuario:", self.input_user)
         form.addRow("Contraseña:", self.input_pass)
 
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        # indicador de "verificando": el hash de la contraseña tarda (a propósito) y corre en segundo plano
+        self.ocupado = QProgressBar()
+        self.ocupado.setRange(0, 0)
+        self.ocupado.setTextVisible(False)
+        self.ocupado.setMaximumHeight(6)
+        self.ocupado.setVisible(False)
+        form.addRow(self.ocupado)
+
+        self.buttons = buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         form.addRow(buttons)
 
         buttons.accepted.connect(self._login)
         buttons.rejected.connect(self.reject)
 
         self.rol = None  # se guarda el rol al validar
+        self.tareas = GestorTareas(self)
 
         # 🎨 Estilos para hacer el login más lindo
         self.setStyleSheet(
@@ -60,12 +71,31 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "Login", "Ingrese usuario y contraseña")
             return
 
-        try:
-            rol = database.verificar_usuario(user, pwd)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"No se pudo verificar el usuario.\n{e}")
-            return
+        if self.tareas.hay_tareas():
+            return  # ya se está verificando (Enter dos veces)
+        self._verificando(True)
+        self.tareas.lanzar(
+            "Verificando usuario",
+            lambda progreso: database.verificar_usuario(user, pwd),
+            escritura=True,  # puede volver a guardar el hash con el costo actual
+            al_terminar=lambda rol: self._al_verificar(user, rol),
+            al_fallar=self._al_fallar,
+        )
 
+    def _verificando(self, activo):
+        self.ocupado.setVisible(activo)
+        self.input_user.setEnabled(not activo)
+        self.input_pass.setEnabled(not activo)
+        self.buttons.button(QDialogButtonBox.Ok).setEnabled(not activo)
+        if activo:
+            self.setCursor(Qt.BusyCursor)
+        else:
+            self.unsetCursor()
+
+    def _al_verificar(self, user, rol):
+        self._verificando(False)
+        if not self.isVisible():
+            return  # se canceló mientras verificaba
         if rol:
             self.rol = rol
             self.usuario = user
@@ -74,3 +104,7 @@ class LoginDialog(QDialog):
             QMessageBox.critical(self, "Error", "Usuario o contraseña incorrectos")
             self.input_pass.clear()
             self.input_pass.setFocus()
+
+    def _al_fallar(self, error):
+        self._verificando(False)
+        QMessageBox.critical(self, "Error", f"No se pudo verificar el usuario.\n{error}")
@@ -6,7 +6,10 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QTableWidget,
     QTableWidgetItem,
-    QTextEdit,
+    QTableView,
+    QHeaderView,
+    QAbstractItemView,
+    QListView,
     QFileDialog,
     QLineEdit,
     QLabel,
@@ -19,18 +22,31 @@ from PySide6.QtWidgets import (
     QPushButton,
     QComboBox,
     QFormLayout,
+    QInputDialog,
+    QApplication,
 )
-from PySide6.QtGui import QAction, QColor, QKeySequence
-from PySide6.QtCore import Qt, QDate, QTimer
-import pandas as pd
+from PySide6.QtGui import QAction, QKeySequence
+from PySide6.QtCore import Qt, QDate, QObject, QTimer, Signal
 import database
 from ui_formulario import FormularioProducto
 from ui_vender import FormularioPOS
 import os
-import shutil
-from PySide6.QtCore import QTimer
+import time
 from PySide6.QtWidgets import QDialogButtonBox
 from ui_usuarios import UsuariosDialog
+from ui_modelos import LIMITE_HISTORIAL, ModeloHistorial, ModeloProductos, ModeloVentas, MotorFiltro
+from ui_tareas import GestorTareas
+import exportar
+import impresion
+import respaldo
+
+COLUMNAS_STOCK = ["ID", "Código", "Nombre", "Cantidad", "Costo", "Sector", "Precio", "Código Barras", "Movimientos"]
+FORMATOS_STOCK = {"Costo": "$#,##0.00", "Precio": "$#,##0.00"}
+
+
+class _AvisosImpresion(QObject):
+    # la cola de impresión avisa desde su hilo; la señal lo trae al hilo de la interfaz
+    mensaje = Signal(str, int)
 
 
 class MainWindow(QMainWindow):
@@ -59,6 +75,7 @@ class MainWindow(QMainWindow):
         self.act_clientes = QAction("👥 Clientes", self)
         self.act_pendientes = QAction("🧾 Ventas Pendientes", self)
         self.act_backup = QAction("💾 Backup", self)
+        self.act_archivar = QAction("🗄 Archivar historial", self)
 
         self.act_sectores = QAction("📂 Sectores", self)
         toolbar.addAction(self.act_sectores)
@@ -77,6 +94,7 @@ class MainWindow(QMainWindow):
             self.act_clientes,
             self.act_pendientes,
             self.act_backup,
+            self.act_archivar,
         ]:
             toolbar.addAction(act)
 
@@ -95,8 +113,24 @@ class MainWindow(QMainWindow):
         search_layout.addWidget(self.chk_bajo_stock)
         left_layout.addLayout(search_layout)
 
-        self.table = QTableWidget()
+        # Modelo/vista: la vista solo pide las celdas visibles; el motor filtra sobre el catálogo en memoria
+        self.modelo_productos = ModeloProductos(self)
+        self._motor_filtro = MotorFiltro()
+        # se filtra cuando se deja de tipear: una ráfaga del scanner es una sola pasada, no 13
+        self._filtro_timer = QTimer(self)
+        self._filtro_timer.setSingleShot(True)
+        self._filtro_timer.setInterval(150)
+        self._filtro_timer.timeout.connect(self._filtrar_diferido)
+
+        self.table = QTableView()
+        self.table.setModel(self.modelo_productos)
         self.table.setAlternatingRowColors(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        # el ancho de columnas se calcula con una muestra de filas, no con todo el catálogo
+        self.table.horizontalHeader().setResizeContentsPrecision(200)
         left_layout.addWidget(self.table)
 
         main_layout.addLayout(left_layout, stretch=3)
@@ -104,8 +138,12 @@ class MainWindow(QMainWindow):
         # right panel - historial
         right_layout = QVBoxLayout()
         right_layout.addWidget(QLabel("📜 Historial (últimos movimientos)"))
-        self.historial = QTextEdit()
-        self.historial.setReadOnly(True)
+        # lista con tope de líneas: refrescar agrega solo los movimientos nuevos arriba
+        self.modelo_historial = ModeloHistorial(self)
+        self.historial = QListView()
+        self.historial.setModel(self.modelo_historial)
+        self.historial.setUniformItemSizes(True)
+        self.historial.setEditTriggers(QAbstractItemView.NoEditTriggers)
         right_layout.addWidget(self.historial)
         main_layout.addLayout(right_layout, stretch=1)
 
@@ -115,16 +153,34 @@ class MainWindow(QMainWindow):
         self.status = QStatusBar()
         self.setStatusBar(self.status)
 
+        # trabajos pesados (importar/exportar/reportes) en segundo plano; avisan por la barra de estado
+        self.tareas = GestorTareas(self)
+        self.tareas.mensaje.connect(self.status.showMessage)
+        self.btn_cancelar_tarea = QPushButton("✖ Cancelar")
+        self.btn_cancelar_tarea.setVisible(False)
+        self.btn_cancelar_tarea.clicked.connect(self.tareas.cancelar_todas)
+        self.tareas.activas.connect(lambda n: self.btn_cancelar_tarea.setVisible(n > 0))
+        self.status.addPermanentWidget(self.btn_cancelar_tarea)
+
+        # cola de impresión de tickets: su estado va a la barra (sin carteles que frenen al cajero)
+        self.btn_impresion = QPushButton()
+        self.btn_impresion.setVisible(False)
+        self.btn_impresion.clicked.connect(self.reintentar_impresiones)
+        self.status.addPermanentWidget(self.btn_impresion)
+        self._avisos_impresion = _AvisosImpresion(self)
+        self._avisos_impresion.mensaje.connect(self._al_avisar_impresion)
+
         if hasattr(self, "usuario_actual") and self.usuario_actual:
             self.status.showMessage(f"✅ Sesión iniciada como: {self.usuario_actual} ({self.rol_actual})")
         else:
             self.status.showMessage("✅ Aplicación iniciada")
             self.status.showMessage("✅ Aplicación iniciada")
 
-        # inicializar
+        # inicializar: la ventana arranca vacía y se llena en iniciar() (segundo plano)
         self._productos_cache = []
-        self.actualizar_tabla()
-        self.actualizar_historial()
+        self._mantenimiento_timer = QTimer(self)
+        self._mantenimiento_timer.setInterval(1000)
+        self._mantenimiento_timer.timeout.connect(self._mantenimiento_si_ocioso)
 
         # conexiones
         self.act_agregar.triggered.connect(self.abrir_formulario)
@@ -139,8 +195,9 @@ class MainWindow(QMainWindow):
         self.act_clientes.triggered.connect(self.abrir_clientes)
         self.act_pendientes.triggered.connect(self.abrir_pendientes)
         self.act_backup.triggered.connect(self.backup_manual)
+        self.act_archivar.triggered.connect(self.archivar_historial)
 
-        self.input_buscar.textChanged.connect(self.aplicar_filtros)
+        self.input_buscar.textChanged.connect(lambda _: self._filtro_timer.start())
         self.chk_bajo_stock.toggled.connect(self.aplicar_filtros)
 
         self.act_gastos = QAction("💵 Gastos", self)
@@ -166,6 +223,15 @@ class MainWindow(QMainWindow):
         toolbar.addAction(self.act_usuarios)
         self.act_usuarios.triggered.connect(self.abrir_usuarios)
 
+    def closeEvent(self, event):
+        # no se cierra con un trabajo a medias: se cancela (una importación se revierte) y se espera
+        if self.tareas.hay_tareas():
+            self.tareas.cancelar_todas()
+            self.tareas.esperar()
+        # lo que quede en la cola de impresión sigue en la base y se imprime en el próximo inicio
+        impresion.detener_cola()
+        super().closeEvent(event)
+
     # -------------------------
     # SCANNER
     # -------------------------
@@ -184,17 +250,9 @@ class MainWindow(QMainWindow):
         self.escanear_codigo(codigo)
 
     def escanear_codigo(self, codigo):
-        # Buscar producto por barcode o código interno
+        # Buscar producto por barcode o código interno (una búsqueda por índice)
         codigo = (codigo or "").strip()
-        prod = None
-        if codigo:
-            prod = database.obtener_producto_por_barcode(codigo)
-        if not prod:
-            for p in database.obtener_productos():
-                pid, cod, nombre, cantidad, costo, sector, precio, codigo_barras, movs = p
-                if str(cod).strip().lower() == codigo.lower():
-                    prod = p
-                    break
+        prod = database.lookup_producto(codigo)
 
         if prod:
             if not self._pos_dialog or not self._pos_dialog.isVisible():
@@ -206,6 +264,8 @@ class MainWindow(QMainWindow):
                     lambda _: (
                         self.actualizar_tabla(),
                         self.actualizar_historial(),
+                        self.actualizar_pendientes(),
+                        self._mostrar_cola_impresion(),
                         self.aplicar_filtros(),
                         self.input_buscar.setFocus(),
                         self.status.showMessage("🛒 Venta registrada", 5000),
@@ -240,81 +300,41 @@ class MainWindow(QMainWindow):
     # tabla productos (igual que antes)
     # -------------------------
     def _cargar_productos(self):
-        self._productos_cache = database.obtener_productos()
+        # Catálogo en memoria: solo va a la base si hubo cambios externos
+        self._productos_cache = database.catalogo.todos()
         return self._productos_cache
 
     def actualizar_tabla(self):
-        productos = self._cargar_productos()
-        self._pintar_tabla(productos)
-
-    def _pintar_tabla(self, productos):
-        headers = ["ID", "Código", "Nombre", "Cantidad", "Costo", "Sector", "Precio", "Código Barras", "Movs"]
-        self.table.setColumnCount(len(headers))
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.setRowCount(len(productos))
-
-        for r, prod in enumerate(productos):
-            for c, val in enumerate(prod):
-                item = QTableWidgetItem(str(val))
-                if c == 3:
-                    try:
-                        cant = int(val)
-                        if cant <= 5:
-                            item.setForeground(QColor("red"))
-                        if cant == 0:
-                            item.setForeground(QColor("#777777"))
-                    except:
-                        pass
-                self.table.setItem(r, c, item)
-        self.table.resizeColumnsToContents()
-        try:
-            self.table.sortItems(2)
-        except:
-            pass
+        self._cargar_productos()
+        self.aplicar_filtros()
+
+    def _filtrar_diferido(self):
+        # si es un código escaneado, el scanner limpia el campo enseguida: filtramos recién ahí
+        if self._scan_timer.isActive():
+            return
+        self.aplicar_filtros()
 
     def aplicar_filtros(self):
-        texto = self.input_buscar.text().strip().lower()
-        solo_bajo = self.chk_bajo_stock.isChecked()
-        filtrados = []
-        for prod in self._productos_cache:
-            _id, codigo, nombre, cantidad, costo, sector, precio, codigobarras, movs = prod
-            ok_text = True
-            if texto:
-                ok_text = (
-                    (texto in str(codigo).lower())
-                    or (texto in str(nombre).lower())
-                    or (texto in str(codigobarras).lower())
-                )
-            ok_bajo = True
-            if solo_bajo:
-                try:
-                    ok_bajo = int(cantidad) <= 5
-                except:
-                    ok_bajo = False
-            if ok_text and ok_bajo:
-                filtrados.append(prod)
-        self._pintar_tabla(filtrados)
+        self._filtro_timer.stop()
+        filas = self._motor_filtro.filtrar(
+            self._productos_cache, self.input_buscar.text(), self.chk_bajo_stock.isChecked()
+        )
+        primera_carga = self.modelo_productos.rowCount() == 0
+        self.modelo_productos.set_filas(filas)
+        if primera_carga and filas:
+            self.table.resizeColumnsToContents()
+
+    def _producto_seleccionado(self):
+        indice = self.table.currentIndex()
+        if not indice.isValid():
+            return None
+        return self.modelo_productos.fila(indice.row())
 
     # -------------------------
     # historial
     # -------------------------
     def actualizar_historial(self):
-        movs = database.obtener_movimientos(300)
-        self.historial.clear()
-        for mid, nombre, tipo, cambio, precio_unit, fecha, detalles in movs:
-            etiqueta = tipo
-            if tipo == "INGRESO":
-                etiqueta = "✅ Ingreso"
-            elif tipo == "VENTA":
-                etiqueta = "🛒 Venta"
-            elif tipo == "EDIT":
-                etiqueta = "✏️ Editado"
-            elif tipo == "ELIM":
-                etiqueta = "❌ Eliminado"
-            elif tipo == "REEMBOLSO":
-                etiqueta = "↩️ Reembolso"
-            linea = f"[{fecha}] {etiqueta}: {nombre} ({cambio}) ${precio_unit} {('- '+detalles) if detalles else ''}"
-            self.historial.append(linea)
+        self.modelo_historial.actualizar()
 
     # -------------------------
     # CRUD productos
@@ -328,21 +348,10 @@ class MainWindow(QMainWindow):
             self.status.showMessage("✅ Producto agregado/actualizado", 4000)
 
     def editar_producto(self):
-        fila = self.table.currentRow()
-        if fila < 0:
+        prod = self._producto_seleccionado()
+        if prod is None:
             self.status.showMessage("⚠ Seleccioná un producto para editar", 4000)
             return
-        prod = (
-            int(self.table.item(fila, 0).text()),  # id
-            self.table.item(fila, 1).text(),  # codigo
-            self.table.item(fila, 2).text(),  # nombre
-            int(self.table.item(fila, 3).text()),  # cantidad
-            float(self.table.item(fila, 4).text()) if self.table.item(fila, 4).text() else 0.0,  # costo
-            self.table.item(fila, 5).text(),  # sector (nombre)
-            float(self.table.item(fila, 6).text()) if self.table.item(fila, 6).text() else 0.0,  # precio
-            self.table.item(fila, 7).text() if self.table.item(fila, 7) else "",  # codigo_barras
-            self.table.item(fila, 8).text() if self.table.item(fila, 8) else "",  # movimientos
-        )
         dialog = FormularioProducto(self, producto=prod)
         if dialog.exec():
             self.actualizar_tabla()
@@ -351,14 +360,13 @@ class MainWindow(QMainWindow):
             self.status.showMessage("✏️ Producto editado", 4000)
 
     def eliminar_producto(self):
-        fila = self.table.currentRow()
-        if fila < 0:
+        prod = self._producto_seleccionado()
+        if prod is None:
             self.status.showMessage("⚠ Seleccioná un producto para eliminar", 4000)
             return
-        nombre = self.table.item(fila, 2).text()
+        pid, nombre = prod[0], prod[2]
         confirm = QMessageBox.question(self, "Confirmar", f"¿Eliminar {nombre}?")
         if confirm == QMessageBox.Yes:
-            pid = int(self.table.item(fila, 0).text())
             database.eliminar_producto(pid)
             self.actualizar_tabla()
             self.actualizar_historial()
@@ -374,6 +382,7 @@ class MainWindow(QMainWindow):
             # recargar todo
             self.actualizar_tabla()
             self.actualizar_historial()
+            self._mostrar_cola_impresion()
             self.aplicar_filtros()
             self.status.showMessage("🛒 Venta registrada", 5000)
 
@@ -381,227 +390,78 @@ class MainWindow(QMainWindow):
     # Importar / Exportar Excel
     # -------------------------
     def exportar_excel(self):
-        productos = database.obtener_productos()
-        df = pd.DataFrame(
-            productos,
-            columns=["ID", "Código", "Nombre", "Cantidad", "Costo", "Sector", "Precio", "Código Barras", "Movimientos"],
+        ruta, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Excel", "stock_exportado.xlsx", "Excel Files (*.xlsx);;CSV (*.csv)"
         )
-        ruta, _ = QFileDialog.getSaveFileName(self, "Guardar Excel", "stock_exportado.xlsx", "Excel Files (*.xlsx)")
         if not ruta:
             return
-        with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
-            df.to_excel(writer, sheet_name="Stock", index=False)
-            self.formatear_hoja_excel(writer, "Stock", df)
-        self.status.showMessage(f"✅ Exportado a {ruta}", 4000)
 
-    def importar_excel(self):
-        from PySide6.QtWidgets import QFileDialog, QMessageBox
-        import pandas as pd
-        import os
-        import database
+        def trabajo(progreso):
+            if ruta.lower().endswith(".csv"):
+                # CSV: se escribe a medida que se lee de la base, sin armar el DataFrame
+                exportar.csv_streaming(ruta, database.iterar_productos(), COLUMNAS_STOCK, progreso=progreso)
+            else:
+                import pandas as pd
+
+                df = pd.DataFrame(database.obtener_productos(), columns=COLUMNAS_STOCK)
+                exportar.excel(ruta, df, "Stock", FORMATOS_STOCK, progreso=progreso)
+            return ruta
 
+        self.tareas.lanzar(
+            "Exportar stock", trabajo, al_terminar=lambda r: self.status.showMessage(f"✅ Exportado a {r}", 4000)
+        )
+
+    def importar_excel(self):
         ruta, _ = QFileDialog.getOpenFileName(
             self, "Importar productos", "", "Excel (*.xlsx *.xls);;CSV (*.csv);;Todos (*.*)"
         )
         if not ruta:
             return
+        ext = os.path.splitext(ruta)[1].lower()
+        if ext not in (".xlsx", ".xls", ".csv"):
+            QMessageBox.warning(self, "Importar", "Formato no soportado.")
+            return
 
-        try:
-            # --- Leer archivo
-            ext = os.path.splitext(ruta)[1].lower()
-            if ext in (".xlsx", ".xls"):
-                df = pd.read_excel(ruta)
-            elif ext == ".csv":
+        def trabajo(progreso):
+            import pandas as pd  # pandas se carga recién cuando hace falta (arranque más rápido)
+
+            # --- Leer archivo (el CSV se lee por partes para no cargarlo entero en memoria)
+            if ext == ".csv":
                 # Ajustá sep/encoding si tu export usa otro
-                df = pd.read_csv(ruta)
+                lotes = pd.read_csv(ruta, chunksize=5000)
             else:
-                QMessageBox.warning(self, "Importar", "Formato no soportado.")
-                return
+                lotes = pd.read_excel(ruta)
+                if lotes.empty:
+                    return None
+            # --- Upsert masivo: una sola transacción (columnas por alias, sectores y matches resueltos en lote)
+            return database.importar_productos(lotes, progreso=progreso)
 
-            if df.empty:
+        def al_terminar(res):
+            if res is None:
                 QMessageBox.information(self, "Importar", "El archivo está vacío.")
                 return
-
-            # --- Normalizar nombres de columnas (case-insensitive, sin espacios)
-            colmap = {c: str(c).strip().lower().replace(" ", "_") for c in df.columns}
-            df.rename(columns=colmap, inplace=True)
-
-            # Sinónimos típicos
-            aliases = {
-                "codigo": {"codigo", "código", "sku", "cod"},
-                "nombre": {"nombre", "producto", "descripcion", "descripción"},
-                "stock": {"stock", "cantidad", "cant"},
-                "costo": {"costo", "costo_unitario", "cost"},
-                "sector": {"sector", "rubro", "categoria", "categoría"},
-                "codigo_barras": {"codigo_barras", "código_barras", "ean", "barcode", "codbarras"},
-            }
-
-            def pick(*keys):
-                # devuelve la primera columna presente según alias
-                opts = set()
-                for k in keys:
-                    opts |= aliases.get(k, {k})
-                for name in df.columns:
-                    if name in opts:
-                        return name
-                return None
-
-            code_col = pick("codigo")
-            name_col = pick("nombre")
-            qty_col = pick("stock")
-            costo_col = pick("costo")
-            sector_col = pick("sector")
-            barras_col = pick("codigo_barras")
-
-            if not name_col:
-                QMessageBox.warning(self, "Importar", "No se encontró la columna de NOMBRE.")
-                return
-            if not (code_col or barras_col):
-                QMessageBox.warning(self, "Importar", "Necesito al menos CÓDIGO o CÓDIGO DE BARRAS.")
-                return
-
-            # --- Cache de sectores
-            sectores = database.obtener_sectores()  # [(id, nombre, margen) o similar]
-            # Construimos un mapa nombre -> id (case-insensitive)
-            sector_map = {}
-            for s in sectores:
-                # intenta soportar ambas estructuras: (id, nombre, margen) o (id, nombre)
-                sid = s[0]
-                snombre = s[1]
-                sector_map[str(snombre).strip().lower()] = sid
-
-            # --- Pre-caché de productos por código para acelerar match (evita loop por fila)
-            productos = (
-                database.obtener_productos()
-            )  # [(id, codigo, nombre, stock, costo, sector_id, precio, codigo_barras, ...)]
-            by_code = {}
-            for p in productos:
-                try:
-                    if p[1] is not None:
-                        by_code[str(p[1]).strip().lower()] = p
-                except Exception:
-                    pass
-
-            # Contadores
-            inserted = 0
-            updated = 0
-            errores = 0
-
-            # --- Procesar filas
-            for _, row in df.iterrows():
-                codigo = None
-                if code_col and not pd.isna(row.get(code_col)):
-                    codigo = str(row[code_col]).strip()
-                    if codigo == "":
-                        codigo = None
-
-                nombre = str(row[name_col]).strip() if not pd.isna(row.get(name_col)) else ""
-                if not nombre:
-                    # nombre es obligatorio para ambos caminos
-                    errores += 1
-                    continue
-
-                cantidad = 0
-                if qty_col and not pd.isna(row.get(qty_col)):
-                    try:
-                        cantidad = int(float(row[qty_col]))
-                    except Exception:
-                        cantidad = 0
-
-                costo = 0.0
-                if costo_col and not pd.isna(row.get(costo_col)):
-                    try:
-                        costo = float(row[costo_col])
-                    except Exception:
-                        costo = 0.0
-
-                sector_nombre = None
-                if sector_col and not pd.isna(row.get(sector_col)):
-                    sector_nombre = str(row[sector_col]).strip()
-                if not sector_nombre:
-                    sector_nombre = "Almacen"
-
-                codigo_barras = None
-                if barras_col and not pd.isna(row.get(barras_col)):
-                    codigo_barras = str(row[barras_col]).strip()
-                    if codigo_barras == "":
-                        codigo_barras = None  # evita UNIQUE con string vacío
-
-                # Asegurar sector
-                sid = sector_map.get(sector_nombre.strip().lower())
-                if sid is None:
-                    # si el sector no existe, lo creamos con margen por defecto (30%)
-                    database.agregar_sector(sector_nombre, 0.30)
-                    # refrescar cache
-                    sectores = database.obtener_sectores()
-                    sector_map = {str(s[1]).strip().lower(): s[0] for s in sectores}
-                    sid = sector_map.get(sector_nombre.strip().lower())
-
-                # Precio según margen del sector
-                try:
-                    margen = database.obtener_margen_sector(sid)  # espera float (0.30 por ej.)
-                except Exception:
-                    margen = 0.30
-                precio = round((costo or 0.0) * (1 + (margen or 0.0)), 2)
-
-                # --- Upsert: preferir match por código de barras; si no, por código interno
-                prod_exist = None
-
-                if codigo_barras:
-                    try:
-                        prod_exist = database.obtener_producto_por_barcode(codigo_barras)
-                    except Exception:
-                        prod_exist = None
-
-                if not prod_exist and codigo:
-                    prod_exist = by_code.get(codigo.strip().lower())
-
-                try:
-                    if prod_exist:
-                        # prod_exist = (id, codigo, nombre, stock, costo, sector_id, precio, codigo_barras, ...)
-                        pid = int(prod_exist[0])
-                        # ACTUALIZAR en modo ABSOLUTO (stock = cantidad del excel)
-                        database.editar_producto(pid, codigo, nombre, sid, costo, precio, cantidad, codigo_barras)
-                        updated += 1
-                    else:
-                        # INSERTAR (camino existente de tu app)
-                        database.agregar_o_actualizar_producto(codigo, nombre, cantidad, costo, sid, codigo_barras)
-                        inserted += 1
-                except Exception as e:
-                    errores += 1
-                    # si querés loguear: print("Import error:", e)
-
-            QMessageBox.information(
-                self,
-                "Importar",
-                f"✅ Finalizado.\n\nActualizados: {updated}\nInsertados: {inserted}\nErrores: {errores}",
-            )
+            errores = res["errores"]
+            detalle = "\n".join(f"Fila {fila}: {motivo}" for fila, motivo in errores[:15])
+            if len(errores) > 15:
+                detalle += f"\n… y {len(errores) - 15} más"
             # refrescar tabla de productos
             self.actualizar_tabla()
             self.actualizar_historial()
             self.aplicar_filtros()
+            QMessageBox.information(
+                self,
+                "Importar",
+                f"✅ Finalizado.\n\nActualizados: {res['actualizados']}\nInsertados: {res['insertados']}"
+                f"\nErrores: {len(errores)}" + (f"\n\n{detalle}" if detalle else ""),
+            )
 
-        except Exception as e:
-            QMessageBox.critical(self, "Importar", f"Error al importar:\n{e}")
+        def al_fallar(e):
+            if isinstance(e, ValueError):
+                QMessageBox.warning(self, "Importar", str(e))
+            else:
+                QMessageBox.critical(self, "Importar", f"Error al importar:\n{e}")
 
-    # -------------------------
-    # Helper Excel (formato tabla: encabezado gris, bordes, autoancho)
-    # -------------------------
-    def formatear_hoja_excel(self, writer, sheet_name, df):
-        ws = writer.sheets[sheet_name]
-        wb = writer.book
-        header_fmt = wb.add_format({"bold": True, "bg_color": "#DDDDDD", "border": 1})
-        cell_fmt = wb.add_format({"border": 1})
-        for c, col in enumerate(df.columns):
-            try:
-                max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            except Exception:
-                max_len = len(col) + 2
-            ws.set_column(c, c, max_len)
-            ws.write(0, c, col, header_fmt)
-        for r in range(1, len(df) + 1):
-            for c in range(len(df.columns)):
-                ws.write(r, c, df.iloc[r - 1, c], cell_fmt)
+        self.tareas.lanzar("Importar productos", trabajo, escritura=True, al_terminar=al_terminar, al_fallar=al_fallar)
 
     # -------------------------
     # Reportes - ventas agrupadas por tipo de pago (formato mejorado)
@@ -627,74 +487,107 @@ class MainWindow(QMainWindow):
         ok.clicked.connect(dlg.accept)
         cancel.clicked.connect(dlg.reject)
 
-        if dlg.exec():
-            fi = date_ini.date().toString("yyyy-MM-dd")
-            ff = date_fin.date().toString("yyyy-MM-dd")
-            ventas = database.obtener_ventas_con_detalles()
-            ventas = [v for v in ventas if fi <= v["fecha"][:10] <= ff]
+        if not dlg.exec():
+            return
+        fi = date_ini.date().toString("yyyy-MM-dd")
+        ff = date_fin.date().toString("yyyy-MM-dd")
+
+        def buscar(progreso):
+            ventas = []
+            for v in database.iterar_ventas_con_detalles(fi, ff):
+                ventas.append(v)
+                if len(ventas) % 1000 == 0:
+                    progreso(len(ventas))
+            ventas.sort(key=lambda v: v["tipo_pago"])
+            return ventas, database.resumen_ventas_diario(fi, ff)
 
+        def al_encontrar(resultado):
+            ventas, resumen = resultado
             if not ventas:
                 self.status.showMessage("ℹ️ No se encontraron ventas en el rango", 4000)
                 return
-
-            ventas.sort(key=lambda v: v["tipo_pago"])
             ruta, _ = QFileDialog.getSaveFileName(
                 self, "Guardar reporte", "reporte_ventas.xlsx", "Excel Files (*.xlsx)"
             )
             if not ruta:
                 return
+            self.tareas.lanzar(
+                "Reporte de ventas",
+                lambda progreso: self._escribir_reporte_ventas(ruta, ventas, resumen, progreso),
+                al_terminar=lambda r: self.status.showMessage(f"📊 Reporte guardado en {r}", 5000),
+            )
+
+        self.tareas.lanzar("Buscando ventas", buscar, al_terminar=al_encontrar)
+
+    def _escribir_reporte_ventas(self, ruta, ventas, resumen, progreso):
+        # corre en segundo plano: sin widgets
+        import pandas as pd
 
-            with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
-                wb = writer.book
-                ws = wb.add_worksheet("Ventas")
-                writer.sheets["Ventas"] = ws
-
-                bold = wb.add_format({"bold": True})
-                header_fmt = wb.add_format({"bold": True, "bg_color": "#DDDDDD", "border": 1})
-                cell_fmt = wb.add_format({"border": 1})
-                money = wb.add_format({"num_format": "$#,##0.00", "border": 1})
-
-                row = 0
-                total_general = 0
-                max_lens = [0, 0, 0, 0, 0]
-
-                for tipo in sorted(set(v["tipo_pago"] for v in ventas)):
-                    ws.write(row, 0, f"Tipo de pago: {tipo}", bold)
-                    row += 1
-                    headers = ["Fecha/Hora", "Producto", "Cantidad", "Precio Unitario", "Subtotal"]
-                    for i, h in enumerate(headers):
-                        ws.write(row, i, h, header_fmt)
-                        max_lens[i] = max(max_lens[i], len(str(h)))
-                    row += 1
-
-                    total_tipo = 0
-                    for v in [x for x in ventas if x["tipo_pago"] == tipo]:
-                        for item in v["items"]:
-                            values = [v["fecha"], item["nombre"], item["cantidad"], item["precio"], item["subtotal"]]
-                            for i, val in enumerate(values):
-                                txt = str(val)
-                                max_lens[i] = max(max_lens[i], len(txt))
-
-                            ws.write(row, 0, v["fecha"], cell_fmt)
-                            ws.write(row, 1, item["nombre"], cell_fmt)
-                            ws.write(row, 2, item["cantidad"], cell_fmt)
-                            ws.write_number(row, 3, item["precio"], money)
-                            ws.write_number(row, 4, item["subtotal"], money)
-                            total_tipo += item["subtotal"]
-                            row += 1
-
-                    ws.write(row, 3, "TOTAL " + tipo, header_fmt)
-                    ws.write_number(row, 4, total_tipo, money)
-                    row += 2
-                    total_general += total_tipo
-
-                ws.write(row, 3, "TOTAL GENERAL", header_fmt)
-                ws.write_number(row, 4, total_general, money)
-
-                for i, width in enumerate(max_lens):
-                    ws.set_column(i, i, width + 2)
-
-            self.status.showMessage(f"📊 Reporte guardado en {ruta}", 5000)
+        with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
+            wb = writer.book
+            ws = wb.add_worksheet("Ventas")
+            writer.sheets["Ventas"] = ws
+
+            bold = wb.add_format({"bold": True})
+            header_fmt = wb.add_format({"bold": True, "bg_color": "#DDDDDD", "border": 1})
+            cell_fmt = wb.add_format({"border": 1})
+            money = wb.add_format({"num_format": "$#,##0.00", "border": 1})
+
+            row = 0
+            total_general = 0
+            max_lens = [0, 0, 0, 0, 0]
+
+            for tipo in sorted(set(v["tipo_pago"] for v in ventas)):
+                ws.write(row, 0, f"Tipo de pago: {tipo}", bold)
+                row += 1
+                headers = ["Fecha/Hora", "Producto", "Cantidad", "Precio Unitario", "Subtotal"]
+                for i, h in enumerate(headers):
+                    ws.write(row, i, h, header_fmt)
+                    max_lens[i] = max(max_lens[i], len(str(h)))
+                row += 1
+
+                total_tipo = 0
+                for v in [x for x in ventas if x["tipo_pago"] == tipo]:
+                    for item in v["items"]:
+                        values = [v["fecha"], item["nombre"], item["cantidad"], item["precio"], item["subtotal"]]
+                        for i, val in enumerate(values):
+                            txt = str(val)
+                            max_lens[i] = max(max_lens[i], len(txt))
+
+                        ws.write(row, 0, v["fecha"], cell_fmt)
+                        ws.write(row, 1, item["nombre"], cell_fmt)
+                        ws.write(row, 2, item["cantidad"], cell_fmt)
+                        ws.write_number(row, 3, item["precio"], money)
+                        ws.write_number(row, 4, item["subtotal"], money)
+                        total_tipo += item["subtotal"]
+                        row += 1
+                        if row % 1000 == 0:
+                            progreso(row)
+
+                ws.write(row, 3, "TOTAL " + tipo, header_fmt)
+                ws.write_number(row, 4, total_tipo, money)
+                row += 2
+                total_general += total_tipo
+
+            ws.write(row, 3, "TOTAL GENERAL", header_fmt)
+            ws.write_number(row, 4, total_general, money)
+
+            for i, width in enumerate(max_lens):
+                ws.set_column(i, i, width + 2)
+
+            # Hoja "Resumen": totales por día y tipo de pago, leídos de database.ventas_diarias
+            ws = wb.add_worksheet("Resumen")
+            headers = ["Día", "Tipo de pago", "Ventas", "Total", "Unidades", "Costo", "Ganancia"]
+            ws.write_row(0, 0, headers, header_fmt)
+            for r, (dia, tipo, cant_ventas, total, unidades, costo) in enumerate(resumen, start=1):
+                ws.write_row(r, 0, [dia, tipo, cant_ventas], cell_fmt)
+                ws.write_number(r, 3, total, money)
+                ws.write_number(r, 4, unidades, cell_fmt)
+                ws.write_number(r, 5, costo, money)
+                ws.write_number(r, 6, total - costo, money)
+            ws.set_column(0, 1, 14)
+            ws.set_column(2, 6, 12)
+        return ruta
 
     # -------------------------
     # Reembolsos
@@ -705,13 +598,39 @@ class MainWindow(QMainWindow):
         dlg.resize(900, 600)
         layout = QVBoxLayout(dlg)
 
-        # Tabla de ventas
-        table_ventas = QTableWidget()
-        table_ventas.setColumnCount(5)
-        table_ventas.setHorizontalHeaderLabels(["Venta ID", "Fecha", "Pago", "Estado", "Total ($)"])
+        # Búsqueda: por número de venta o por rango de fechas (se resuelve en SQL)
+        filtro_layout = QHBoxLayout()
+        input_venta = QLineEdit()
+        input_venta.setPlaceholderText("Venta ID")
+        input_venta.setMaximumWidth(100)
+        chk_fechas = QCheckBox("Filtrar por fecha")
+        date_ini = QDateEdit(QDate.currentDate().addDays(-30))
+        date_ini.setCalendarPopup(True)
+        date_fin = QDateEdit(QDate.currentDate())
+        date_fin.setCalendarPopup(True)
+        btn_buscar = QPushButton("🔍 Buscar")
+        filtro_layout.addWidget(input_venta)
+        filtro_layout.addWidget(chk_fechas)
+        filtro_layout.addWidget(QLabel("Desde:"))
+        filtro_layout.addWidget(date_ini)
+        filtro_layout.addWidget(QLabel("Hasta:"))
+        filtro_layout.addWidget(date_fin)
+        filtro_layout.addWidget(btn_buscar)
+        filtro_layout.addStretch()
+        layout.addLayout(filtro_layout)
+
+        # Tabla de ventas: se carga por páginas al desplazarse
+        modelo_ventas = ModeloVentas(dlg)
+        table_ventas = QTableView()
+        table_ventas.setModel(modelo_ventas)
+        table_ventas.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table_ventas.setSelectionMode(QAbstractItemView.SingleSelection)
+        table_ventas.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table_ventas.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        table_ventas.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(table_ventas)
 
-        # Tabla de items
+        # Tabla de items (solo los de la venta seleccionada)
         table_items = QTableWidget()
         table_items.setColumnCount(5)
         table_items.setHorizontalHeaderLabels(
@@ -734,66 +653,65 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(btn_cerrar)
         layout.addLayout(btn_layout)
 
-        # Cargar ventas
-        ventas = database.obtener_ventas_con_detalles()
-        table_ventas.setRowCount(len(ventas))
-        for r, v in enumerate(ventas):
-            table_ventas.setItem(r, 0, QTableWidgetItem(str(v["id"])))
-            table_ventas.setItem(r, 1, QTableWidgetItem(str(v["fecha"])))
-            table_ventas.setItem(r, 2, QTableWidgetItem(v["tipo_pago"]))
-            table_ventas.setItem(r, 3, QTableWidgetItem(v["estado"]))
-
-            item_total = QTableWidgetItem(f"${v['total']:.2f}")
-            item_total.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            table_ventas.setItem(r, 4, item_total)
-
-            # Colorear ventas reembolsadas
-            if v["estado"] == "REEMBOLSADO":
-                for col in range(5):
-                    table_ventas.item(r, col).setBackground(QColor("#f0f0f0"))
-
-        # Mostrar items de la venta seleccionada
-        def mostrar_items():
-            row = table_ventas.currentRow()
-            if row < 0:
-                return
-            venta_id = int(table_ventas.item(row, 0).text())
-            venta = next((x for x in ventas if x["id"] == venta_id), None)
-            if not venta:
-                return
+        def venta_seleccionada():
+            row = table_ventas.currentIndex().row()
+            return modelo_ventas.venta(row)[0] if row >= 0 else None
 
-            table_items.setRowCount(len(venta["items"]))
-            for i, it in enumerate(venta["items"]):
+        # Mostrar items de la venta seleccionada (se leen de la base recién al seleccionarla)
+        def mostrar_items(*_):
+            venta_id = venta_seleccionada()
+            items = database.obtener_items_venta(venta_id) if venta_id is not None else []
+            table_items.setRowCount(len(items))
+            for i, (item_id, _pid, nombre, cantidad, precio, subtotal) in enumerate(items):
                 # Usamos el ID real del item en la DB
-                table_items.setItem(i, 0, QTableWidgetItem(str(it["id"])))
-                table_items.setItem(i, 1, QTableWidgetItem(it["nombre"]))
+                table_items.setItem(i, 0, QTableWidgetItem(str(item_id)))
+                table_items.setItem(i, 1, QTableWidgetItem(nombre))
 
-                item_cant = QTableWidgetItem(str(it["cantidad"]))
+                item_cant = QTableWidgetItem(str(cantidad))
                 item_cant.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
                 table_items.setItem(i, 2, item_cant)
 
-                item_precio = QTableWidgetItem(f"${it['precio']:.2f}")
+                item_precio = QTableWidgetItem(f"${float(precio or 0):.2f}")
                 item_precio.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
                 table_items.setItem(i, 3, item_precio)
 
-                item_sub = QTableWidgetItem(f"${it['subtotal']:.2f}")
+                item_sub = QTableWidgetItem(f"${float(subtotal or 0):.2f}")
                 item_sub.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
                 table_items.setItem(i, 4, item_sub)
 
-        table_ventas.itemSelectionChanged.connect(mostrar_items)
-        if ventas:
-            table_ventas.selectRow(0)
+        def buscar():
+            texto = input_venta.text().strip()
+            if texto and not texto.isdigit():
+                QMessageBox.warning(dlg, "Buscar", "El número de venta debe ser numérico.")
+                return
+            if texto:
+                modelo_ventas.buscar(venta_id=int(texto))
+            elif chk_fechas.isChecked():
+                modelo_ventas.buscar(date_ini.date().toString("yyyy-MM-dd"), date_fin.date().toString("yyyy-MM-dd"))
+            else:
+                modelo_ventas.buscar()
+            if modelo_ventas.rowCount():
+                table_ventas.selectRow(0)
             mostrar_items()
 
+        table_ventas.selectionModel().currentRowChanged.connect(mostrar_items)
+        btn_buscar.clicked.connect(buscar)
+        input_venta.returnPressed.connect(buscar)
+
+        def despues_de_reembolsar(venta_id):
+            # solo se vuelve a leer la venta afectada, no el historial
+            modelo_ventas.refrescar_venta(venta_id)
+            mostrar_items()
+            self.actualizar_tabla()  #  refresca la tabla de productos
+            self.actualizar_historial()  # refresca historial de movimientos
+
         # Reembolso total
         def reembolsar_total():
-            row = table_ventas.currentRow()
-            if row < 0:
+            venta_id = venta_seleccionada()
+            if venta_id is None:
                 QMessageBox.warning(dlg, "Error", "Seleccione una venta para reembolsar.")
                 return
 
-            venta_id = int(table_ventas.item(row, 0).text())
-
             reply = QMessageBox.question(
                 dlg,
                 "Confirmar reembolso",
@@ -806,22 +724,19 @@ class MainWindow(QMainWindow):
             ok, msg = database.reembolsar_venta(venta_id)
             if ok:
                 QMessageBox.information(dlg, "Reembolso realizado", msg)
-                self.actualizar_tabla()  #  refresca la tabla de productos
-                self.actualizar_historial()  # refresca historial de movimientos
-                dlg.accept()
+                despues_de_reembolsar(venta_id)
             else:
                 QMessageBox.warning(dlg, "Error en reembolso", msg)
 
         # Reembolso parcial
         def reembolsar_parcial():
-            row_v = table_ventas.currentRow()
+            venta_id = venta_seleccionada()
             row_i = table_items.currentRow()
 
-            if row_v < 0 or row_i < 0:
+            if venta_id is None or row_i < 0:
                 QMessageBox.warning(dlg, "Error", "Seleccione una venta y un ítem para reembolsar.")
                 return
 
-            venta_id = int(table_ventas.item(row_v, 0).text())
             item_id = int(table_items.item(row_i, 0).text())  # Ahora es el ID real
 
             reply = QMessageBox.question(
@@ -836,9 +751,7 @@ class MainWindow(QMainWindow):
             ok, msg = database.reembolsar_venta(venta_id, [item_id])
             if ok:
                 QMessageBox.information(dlg, "Reembolso parcial realizado", msg)
-                self.actualizar_tabla()
-                self.actualizar_historial()
-                dlg.accept()
+                despues_de_reembolsar(venta_id)
             else:
                 QMessageBox.warning(dlg, "Error en reembolso", msg)
 
@@ -847,26 +760,30 @@ class MainWindow(QMainWindow):
         btn_reembolsar_parcial.clicked.connect(reembolsar_parcial)
         btn_cerrar.clicked.connect(dlg.reject)
 
+        buscar()
         dlg.exec()
 
     # -------------------------
-    # Bajo stock (usa helper de Excel)
+    # Bajo stock (usa exportar.excel)
     # -------------------------
     def imprimir_bajo_stock(self):
         productos = [p for p in self._productos_cache if int(p[3]) <= 5]
         if not productos:
             self.status.showMessage("ℹ️ No hay productos con bajo stock", 4000)
             return
-        df = pd.DataFrame(
-            productos,
-            columns=["ID", "Código", "Nombre", "Cantidad", "Costo", "Sector", "Precio", "Código Barras", "Movimientos"],
-        )
         ruta, _ = QFileDialog.getSaveFileName(self, "Guardar bajo stock", "bajo_stock.xlsx", "Excel Files (*.xlsx)")
-        if ruta:
-            with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
-                df.to_excel(writer, sheet_name="BajoStock", index=False)
-                self.formatear_hoja_excel(writer, "BajoStock", df)
-            self.status.showMessage(f"🖨 Guardado: {ruta}", 4000)
+        if not ruta:
+            return
+
+        def trabajo(progreso):
+            import pandas as pd
+
+            df = pd.DataFrame(productos, columns=COLUMNAS_STOCK)
+            return exportar.excel(ruta, df, "BajoStock", FORMATOS_STOCK, progreso=progreso)
+
+        self.tareas.lanzar(
+            "Exportar bajo stock", trabajo, al_terminar=lambda r: self.status.showMessage(f"🖨 Guardado: {r}", 4000)
+        )
 
     # -------------------------
     # NUEVO: Backup manual de la base de datos
@@ -875,14 +792,165 @@ class MainWindow(QMainWindow):
         ruta, _ = QFileDialog.getSaveFileName(self, "Guardar backup", "almacen_backup.db", "Database Files (*.db)")
         if not ruta:
             return
-        if not os.path.exists("almacen.db"):
-            QMessageBox.warning(self, "Backup", "No existe el archivo almacen.db")
+        if not os.path.exists(database.DB_PATH):
+            QMessageBox.warning(self, "Backup", f"No existe la base:\n{database.DB_PATH}")
             return
-        try:
-            shutil.copy("almacen.db", ruta)
-            QMessageBox.information(self, "Backup", f"Backup guardado en:\n{ruta}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error de Backup", str(e))
+
+        def trabajo(progreso):
+            # copia consistente en segundo plano (API de backup de SQLite), también de la base de archivo
+            resultado = respaldo.respaldar(ruta, progreso=progreso)
+            resultado["archivo"] = respaldo.respaldar_archivo(os.path.splitext(ruta)[0] + "_archivo.db")
+            return resultado
+
+        def al_terminar(resultado):
+            self.status.showMessage(f"💾 Backup guardado: {respaldo.describir(resultado)}", 8000)
+            texto = f"Backup guardado en:\n{ruta}"
+            if resultado["archivo"]:
+                texto += f"\n\nBase de archivo:\n{resultado['archivo']['ruta']}"
+            QMessageBox.information(self, "Backup", texto)
+
+        self.tareas.lanzar(
+            "Backup",
+            trabajo,
+            al_terminar=al_terminar,
+            al_fallar=lambda e: QMessageBox.critical(self, "Error de Backup", str(e)),
+        )
+
+    # -------------------------
+    # arranque por etapas
+    # -------------------------
+    def iniciar(self, desde=None):
+        """
+        Segunda etapa del arranque, con la ventana ya en pantalla: catálogo, historial y ventas pendientes
+        se leen en segundo plano y pasan a los modelos cuando llegan. El mantenimiento del día (snapshot de
+        stock y backup) espera a que la interfaz quede ociosa. desde: perf_counter() del login, para el log.
+        """
+        if desde is not None:
+            print(f"⏱ Ventana visible en {(time.perf_counter() - desde) * 1000:.0f} ms")
+        self.status.showMessage("⏳ Cargando catálogo…")
+        # tickets que quedaron en cola de la sesión anterior (o de una impresora apagada) se imprimen ahora
+        impresion.iniciar_cola(avisar=self._avisos_impresion.mensaje.emit)
+
+        def trabajo(progreso):
+            productos = database.catalogo.todos()  # carga y ordena el catálogo compartido
+            movimientos = database.obtener_movimientos_desde(0, LIMITE_HISTORIAL)
+            return productos, movimientos, database.contar_ventas_pendientes()
+
+        def al_terminar(resultado):
+            _productos, movimientos, pendientes = resultado
+            self.actualizar_tabla()  # el catálogo ya está en memoria: solo se verifica y se filtra
+            self.modelo_historial.agregar(movimientos)
+            self._mostrar_pendientes(pendientes)
+            self._mostrar_cola_impresion()
+            if desde is not None:
+                print(f"⏱ Datos cargados en {(time.perf_counter() - desde) * 1000:.0f} ms")
+            self._mantenimiento_timer.start()
+
+        def al_fallar(error):
+            self.status.showMessage(f"⚠️ No se pudo cargar el catálogo: {error}", 10000)
+            self.actualizar_tabla()
+            self.actualizar_historial()
+
+        self.tareas.lanzar("Cargando datos", trabajo, al_terminar=al_terminar, al_fallar=al_fallar)
+
+    def actualizar_pendientes(self):
+        self._mostrar_pendientes(database.contar_ventas_pendientes())
+
+    def _mostrar_pendientes(self, resumen):
+        cantidad, total = resumen
+        texto = "🧾 Ventas Pendientes"
+        self.act_pendientes.setText(f"{texto} ({cantidad})" if cantidad else texto)
+        self.act_pendientes.setToolTip(f"{cantidad} ventas a cuenta por ${float(total or 0):,.2f}")
+
+    def _al_avisar_impresion(self, texto, ms):
+        self.status.showMessage(texto, ms)
+        self._mostrar_cola_impresion()
+
+    def _mostrar_cola_impresion(self):
+        pendientes, errores = database.contar_cola_impresion()
+        if errores:
+            self.btn_impresion.setText(f"⚠️ {errores} ticket(s) sin imprimir — Reintentar")
+            self.btn_impresion.setToolTip("Se agotaron los reintentos: revisá la impresora y volvé a intentar")
+        else:
+            self.btn_impresion.setText(f"🖨 {pendientes} en cola")
+            self.btn_impresion.setToolTip("Tickets esperando la impresora")
+        self.btn_impresion.setEnabled(bool(errores))
+        self.btn_impresion.setVisible(bool(pendientes or errores))
+
+    def reintentar_impresiones(self):
+        n = impresion.reintentar()
+        self.status.showMessage(f"🖨 {n} ticket(s) de nuevo en la cola de impresión", 4000)
+        self._mostrar_cola_impresion()
+
+    def _mantenimiento_si_ocioso(self):
+        # ocioso: sin tareas en curso, sin diálogos abiertos y sin escrituras en los últimos segundos
+        if self.tareas.hay_tareas() or QApplication.activeModalWidget() or database.segundos_sin_escrituras() < 5:
+            return
+        self._mantenimiento_timer.stop()
+        self.mantenimiento_diario()
+
+    def mantenimiento_diario(self):
+        """Snapshot de stock del día y después el backup diario (así el backup ya lo incluye)."""
+
+        def al_fallar(error):
+            self.status.showMessage(f"⚠️ No se pudo tomar el snapshot de stock: {error}", 10000)
+            self.respaldo_diario()
+
+        self.tareas.lanzar(
+            "Snapshot de stock",
+            lambda progreso: database.snapshot_stock_diario(),
+            escritura=True,
+            al_terminar=lambda _: self.respaldo_diario(),
+            al_fallar=al_fallar,
+        )
+
+    def respaldo_diario(self):
+        """Backup automático del día (si falta) + rotación, en segundo plano; avisa tamaño y duración."""
+
+        def al_terminar(resultado):
+            if resultado:
+                borrados = f", {len(resultado['borrados'])} viejos borrados" if resultado["borrados"] else ""
+                self.status.showMessage(f"💾 Backup diario: {respaldo.describir(resultado)}{borrados}", 8000)
+
+        self.tareas.lanzar(
+            "Backup diario",
+            respaldo.respaldo_diario,
+            al_terminar=al_terminar,
+            al_fallar=lambda e: self.status.showMessage(f"⚠️ No se pudo hacer el backup diario: {e}", 10000),
+        )
+
+    def archivar_historial(self):
+        dias, ok = QInputDialog.getInt(
+            self,
+            "Archivar historial",
+            "Pasar al archivo los movimientos y ventas cerradas con más de (días):",
+            database.HORIZONTE_ARCHIVO_DIAS,
+            30,
+            36500,
+        )
+        if not ok:
+            return
+
+        def al_terminar(movidas):
+            texto = (
+                f"Movimientos archivados: {movidas['movimientos']:,}\n"
+                f"Ventas archivadas: {movidas['ventas']:,} ({movidas['venta_items']:,} ítems)\n\n"
+                "Los reportes siguen incluyendo lo archivado."
+            )
+            if movidas["error_compactar"]:
+                texto += (
+                    "\n\n⚠️ No se pudo compactar la base (el espacio se recupera en el próximo archivado):\n"
+                    f"{movidas['error_compactar']}"
+                )
+            QMessageBox.information(self, "Archivar historial", texto)
+            self.actualizar_historial()
+
+        self.tareas.lanzar(
+            "Archivar historial",
+            lambda progreso: database.archivar_historial(dias, progreso=progreso),
+            escritura=True,
+            al_terminar=al_terminar,
+        )
 
     # -------------------------
     # CLIENTES - ABM (NUEVO)
@@ -1140,6 +1208,7 @@ class MainWindow(QMainWindow):
         btn_cobrar.clicked.connect(cobrar)
         btn_close.clicked.connect(dlg.reject)
         dlg.exec()
+        self.actualizar_pendientes()
 
     def abrir_gastos(self):
         dlg = QDialog(self)
@@ -1310,8 +1379,13 @@ class MainWindow(QMainWindow):
 
             filename, _ = QFileDialog.getSaveFileName(dlg, "Guardar Excel", default_name, "Excel (*.xlsx)")
             if filename:
-                path = database.exportar_gastos_excel(tipo, filename, fecha_inicio=f1, fecha_fin=f2)
-                QMessageBox.information(dlg, "Exportación exitosa", f"Archivo generado:\n{path}")
+                self.tareas.lanzar(
+                    "Exportar gastos",
+                    lambda progreso: database.exportar_gastos_excel(tipo, filename, fecha_inicio=f1, fecha_fin=f2),
+                    al_terminar=lambda path: QMessageBox.information(
+                        self, "Exportación exitosa", f"Archivo generado:\n{path}"
+                    ),
+                )
 
         combo_tipo.currentIndexChanged.connect(cargar)
         btn_add.clicked.connect(agregar)
@@ -1433,18 +1507,7 @@ class MainWindow(QMainWindow):
         dlg.exec()
 
     def _actualizar_precios_sector(self, sector_id):
-        conn = database.get_connection()
-        cur = conn.cursor()
-        # sacar margen actual
-        margen = database.obtener_margen_sector(sector_id)
-        # actualizar precios de todos los productos del sector
-        cur.execute("SELECT id, costo FROM productos WHERE sector_id=?", (sector_id,))
-        rows = cur.fetchall()
-        for pid, costo in rows:
-            precio = round((costo or 0.0) * (1 + (margen or 0.0)), 2)
-            cur.execute("UPDATE productos SET precio=? WHERE id=?", (precio, pid))
-        conn.commit()
-        conn.close()
+        database.actualizar_precios_sector(sector_id)
 
     # -------------------------
     # Control de permisos por rol
@@ -1454,7 +1517,7 @@ class MainWindow(QMainWindow):
         Aplica restricciones según el rol de usuario.
         - developer: acceso total
         - admin: acceso total
-        - user: restringido (no puede ver sectores, gastos, usuarios)
+        - user: restringido (no puede ver sectores, gastos, usuarios, archivar historial)
         """
         if self.rol_actual in ("developer", "admin"):
             return  # acceso completo, no ocultamos nada
@@ -1464,6 +1527,7 @@ class MainWindow(QMainWindow):
             self.act_sectores.setVisible(False)
             self.act_gastos.setVisible(False)
             self.act_usuarios.setVisible(False)
+            self.act_archivar.setVisible(False)
 
         # mostrar rol actual en la barra de estado
         self.status.showMessage(f"✅ Sesión iniciada como {self.rol_actual}")
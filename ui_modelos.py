@@ -0,0 +1,255 @@
+# ui_modelos.py
+from PySide6.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor
+
+import database
+
+COLUMNAS_PRODUCTOS = ["ID", "Código", "Nombre", "Cantidad", "Costo", "Sector", "Precio", "Código Barras", "Movs"]
+LIMITE_BAJO_STOCK = 5
+COLUMNAS_VENTAS = ["Venta ID", "Fecha", "Pago", "Estado", "Total ($)"]
+TAMANO_PAGINA_VENTAS = 200
+LIMITE_HISTORIAL = 300
+ETIQUETAS_MOVIMIENTO = {
+    "INGRESO": "✅ Ingreso",
+    "VENTA": "🛒 Venta",
+    "EDIT": "✏️ Editado",
+    "ELIM": "❌ Eliminado",
+    "REEMBOLSO": "↩️ Reembolso",
+}
+
+
+class ModeloProductos(QAbstractTableModel):
+    """
+    Modelo de solo lectura sobre las filas del catálogo (tuplas de database.obtener_productos()).
+    No crea un item por celda: la vista le pide a data() únicamente las celdas visibles.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._filas = []
+
+    def set_filas(self, filas):
+        if filas is self._filas:
+            return
+        self.beginResetModel()
+        self._filas = filas
+        self.endResetModel()
+
+    def fila(self, row):
+        return self._filas[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNAS_PRODUCTOS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        val = self._filas[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            return str(val)
+        if role == Qt.ForegroundRole and index.column() == 3:
+            try:
+                cant = int(val)
+            except (TypeError, ValueError):
+                return None
+            if cant == 0:
+                return QColor("#777777")
+            if cant <= LIMITE_BAJO_STOCK:
+                return QColor("red")
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNAS_PRODUCTOS[section]
+        return str(section + 1)
+
+
+class ModeloVentas(QAbstractTableModel):
+    """
+    Ventas (sin ítems) de la más nueva a la más vieja, cargadas por páginas a medida que la vista
+    se desplaza (canFetchMore / fetchMore). Cada página se pide por clave (id < último id cargado),
+    así que abrir el historial cuesta una página aunque haya decenas de miles de ventas.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._filas = []
+        self._filtro = {}
+        self._agotado = True
+
+    def buscar(self, fecha_inicio=None, fecha_fin=None, venta_id=None):
+        """Reinicia el modelo con un filtro nuevo y carga la primera página."""
+        self.beginResetModel()
+        self._filtro = {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "venta_id": venta_id}
+        self._filas = []
+        self._agotado = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def venta(self, row):
+        return self._filas[row]
+
+    def refrescar_venta(self, venta_id):
+        """Vuelve a leer una sola venta (p. ej. después de un reembolso) y repinta su fila."""
+        for row, fila in enumerate(self._filas):
+            if fila[0] == venta_id:
+                nueva = database.obtener_ventas_pagina(venta_id=venta_id, limite=1)
+                if nueva:
+                    self._filas[row] = nueva[0]
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNAS_VENTAS) - 1))
+                return
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._agotado
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._agotado:
+            return
+        ultimo = self._filas[-1][0] if self._filas else None
+        pagina = database.obtener_ventas_pagina(antes_de_id=ultimo, limite=TAMANO_PAGINA_VENTAS, **self._filtro)
+        self._agotado = len(pagina) < TAMANO_PAGINA_VENTAS
+        if pagina:
+            self.beginInsertRows(QModelIndex(), len(self._filas), len(self._filas) + len(pagina) - 1)
+            self._filas.extend(pagina)
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNAS_VENTAS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        fila = self._filas[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == 4:
+                return f"${float(fila[4] or 0):.2f}"
+            return str(fila[col])
+        if role == Qt.TextAlignmentRole and col == 4:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.BackgroundRole and fila[3] == "REEMBOLSADO":
+            return QColor("#f0f0f0")
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNAS_VENTAS[section]
+        return str(section + 1)
+
+
+class ModeloHistorial(QAbstractListModel):
+    """
+    Últimos movimientos como líneas de texto, el más nuevo arriba, con tope de LIMITE_HISTORIAL líneas.
+    Recuerda el último movimientos.id mostrado: actualizar() solo pide y formatea los movimientos nuevos,
+    los inserta arriba y descarta los que sobran abajo (cuesta lo que haya pasado, no 300 filas).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lineas = []
+        self._ultimo_id = 0
+
+    @staticmethod
+    def formatear(mov):
+        _mid, nombre, tipo, cambio, precio_unit, fecha, detalles = mov
+        etiqueta = ETIQUETAS_MOVIMIENTO.get(tipo, tipo)
+        return f"[{fecha}] {etiqueta}: {nombre} ({cambio}) ${precio_unit} {('- '+detalles) if detalles else ''}"
+
+    def actualizar(self):
+        """Agrega arriba los movimientos posteriores al último mostrado. Devuelve cuántos llegaron."""
+        return self.agregar(database.obtener_movimientos_desde(self._ultimo_id, LIMITE_HISTORIAL))
+
+    def agregar(self, movimientos):
+        """
+        Agrega movimientos ya leídos (del más nuevo al más viejo, p. ej. desde una Tarea en segundo plano);
+        descarta los que ya se muestran.
+        """
+        nuevos = [m for m in movimientos if m[0] > self._ultimo_id]
+        if not nuevos:
+            return 0
+        self._ultimo_id = nuevos[0][0]
+        self.beginInsertRows(QModelIndex(), 0, len(nuevos) - 1)
+        self._lineas[:0] = [self.formatear(m) for m in nuevos]
+        self.endInsertRows()
+        if len(self._lineas) > LIMITE_HISTORIAL:
+            self.beginRemoveRows(QModelIndex(), LIMITE_HISTORIAL, len(self._lineas) - 1)
+            del self._lineas[LIMITE_HISTORIAL:]
+            self.endRemoveRows()
+        return len(nuevos)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lineas)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return self._lineas[index.row()]
+
+
+class MotorFiltro:
+    """
+    Filtro por texto (código / nombre / código de barras) y por bajo stock sobre el catálogo en memoria.
+    Las claves en minúsculas se calculan una vez por versión del catálogo (cada lista nueva de
+    catalogo.todos()); si la búsqueda nueva contiene a la anterior, solo se revisan las filas que ya coincidían.
+    """
+
+    def __init__(self):
+        self._productos = None
+        self._claves = []
+        self._bajos = []
+        self._ultimo = None  # (texto, solo_bajo) del último filtrado
+        self._indices = None  # índices que coincidieron con _ultimo
+        self._resultado = []
+
+    def _preparar(self, productos):
+        self._productos = productos
+        # \x00 separa los campos: un texto tipeado nunca puede coincidir "entre" dos campos
+        self._claves = [f"{p[1]}\x00{p[2]}\x00{p[7]}".lower() for p in productos]
+        self._bajos = [_es_bajo_stock(p[3]) for p in productos]
+        self._ultimo = None
+        self._indices = None
+
+    def filtrar(self, productos, texto, solo_bajo):
+        """Devuelve las filas de `productos` que pasan el filtro (la misma lista si no hay filtro)."""
+        if productos is not self._productos:
+            self._preparar(productos)
+        texto = (texto or "").strip().lower()
+        if (texto, solo_bajo) == self._ultimo:
+            return self._resultado
+        if not texto and not solo_bajo:
+            indices = None
+        else:
+            candidatos = range(len(productos))
+            if self._ultimo is not None and self._indices is not None:
+                texto_ant, bajo_ant = self._ultimo
+                # la búsqueda nueva es más restrictiva que la anterior → alcanza con achicar ese resultado
+                if texto_ant in texto and (solo_bajo or not bajo_ant):
+                    candidatos = self._indices
+            claves, bajos = self._claves, self._bajos
+            if texto and solo_bajo:
+                indices = [i for i in candidatos if bajos[i] and texto in claves[i]]
+            elif texto:
+                indices = [i for i in candidatos if texto in claves[i]]
+            else:
+                indices = [i for i in candidatos if bajos[i]]
+        self._ultimo = (texto, solo_bajo)
+        self._indices = indices
+        self._resultado = productos if indices is None else [productos[i] for i in indices]
+        return self._resultado
+
+
+def _es_bajo_stock(cantidad):
+    try:
+        return int(cantidad) <= LIMITE_BAJO_STOCK
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,142 @@
+# ui_tareas.py
+import time
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+import database
+
+
+class TareaCancelada(Exception):
+    """La lanza progreso() dentro de la tarea cuando el usuario la canceló."""
+
+
+class _SenalesTarea(QObject):
+    # QRunnable no es QObject: las señales viajan en este objeto (vive en el hilo de la interfaz)
+    progreso = Signal(object, int, float)  # tarea, filas procesadas, segundos transcurridos
+    terminada = Signal(object, object)  # tarea, resultado
+    fallo = Signal(object, object)  # tarea, excepción
+    cancelada = Signal(object)  # tarea
+
+
+class Tarea(QRunnable):
+    """
+    Un trabajo de base de datos / pandas que corre fuera del hilo de la interfaz.
+    fn(progreso) no debe tocar widgets; progreso(filas) informa el avance y corta la tarea
+    con TareaCancelada si el usuario la canceló (dentro de una transacción, esta se revierte).
+    """
+
+    def __init__(self, nombre, fn, escritura=False, al_terminar=None, al_fallar=None):
+        super().__init__()
+        self.setAutoDelete(False)  # la referencia la guarda GestorTareas hasta que termina
+        self.nombre = nombre
+        self.escritura = escritura
+        self.al_terminar = al_terminar
+        self.al_fallar = al_fallar
+        self.senales = _SenalesTarea()
+        self._fn = fn
+        self._cancelada = False
+        self._inicio = time.perf_counter()
+
+    def cancelar(self):
+        self._cancelada = True
+
+    def progreso(self, filas):
+        if self._cancelada:
+            raise TareaCancelada()
+        self.senales.progreso.emit(self, int(filas), time.perf_counter() - self._inicio)
+
+    def run(self):
+        self._inicio = time.perf_counter()
+        try:
+            if self._cancelada:
+                raise TareaCancelada()
+            resultado = self._fn(self.progreso)
+        except TareaCancelada:
+            self.senales.cancelada.emit(self)
+        except Exception as e:
+            self.senales.fallo.emit(self, e)
+        else:
+            self.senales.terminada.emit(self, resultado)
+        finally:
+            # los hilos del pool se reciclan: no dejamos su conexión abierta
+            database.cerrar_conexion_hilo()
+
+
+class GestorTareas(QObject):
+    """
+    Ejecuta Tareas en segundo plano y devuelve sus resultados en el hilo de la interfaz.
+    Las de escritura van a un pool de un solo hilo: nunca hay dos escrituras SQLite a la vez.
+    """
+
+    mensaje = Signal(str, int)  # texto para la barra de estado, duración en ms (0 = hasta el próximo)
+    activas = Signal(int)  # tareas en curso o en cola
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lectores = QThreadPool(self)
+        self._lectores.setMaxThreadCount(2)
+        self._escritor = QThreadPool(self)
+        self._escritor.setMaxThreadCount(1)
+        self._activas = []
+
+    def lanzar(self, nombre, fn, escritura=False, al_terminar=None, al_fallar=None):
+        """
+        Encola fn(progreso). al_terminar(resultado) / al_fallar(excepción) se llaman en el hilo de la
+        interfaz; sin al_fallar, el error se informa en la barra de estado.
+        """
+        tarea = Tarea(nombre, fn, escritura, al_terminar, al_fallar)
+        tarea.senales.progreso.connect(self._al_progresar)
+        tarea.senales.terminada.connect(self._al_terminar)
+        tarea.senales.fallo.connect(self._al_fallar)
+        tarea.senales.cancelada.connect(self._al_cancelar)
+        self._activas.append(tarea)
+        self.activas.emit(len(self._activas))
+        self.mensaje.emit(f"⏳ {nombre}…", 0)
+        self._pool(tarea).start(tarea)
+        return tarea
+
+    def cancelar_todas(self):
+        for tarea in list(self._activas):
+            tarea.cancelar()
+            # si todavía no arrancó, la sacamos de la cola directamente
+            if self._pool(tarea).tryTake(tarea):
+                self._al_cancelar(tarea)
+
+    def esperar(self, ms=-1):
+        self._escritor.waitForDone(ms)
+        self._lectores.waitForDone(ms)
+
+    def hay_tareas(self):
+        return bool(self._activas)
+
+    def _pool(self, tarea):
+        return self._escritor if tarea.escritura else self._lectores
+
+    def _quitar(self, tarea):
+        if tarea in self._activas:
+            self._activas.remove(tarea)
+        self.activas.emit(len(self._activas))
+
+    @Slot(object, int, float)
+    def _al_progresar(self, tarea, filas, segundos):
+        self.mensaje.emit(f"⏳ {tarea.nombre}: {filas:,} filas ({segundos:.1f} s)", 0)
+
+    @Slot(object, object)
+    def _al_terminar(self, tarea, resultado):
+        self._quitar(tarea)
+        self.mensaje.emit(f"✅ {tarea.nombre} ({time.perf_counter() - tarea._inicio:.1f} s)", 5000)
+        if tarea.al_terminar:
+            tarea.al_terminar(resultado)
+
+    @Slot(object, object)
+    def _al_fallar(self, tarea, error):
+        self._quitar(tarea)
+        if tarea.al_fallar:
+            tarea.al_fallar(error)
+        else:
+            self.mensaje.emit(f"⚠️ {tarea.nombre}: {error}", 8000)
+
+    @Slot(object)
+    def _al_cancelar(self, tarea):
+        self._quitar(tarea)
+        self.mensaje.emit(f"✖ {tarea.nombre}: cancelado", 5000)
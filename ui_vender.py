@@ -18,6 +18,8 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QKeySequence
 import database
+import impresion
+import tickets
 import os
 
 
@@ -196,7 +198,9 @@ class FormularioPOS(QDialog):
             return
 
         try:
-            encontrados = database.buscar_productos(q, limit=100)
+            # Scanner / código exacto: una búsqueda por índice; si no, búsqueda por texto
+            exacto = database.lookup_producto(q)
+            encontrados = [exacto] if exacto else database.buscar_productos(q, limit=100)
         except Exception as e:
             QMessageBox.critical(self, "Buscar", f"Error al buscar:\n{e}")
             return
@@ -208,7 +212,7 @@ class FormularioPOS(QDialog):
                 QApplication.beep()
                 QApplication.beep()
                 self._alta_rapida_producto(codigo_barras=q)
-                prod = database.obtener_producto_por_barcode(q)
+                prod = database.lookup_producto(q)
                 if prod:
                     self._ultimo_producto = {
                         "id": prod[0],
@@ -438,19 +442,6 @@ class FormularioPOS(QDialog):
             self.lbl_total.setText(f"Total: ${total:,.2f}")
             self.lbl_total.setStyleSheet("font-size: 20px; font-weight: bold; color: black;")
 
-    def _imprimir_pdf_automatico(self, ruta_pdf: str):
-        try:
-            import sys, os, subprocess
-
-            if sys.platform.startswith("win"):
-                os.startfile(ruta_pdf, "print")
-            else:
-                subprocess.run(["lp", ruta_pdf], check=False)
-            return True
-        except Exception as e:
-            QMessageBox.warning(self, "Impresión", f"El ticket se generó, pero no se pudo enviar a la impresora:\n{e}")
-            return False
-
     def _confirmar_venta(self):
         # 1) Validar que haya ítems en el carrito/tabla
         filas = self.table_cart.rowCount()
@@ -460,6 +451,7 @@ class FormularioPOS(QDialog):
 
         # 2) Construir items desde la tabla de carrito
         items = []
+        renglones_ticket = []  # (nombre, cantidad, precio, subtotal): el ticket sale de acá, sin releer la venta
         total = 0.0
         for r in range(filas):
             try:
@@ -473,6 +465,7 @@ class FormularioPOS(QDialog):
                 QMessageBox.warning(self, "Cantidad inválida", "Las cantidades deben ser mayores a cero.")
                 return
             items.append({"producto_id": pid, "cantidad": cant, "precio_unitario": precio})
+            renglones_ticket.append((self.table_cart.item(r, 2).text(), cant, precio, round(cant * precio, 2)))
             total += cant * precio
 
         # 3) Tipo de pago y validaciones específicas
@@ -499,13 +492,13 @@ class FormularioPOS(QDialog):
 
         # 4) Cliente (puede ser None)
         cliente_id = self.combo_cliente.currentData()
+        cliente_nombre = self.combo_cliente.currentText() if cliente_id else None
 
         # 5) Confirmación final
         resumen = f"Total: ${total:.2f}\nPago: {tipo_pago}"
         if tipo_pago == "Efectivo":
             resumen += f"\nRecibido: ${recibido:.2f}\nVuelto: ${vuelto:.2f}"
         if cliente_id:
-            cliente_nombre = self.combo_cliente.currentText()
             resumen += f"\nCliente: {cliente_nombre}"
 
         if QMessageBox.question(self, "Confirmar venta", f"{resumen}\n\n¿Registrar la venta?") != QMessageBox.Yes:
@@ -528,16 +521,17 @@ class FormularioPOS(QDialog):
         # 6.1) Preparar datos para el ticket
         venta_id = info if isinstance(info, int) else (info.get("venta_id") if isinstance(info, dict) else None)
 
-        # 6.2) Elegir tipo de ticket y generar (si corresponde)
+        # 6.2) Elegir tipo de ticket y mandarlo a la cola de impresión (el PDF y el spooler van en segundo plano)
         if venta_id is not None:
             tipo_ticket = self._elegir_tipo_ticket()  # 'termico', 'a4' o None
             if tipo_ticket:
                 try:
-                    ruta_ticket = database.generar_ticket(venta_id, formato=tipo_ticket)
-                    self._imprimir_pdf_automatico(ruta_ticket)
-                    # ticket generado y guardado en la carpeta de Tickets
+                    datos = tickets.datos_ticket(
+                        venta_id, renglones_ticket, tipo_pago, round(total, 2), recibido, vuelto, cliente_nombre
+                    )
+                    impresion.encolar(datos, formato=tipo_ticket)
                 except Exception as e:
-                    QMessageBox.warning(self, "Ticket", f"No se pudo generar el ticket:\n{e}")
+                    QMessageBox.warning(self, "Ticket", f"No se pudo encolar el ticket:\n{e}")
 
         # 7) Limpieza de UI, marcar flag y limpiar carrito temporal
         self.cart.clear()
@@ -551,7 +545,7 @@ class FormularioPOS(QDialog):
         except Exception:
             pass
 
-        QMessageBox.information(self, "Venta", "✅ Venta registrada correctamente.")
+        # sin cartel modal: la ventana principal avisa en la barra de estado y se puede seguir escaneando
         self.accept()
 
     def obtener_carrito(self):